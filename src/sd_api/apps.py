@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class SdApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sd_api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from . import metrics
+        from . import database
+        if database.SQLITE_WAL:
+            connection_created.connect(database.configure_sqlite)
+        if metrics.METRICS_ENABLED:
+            connection_created.connect(metrics.install_query_wrapper)
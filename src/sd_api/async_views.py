@@ -0,0 +1,184 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, Throttled
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+
+from .authentication import AsyncJWTAuthentication
+from .exceptions import custom_exception_handler
+from .renderers import ORJSONRenderer
+from .membership import aget_member_project_ids
+from .database import read_database, aread_alias
+from .throttles import CombinedRateThrottle
+from .changes import (CHANGES_PAGE_SIZE, CHANGES_POLL_INTERVAL, CHANGES_STREAM_TIMEOUT, acurrent_cursor,
+                      changes_since, check_cursor, parse_cursor, serialize_change)
+from .exceptions import CustomBadRequest
+from .models import Project
+
+
+class AsyncReadView(View):
+    """
+    ASGI-native read path (list / retrieve) of a viewset.
+    Queries use the async ORM ; the viewset is only used to build the queryset, filters, permissions and serializer.
+    """
+    viewset_class = None
+    action = None
+    authentication_class = AsyncJWTAuthentication
+    throttle_classes = [CombinedRateThrottle]
+    renderer = ORJSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request)
+        try:
+            await self.initial(drf_request)
+            view = self.viewset_class(request=drf_request, action=self.action, format_kwarg=None,
+                                      args=args, kwargs=kwargs)
+            view.check_permissions(drf_request)
+            # ensemble des projets de l'utilisateur chargé en async : les permissions le lisent en mémoire
+            await aget_member_project_ids(drf_request)
+            # lectures sur le réplica (si configuré), propagé aux threads de l'ORM async
+            token = read_database.set(await aread_alias(drf_request))
+            try:
+                data = await self.get_data(drf_request, view, **kwargs)
+            finally:
+                read_database.reset(token)
+        except APIException as exc:
+            return self.error_response(drf_request, exc)
+        return self.render(data)
+
+    async def initial(self, request):
+        authentication = self.authentication_class()
+        user_auth = await authentication.aauthenticate(request)
+        if user_auth is None:
+            raise NotAuthenticated()
+        request.user, request.auth = user_auth
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                raise Throttled(throttle.wait())
+
+    async def get_data(self, request, view, **kwargs):
+        raise NotImplementedError
+
+    def render(self, data, status=200, headers=None):
+        response = HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    def error_response(self, request, exc):
+        # même format d'erreur que les vues DRF (custom_exception_handler)
+        if isinstance(exc, NotAuthenticated):
+            exc.status_code = 401
+        response = custom_exception_handler(exc, {'request': request})
+        headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+        if response.status_code == 401:
+            headers['WWW-Authenticate'] = self.authentication_class().authenticate_header(request)
+        return self.render(response.data, status=response.status_code, headers=headers)
+
+
+class AsyncListView(AsyncReadView):
+    action = 'list'
+    pagination_class = LimitOffsetPagination
+
+    async def get_data(self, request, view, **kwargs):
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = self.pagination_class()
+        paginator.request = request
+        paginator.limit = paginator.get_limit(request)
+        paginator.offset = paginator.get_offset(request)
+        paginator.count = await queryset.acount()
+        rows = [obj async for obj in queryset[paginator.offset:paginator.offset + paginator.limit]]
+        serializer = view.get_serializer(rows, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+
+class AsyncRetrieveView(AsyncReadView):
+    action = 'retrieve'
+
+    async def get_data(self, request, view, pk=None, **kwargs):
+        try:
+            obj = await view.get_queryset().filter(pk=pk).afirst()
+        except (ValueError, ValidationError):
+            # pk mal formée (ex : UUID des commentaires)
+            obj = None
+        if obj is None:
+            raise NotFound()
+        # permissions DRF synchrones (certaines peuvent lire une FK) : exécutées hors de la boucle
+        await sync_to_async(view.check_object_permissions)(request, obj)
+        return view.get_serializer(obj).data
+
+
+class ChangeStreamView(AsyncReadView):
+    """
+    Server-sent events of the change log of a project (ASGI, sd_support.asgi): the entries after
+    ?since= / Last-Event-ID, then the new ones as they are written, until ?timeout= (seconds, bounded).
+    Without cursor the stream starts at the current cursor.
+    """
+    poll_interval = CHANGES_POLL_INTERVAL
+    stream_timeout = CHANGES_STREAM_TIMEOUT
+    keepalive_interval = 15  # secondes, commentaire SSE pour les proxys qui coupent les connexions inactives
+
+    async def get(self, request, pk=None):
+        drf_request = Request(request)
+        try:
+            await self.initial(drf_request)
+            # même visibilité que ProjectViewSet : projets dont l'utilisateur est contributeur
+            if pk not in await aget_member_project_ids(drf_request):
+                raise NotFound()
+            horizon = await Project.objects.filter(pk=pk).values_list('changes_horizon', flat=True).afirst()
+            if horizon is None:
+                raise NotFound()
+            since = parse_cursor(request.headers.get('Last-Event-ID') or drf_request.query_params.get('since'))
+            if since is None:
+                since = await acurrent_cursor(pk, horizon)
+            check_cursor(since, horizon)
+            timeout = self.get_timeout(drf_request)
+        except APIException as exc:
+            return self.error_response(drf_request, exc)
+        response = StreamingHttpResponse(self.events(drf_request, pk, since, timeout),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # pas de mise en tampon par nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def get_timeout(self, request):
+        value = request.query_params.get('timeout')
+        if value is None:
+            return self.stream_timeout
+        try:
+            return min(max(float(value), 0), self.stream_timeout)
+        except ValueError:
+            raise CustomBadRequest("timeout doit être un nombre (secondes)")
+
+    async def events(self, request, project_id, since, timeout):
+        deadline = time.monotonic() + timeout
+        last_event = time.monotonic()
+        yield f"retry: {int(self.poll_interval * 1000)}\n\n".encode()
+        while True:
+            changes = [change async for change in changes_since(project_id, since)[:CHANGES_PAGE_SIZE]]
+            for change in changes:
+                since = change.id
+                data = self.renderer.render(serialize_change(change))
+                yield b"id: %d\nevent: change\ndata: %s\n\n" % (change.id, data)
+            if len(changes) == CHANGES_PAGE_SIZE:
+                continue
+            now = time.monotonic()
+            if changes:
+                last_event = now
+            if now >= deadline:
+                return
+            # accès retiré en cours de flux (contributeur supprimé, projet supprimé)
+            request._member_project_ids = None
+            if project_id not in await aget_member_project_ids(request):
+                return
+            if now - last_event >= self.keepalive_interval:
+                last_event = now
+                yield b": keepalive\n\n"
+            await asyncio.sleep(min(self.poll_interval, max(deadline - now, 0)))
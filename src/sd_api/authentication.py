@@ -0,0 +1,110 @@
+from django.db import router
+from rest_framework.permissions import SAFE_METHODS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import is_blacklisted, is_revoked
+from .caching import shared_cache
+
+
+# champs de l'utilisateur copiés dans les tokens (suffisants pour les permissions et les filtres des vues)
+USER_CLAIMS = ('is_staff', 'is_superuser')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying USER_CLAIMS, copied into the access tokens built from it.
+    The blacklist check is served from the cache (key : jti).
+    """
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication without a SELECT on the user when the token carries USER_CLAIMS.
+    The user is built from the claims, its other fields are deferred : reading one of them loads it from the DB.
+    Tokens without these claims (issued before) still read the user from the DB.
+    Writes (unsafe methods) always read the user : a deleted / deactivated user gets a 401.
+    Reads refuse the tokens of a user deleted / deactivated since (revocation kept in the cache).
+    Note : is_staff / is_superuser changes apply to the access tokens issued by the next refresh
+    (the refresh reads the user again), so at most ACCESS_TOKEN_LIFETIME after the change.
+    """
+    read_user = False
+
+    def authenticate(self, request):
+        self.read_user = request.method not in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.read_user:
+            user = self.get_user_from_claims(validated_token)
+            if user is not None:
+                return user
+        return super().get_user(validated_token)
+
+    def get_user_from_claims(self, validated_token):
+        try:
+            values = {api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]}
+            values.update({claim: bool(validated_token[claim]) for claim in USER_CLAIMS})
+        except KeyError:
+            return None
+        if is_revoked(values[api_settings.USER_ID_FIELD], validated_token.get('iat', 0)):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        # sans cache partagé la révocation faite par un autre worker n'est pas vue : les tokens admin
+        # (qui lisent toutes les données) relisent l'utilisateur
+        if not shared_cache() and any(values[claim] for claim in USER_CLAIMS):
+            return None
+        # tokens délivrés uniquement aux utilisateurs actifs
+        values['is_active'] = True
+        # from_db attend les valeurs dans l'ordre des champs du modèle, pas dans celui de field_names
+        fields = [field for field in self.user_model._meta.concrete_fields if field.attname in values]
+        return self.user_model.from_db(router.db_for_read(self.user_model), [field.attname for field in fields],
+                                       [values[field.attname] for field in fields])
+
+
+class AsyncJWTAuthentication(ClaimsJWTAuthentication):
+    """
+    JWTAuthentication usable from async views : the token is checked in memory, the user is read with the async ORM
+    """
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        self.read_user = request.method not in SAFE_METHODS
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if not self.read_user:
+            user = self.get_user_from_claims(validated_token)
+            if user is not None:
+                return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = await self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).afirst()
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,200 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import Count
+from django.test import override_settings
+
+from .authentication import ClaimsRefreshToken
+from .caching import shared_cache
+from .counters import rebuild_counters
+from .enums import CustomStatus, IssuePriority, IssueTag, ProjectType
+from .models import CustomUser, Project, Contributor, Issue, Comment, ProjectCounter
+
+
+BENCH_PASSWORD = 'bench-password'
+BENCH_ADMIN = 'bench-admin'
+BENCH_CACHE_LOCATION = 'sd_api-bench'
+
+
+def isolated_cache():
+    """
+    Private LocMem cache for a benchmark: the configured cache (shared with the workers) is never read nor cleared.
+    SD_API_SHARED_CACHE keeps the code paths of the current configuration.
+    """
+    return override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': BENCH_CACHE_LOCATION}},
+        SD_API_SHARED_CACHE=shared_cache())
+
+
+def generate_dataset(users=50, projects=20, issues_per_project=30, comments_per_issue=5, seed=42):
+    """
+    Deterministic dataset (same seed => same rows) with a realistic fan-out:
+    a few projects / issues concentrate most of the activity (exponential distributions).
+    Rows are bulk created: counters are rebuilt at the end (empty database and cache expected).
+    """
+    rng = random.Random(seed)
+    # un seul hachage du mot de passe pour tous les utilisateurs
+    password = make_password(BENCH_PASSWORD)
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=BENCH_ADMIN, age=40, password=password, is_staff=True, is_superuser=True)]
+        + [CustomUser(username=f'bench-user-{index}', age=rng.randint(18, 70), password=password)
+           for index in range(users)])
+    user_ids = list(CustomUser.objects.filter(username__startswith='bench-user-').values_list('pk', flat=True))
+
+    # les premiers utilisateurs sont les plus actifs (auteurs de plusieurs projets)
+    authors = [user_ids[min(int(rng.expovariate(1 / 3)), len(user_ids) - 1)] for _ in range(projects)]
+    Project.objects.bulk_create([
+        Project(name=f"Projet {index}", description=f"Description du projet {index} " * rng.randint(1, 20),
+                type=rng.choice(list(ProjectType)).value, author_id=author)
+        for index, author in enumerate(authors)])
+    project_ids = list(Project.objects.filter(name__startswith="Projet ").order_by('pk').values_list('pk', flat=True))
+
+    members = {}
+    for project_id, author in zip(project_ids, authors):
+        nb_members = min(len(user_ids), 1 + int(rng.expovariate(1 / 4)))
+        members[project_id] = [author] + [user for user in rng.sample(user_ids, nb_members) if user != author]
+    Contributor.objects.bulk_create([Contributor(project_id=project_id, user_id=user_id)
+                                     for project_id, user_ids_ in members.items() for user_id in user_ids_])
+
+    issues = []
+    for project_id in project_ids:
+        for index in range(int(rng.expovariate(1 / issues_per_project)) + 1):
+            author, assignee = rng.choice(members[project_id]), rng.choice(members[project_id])
+            issues.append(Issue(
+                title=f"Issue {index} {rng.choice(['connexion', 'affichage', 'export', 'performance', 'sécurité'])}",
+                description="Étapes pour reproduire le problème. " * rng.randint(1, 30),
+                project_id=project_id, author_id=author, assignee_id=assignee,
+                priority=rng.choice(list(IssuePriority)).value, tag=rng.choice(list(IssueTag)).value,
+                status=rng.choice(list(CustomStatus)).value))
+    Issue.objects.bulk_create(issues, batch_size=1000)
+
+    comments = []
+    for issue in Issue.objects.filter(project_id__in=project_ids).only('pk', 'project_id'):
+        for _ in range(int(rng.expovariate(1 / comments_per_issue))):
+            comments.append(Comment(description="Commentaire de suivi. " * rng.randint(1, 10), issue_id=issue.pk,
+                                    author_id=rng.choice(members[issue.project_id])))
+    Comment.objects.bulk_create(comments, batch_size=1000)
+
+    rebuild_counters(Issue, ProjectCounter, project_ids)
+    return {'users': len(user_ids) + 1, 'projects': len(project_ids),
+            'contributors': sum(len(ids) for ids in members.values()),
+            'issues': len(issues), 'comments': len(comments)}
+
+
+class BenchContext:
+    """
+    Reference objects of the scenarios: the most active user, one of its projects, issue and comment
+    """
+    def __init__(self):
+        self.admin = CustomUser.objects.get(username=BENCH_ADMIN)
+        # projet le plus actif : listes et exports les plus lourds
+        self.project = (Project.objects.filter(author__username__startswith='bench-user-')
+                        .annotate(nb_issues=Count('issues')).order_by('-nb_issues', 'pk').first())
+        self.user = self.project.author
+        self.issue = Issue.objects.filter(project=self.project, author=self.user).order_by('pk').first() \
+            or Issue.objects.create(title="Issue de référence", description="desc", project=self.project,
+                                    author=self.user, assignee=self.user, priority='LOW', tag='BUG')
+        self.comment = Comment.objects.filter(issue=self.issue, author=self.user).order_by('pk').first() \
+            or Comment.objects.create(description="Commentaire de référence", issue=self.issue, author=self.user)
+        self.tokens = {name: str(ClaimsRefreshToken.for_user(user).access_token)
+                       for name, user in (('user', self.user), ('admin', self.admin))}
+
+    def new_project(self):
+        project = Project.objects.create(name="Projet temporaire", description="desc", type='BAE', author=self.user)
+        Contributor.objects.create(project=project, user=self.user)
+        return project
+
+    def new_issue(self):
+        return Issue.objects.create(title="Issue temporaire", description="desc", project=self.project,
+                                    author=self.user, assignee=self.user, priority='LOW', tag='BUG')
+
+    def new_user(self, index):
+        return CustomUser.objects.create(username=f'bench-tmp-{index}', age=30)
+
+    def issue_payload(self, index):
+        return {'title': f"Issue créée {index}", 'description': "desc", 'project': self.project.pk,
+                'priority': 'HIGH', 'tag': 'FEAT'}
+
+
+# (nom, méthode, authentification, fonction (contexte, n° d'itération) => (chemin, données))
+# les objets supprimés / modifiés sont préparés par la fonction, hors mesure
+# routes non couvertes : admin, et /api/contributors/ du router (sans projet, remplacées par les routes imbriquées)
+SCENARIOS = [
+    ("token_obtain_pair", 'post', None,
+     lambda ctx, i: ('/api/token/', {'username': ctx.user.username, 'password': BENCH_PASSWORD})),
+    ("token_refresh", 'post', None,
+     lambda ctx, i: ('/api/token/refresh/', {'refresh': str(ClaimsRefreshToken.for_user(ctx.user))})),
+    ("token_blacklist", 'post', 'user',
+     lambda ctx, i: ('/api/token/blacklist/', {'refresh': str(ClaimsRefreshToken.for_user(ctx.user))})),
+    ("api-auth login page", 'get', None, lambda ctx, i: ('/api-auth/login/', None)),
+    ("api-auth logout", 'post', None, lambda ctx, i: ('/api-auth/logout/', None)),
+    ("api-root", 'get', 'user', lambda ctx, i: ('/api/', None)),
+
+    ("CustomUserViewSet.list", 'get', 'admin', lambda ctx, i: ('/api/users/', None)),
+    ("CustomUserViewSet.retrieve", 'get', 'user', lambda ctx, i: (f'/api/users/{ctx.user.pk}/', None)),
+    ("CustomUserViewSet.create", 'post', 'admin',
+     lambda ctx, i: ('/api/users/', {'username': f'bench-new-{i}', 'password': 'pwd', 'age': 30})),
+    ("CustomUserViewSet.update", 'put', 'user',
+     lambda ctx, i: (f'/api/users/{ctx.user.pk}/', {'username': ctx.user.username, 'age': 20 + i % 50})),
+    ("CustomUserViewSet.destroy", 'delete', 'admin',
+     lambda ctx, i: (f'/api/users/{ctx.new_user(i).pk}/', None)),
+
+    ("ProjectViewSet.list", 'get', 'user', lambda ctx, i: ('/api/projects/', None)),
+    ("ProjectViewSet.retrieve", 'get', 'user', lambda ctx, i: (f'/api/projects/{ctx.project.pk}/', None)),
+    ("ProjectViewSet.create", 'post', 'user',
+     lambda ctx, i: ('/api/projects/', {'name': f"Nouveau {i}", 'description': "desc", 'type': 'BAE'})),
+    ("ProjectViewSet.update", 'put', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.project.pk}/', {'name': ctx.project.name, 'description': f"desc {i}",
+                                                           'type': ctx.project.type})),
+    ("ProjectViewSet.destroy", 'delete', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.new_project().pk}/', None)),
+    ("ProjectViewSet.export", 'get', 'user', lambda ctx, i: (f'/api/projects/{ctx.project.pk}/export/', None)),
+    ("ProjectViewSet.stats", 'get', 'user', lambda ctx, i: (f'/api/projects/{ctx.project.pk}/stats/', None)),
+    ("ProjectViewSet.changes", 'get', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.project.pk}/changes/?since=0', None)),
+
+    ("ContributorViewSet.list_contributors", 'get', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.project.pk}/contributors/', None)),
+    ("ContributorViewSet.create", 'post', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.project.pk}/contributors/', {'user_id': ctx.new_user(i).pk})),
+    ("ContributorViewSet.destroy", 'delete', 'user',
+     lambda ctx, i: (f'/api/projects/{ctx.project.pk}/contributors/'
+                     f'{Contributor.objects.create(project=ctx.project, user=ctx.new_user(i)).user_id}/', None)),
+    ("ContributorViewSet.user_projects", 'get', 'user', lambda ctx, i: (f'/api/users/{ctx.user.pk}/projects/', None)),
+
+    ("IssueViewSet.list", 'get', 'user', lambda ctx, i: (f'/api/issues/?project={ctx.project.pk}', None)),
+    ("IssueViewSet.list filtered", 'get', 'user',
+     lambda ctx, i: (f'/api/issues/?project={ctx.project.pk}&status=TODO,INPR&ordering=-created_time', None)),
+    ("IssueViewSet.list search", 'get', 'user', lambda ctx, i: ('/api/issues/?search=connexion', None)),
+    ("IssueViewSet.list keyset", 'get', 'user',
+     lambda ctx, i: (f'/api/issues/?project={ctx.project.pk}&pagination=cursor', None)),
+    ("IssueViewSet.retrieve", 'get', 'user', lambda ctx, i: (f'/api/issues/{ctx.issue.pk}/', None)),
+    ("IssueViewSet.create", 'post', 'user', lambda ctx, i: ('/api/issues/', ctx.issue_payload(i))),
+    ("IssueViewSet.update", 'put', 'user',
+     lambda ctx, i: (f'/api/issues/{ctx.issue.pk}/', {**ctx.issue_payload(i), 'title': ctx.issue.title})),
+    ("IssueViewSet.destroy", 'delete', 'user', lambda ctx, i: (f'/api/issues/{ctx.new_issue().pk}/', None)),
+
+    ("CommentViewSet.list", 'get', 'user', lambda ctx, i: (f'/api/comments/?issue={ctx.issue.pk}', None)),
+    ("CommentViewSet.list project", 'get', 'user', lambda ctx, i: (f'/api/comments/?project={ctx.project.pk}', None)),
+    ("CommentViewSet.retrieve", 'get', 'user', lambda ctx, i: (f'/api/comments/{ctx.comment.pk}/', None)),
+    ("CommentViewSet.create", 'post', 'user',
+     lambda ctx, i: ('/api/comments/', {'issue': ctx.issue.pk, 'description': f"Commentaire {i}"})),
+    ("CommentViewSet.update", 'put', 'user',
+     lambda ctx, i: (f'/api/comments/{ctx.comment.pk}/', {'description': f"Commentaire modifié {i}"})),
+    ("CommentViewSet.destroy", 'delete', 'user',
+     lambda ctx, i: (f'/api/comments/{Comment.objects.create(description="tmp", issue=ctx.issue, author=ctx.user).pk}/',
+                     None)),
+
+    ("async projects list", 'get', 'user', lambda ctx, i: ('/api/async/projects/', None)),
+    ("async projects detail", 'get', 'user', lambda ctx, i: (f'/api/async/projects/{ctx.project.pk}/', None)),
+    ("async issues list", 'get', 'user', lambda ctx, i: (f'/api/async/issues/?project={ctx.project.pk}', None)),
+    ("async issues detail", 'get', 'user', lambda ctx, i: (f'/api/async/issues/{ctx.issue.pk}/', None)),
+    ("async comments list", 'get', 'user', lambda ctx, i: (f'/api/async/comments/?issue={ctx.issue.pk}', None)),
+    ("async comments detail", 'get', 'user', lambda ctx, i: (f'/api/async/comments/{ctx.comment.pk}/', None)),
+    # flux fermé après la lecture des entrées existantes
+    ("async projects changes stream", 'get', 'user',
+     lambda ctx, i: (f'/api/async/projects/{ctx.project.pk}/changes/?since=0&timeout=0', None)),
+
+    ("MetricsView", 'get', 'admin', lambda ctx, i: ('/api/metrics/', None)),
+]
@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .caching import shared_cache
+
+
+# un token non blacklisté n'est gardé en cache que peu de temps (cache partagé uniquement : avec un cache
+# par processus, une mise en blacklist faite par un autre worker ne serait pas vue, le résultat n'est pas gardé)
+NEGATIVE_CACHE_TIMEOUT = getattr(settings, 'SD_API_BLACKLIST_NEGATIVE_TIMEOUT', 60)  # secondes
+
+
+def _blacklist_key(jti):
+    return f"sd_api:blacklist:{jti}"
+
+
+def _remaining_lifetime(exp):
+    # durée de vie restante du token (au plus REFRESH_TOKEN_LIFETIME), au moins 1 seconde
+    return max(1, int(exp - time.time()))
+
+
+def is_blacklisted(jti, exp):
+    """
+    Blacklist lookup by jti, the DB is only read on a cache miss
+    """
+    blacklisted = cache.get(_blacklist_key(jti))
+    if blacklisted is None:
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if not blacklisted and not shared_cache():
+            return blacklisted
+        timeout = _remaining_lifetime(exp) if blacklisted else min(NEGATIVE_CACHE_TIMEOUT, _remaining_lifetime(exp))
+        cache.set(_blacklist_key(jti), blacklisted, timeout)
+    return blacklisted
+
+
+def mark_blacklisted(jti, exp):
+    cache.set(_blacklist_key(jti), True, _remaining_lifetime(exp))
+
+
+
+def _revoked_key(user_id):
+    return f"sd_api:user_revoked:{user_id}"
+
+
+def revoke_user(user_id):
+    """
+    Access tokens of the user issued until now are refused (user deleted or deactivated)
+    """
+    # gardé la durée de vie d'un access token : les tokens plus anciens ont expiré
+    lifetime = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set(_revoked_key(user_id), int(time.time()), lifetime)
+
+
+def is_revoked(user_id, issued_at):
+    revoked_at = cache.get(_revoked_key(user_id))
+    return revoked_at is not None and issued_at <= revoked_at
@@ -0,0 +1,78 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, 'SD_API_RESPONSE_CACHE_TIMEOUT', 300)  # secondes
+# durée de vie des versions, plus longue que celle des réponses : une version expirée est recréée
+# (nouvelle valeur basée sur l'heure), seules les réponses et ETags construits dessus sont perdus
+VERSION_TIMEOUT = max(getattr(settings, 'SD_API_VERSION_TIMEOUT', 3600), 2 * RESPONSE_CACHE_TIMEOUT)  # secondes
+
+# backends propres à chaque processus : une version incrémentée par un worker n'est pas vue par les autres
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache():
+    """
+    True when the cache is shared between workers: versions, cached responses and memberships can be trusted.
+    SD_API_SHARED_CACHE forces the answer, else it is deduced from the default backend.
+    """
+    shared = getattr(settings, 'SD_API_SHARED_CACHE', None)
+    if shared is None:
+        return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+    return shared
+
+
+def _version_key(name, pk):
+    return f"sd_api:version:{name}:{pk}"
+
+
+def get_versions(name, pks, create=True):
+    """
+    Versions of several objects (ex: 'project'), with a single cache read.
+    Missing versions are created, or None with create=False (object not known to exist yet).
+    """
+    keys = {pk: _version_key(name, pk) for pk in pks}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for pk, key in keys.items():
+        if key not in found and create:
+            # valeur initiale basée sur l'heure : une version évincée ne peut pas réutiliser une ancienne réponse
+            cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+            found[key] = cache.get(key)
+        versions[pk] = found.get(key)
+    return versions
+
+
+def get_version(name, pk, create=True):
+    return get_versions(name, [pk], create)[pk]
+
+
+def bump_version(name, pk):
+    """
+    Invalidate every cached response built on the object
+    """
+    if pk is None:
+        return
+    try:
+        cache.incr(_version_key(name, pk))
+    except ValueError:
+        cache.add(_version_key(name, pk), time.time_ns(), VERSION_TIMEOUT)
+
+
+def response_cache_key(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return f"sd_api:response:{digest}"
+
+
+def invalidate_versions(name, pks):
+    """
+    Invalidate many objects at once (deleted issues of a project): the version keys are dropped,
+    a new time-based version is created on the next read
+    """
+    cache.delete_many([_version_key(name, pk) for pk in pks])
@@ -0,0 +1,140 @@
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import Exists, F, Max, OuterRef
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .deletion import DELETE_BATCH_SIZE, delete_in_batches
+from .enums import ChangeAction
+from .exceptions import CustomBadRequest, CustomGone
+from .models import Project, Change
+
+
+# rétention du journal : les curseurs plus anciens reçoivent une 410 (recharger les collections)
+CHANGES_RETENTION_DAYS = getattr(settings, 'SD_API_CHANGES_RETENTION_DAYS', 7)
+# compactage : seule la dernière entrée de chaque objet est gardée au-delà de ce délai (secondes)
+CHANGES_COMPACT_AFTER = getattr(settings, 'SD_API_CHANGES_COMPACT_AFTER', 3600)
+CHANGES_PAGE_SIZE = getattr(settings, 'SD_API_CHANGES_PAGE_SIZE', 100)
+CHANGES_MAX_PAGE_SIZE = 500
+# entrées plus récentes non servies : un id attribué puis validé après un id plus grand (transactions
+# concurrentes, PostgreSQL) serait sauté par un curseur déjà avancé. Écritures sérialisées avec SQLite : 0
+CHANGES_SETTLE_SECONDS = getattr(settings, 'SD_API_CHANGES_SETTLE_SECONDS', 0)
+# flux SSE : intervalle de lecture du journal et durée maximale d'une connexion (le client se reconnecte
+# avec Last-Event-ID, son token est alors vérifié de nouveau)
+CHANGES_POLL_INTERVAL = getattr(settings, 'SD_API_CHANGES_POLL_INTERVAL', 1.0)
+CHANGES_STREAM_TIMEOUT = getattr(settings, 'SD_API_CHANGES_STREAM_TIMEOUT', 300)
+
+# champs internes absents des réponses de l'API
+EXCLUDED_FIELDS = {'is_hidden', 'changes_horizon'}
+
+
+def change_values(instance):
+    """
+    Field values of the object as in the API (foreign keys as ids)
+    """
+    return {field.name: field.value_from_object(instance) for field in instance._meta.concrete_fields
+            if field.name not in EXCLUDED_FIELDS}
+
+
+def change_row(instance, action, project_id):
+    return Change(project_id=project_id, object_type=instance._meta.model_name, object_id=str(instance.pk),
+                  action=action.value, data=None if action is ChangeAction.DELETE else change_values(instance))
+
+
+def record_change(instance, action, project_id):
+    change_row(instance, action, project_id).save()
+
+
+def record_changes(instances, action, project_id=attrgetter('project_id')):
+    """
+    Log of the objects of a bulk_create / raw update (no signals), project_id(instance) gives their project
+    """
+    Change.objects.bulk_create([change_row(instance, action, project_id(instance)) for instance in instances])
+
+
+def parse_cursor(value):
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise CustomBadRequest("Le curseur doit être un nombre entier")
+    return int(value)
+
+
+def parse_limit(value):
+    if not value:
+        return CHANGES_PAGE_SIZE
+    if not value.isdigit() or int(value) == 0:
+        raise CustomBadRequest("limit doit être un nombre entier positif")
+    return min(int(value), CHANGES_MAX_PAGE_SIZE)
+
+
+def check_cursor(since, horizon):
+    if since < horizon:
+        raise CustomGone("Curseur expiré : recharger les collections puis repartir du curseur courant")
+
+
+def changes_since(project_id, since):
+    """
+    Entries of the project after the cursor, oldest first
+    """
+    queryset = Change.objects.filter(project_id=project_id, id__gt=since).order_by('id')
+    if CHANGES_SETTLE_SECONDS:
+        queryset = queryset.filter(created_time__lte=timezone.now() - timedelta(seconds=CHANGES_SETTLE_SECONDS))
+    return queryset
+
+
+def current_cursor(project):
+    """
+    Cursor of the latest entry of the project: start point of a client that has just loaded the collections
+    """
+    cursor = Change.objects.filter(project_id=project.pk).aggregate(cursor=Max('id'))['cursor']
+    return max(cursor or 0, project.changes_horizon)
+
+
+async def acurrent_cursor(project_id, horizon):
+    cursor = (await Change.objects.filter(project_id=project_id).aaggregate(cursor=Max('id')))['cursor']
+    return max(cursor or 0, horizon)
+
+
+def serialize_change(change):
+    # create et update : l'état de l'objet, à appliquer comme un upsert (compactage)
+    return {
+        'id': change.id,
+        'object_type': change.object_type,
+        'object_id': change.object_id,
+        'action': ChangeAction(change.action).name.lower(),
+        'data': change.data,
+        'created_time': change.created_time,
+    }
+
+
+def compact_changes(batch_size=DELETE_BATCH_SIZE, older_than=None):
+    """
+    Deletes the entries replaced by a more recent entry of the same object in the same project
+    (the latest state is kept: delta reads from any cursor stay complete) and the entries of deleted projects.
+    Returns the number of deleted rows.
+    """
+    older_than = older_than or timezone.now() - timedelta(seconds=CHANGES_COMPACT_AFTER)
+    newer = Change.objects.filter(project_id=OuterRef('project_id'), object_type=OuterRef('object_type'),
+                                  object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+    queryset = Change.objects.filter(Exists(newer), created_time__lt=older_than).order_by()
+    deleted = delete_in_batches(queryset, batch_size)
+    # entrées d'un projet supprimé (cascade depuis son auteur)
+    orphans = Change.objects.filter(~Exists(Project.objects.filter(pk=OuterRef('project_id')))).order_by()
+    return deleted + delete_in_batches(orphans, batch_size)
+
+
+def purge_old_changes(batch_size=DELETE_BATCH_SIZE, keep_days=None):
+    """
+    Retention: deletes the entries older than keep_days and moves the horizon of their projects,
+    so that older cursors are refused instead of silently missing changes. Returns the number of deleted rows.
+    """
+    keep_days = CHANGES_RETENTION_DAYS if keep_days is None else keep_days
+    expired = Change.objects.filter(created_time__lt=timezone.now() - timedelta(days=keep_days)).order_by()
+    horizons = list(expired.values('project_id').annotate(horizon=Max('id')).values_list('project_id', 'horizon'))
+    for project_id, horizon in horizons:
+        # horizon déplacé avant la suppression : aucun curseur ne passe entre les deux
+        Project.objects.filter(pk=project_id).update(changes_horizon=Greatest(F('changes_horizon'), horizon))
+    return delete_in_batches(expired, batch_size)
@@ -0,0 +1,112 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from .enums import CustomStatus, IssuePriority, IssueTag
+from .models import ProjectCounter
+
+
+# champs de l'issue comptés par valeur (clé du compteur : "<champ>:<valeur>")
+COUNTED_FIELDS = {
+    'status': CustomStatus,
+    'priority': IssuePriority,
+    'tag': IssueTag,
+}
+
+
+def issue_counter_keys(issue_values):
+    """
+    Counter keys of an issue, issue_values : {'status': ..., 'priority': ..., 'tag': ...}
+    """
+    return ['issues'] + [f'{field}:{issue_values[field]}' for field in COUNTED_FIELDS]
+
+
+def issue_values(issue):
+    return {field: getattr(issue, field) for field in COUNTED_FIELDS}
+
+
+def issue_deltas(issues, sign=1):
+    """
+    Counter deltas for created (sign=1) or deleted (sign=-1) issues
+    """
+    deltas = defaultdict(int)
+    for issue in issues:
+        for key in issue_counter_keys(issue_values(issue)):
+            deltas[(issue.project_id, key)] += sign
+    return deltas
+
+
+def comment_deltas(comments, sign=1):
+    """
+    Counter deltas for created / deleted comments (issue with its project already loaded)
+    """
+    deltas = defaultdict(int)
+    for comment in comments:
+        deltas[(comment.issue.project_id, 'comments')] += sign
+    return deltas
+
+
+def apply_counter_deltas(deltas):
+    """
+    Apply {(project_id, key): delta}, one UPDATE per project
+    """
+    by_project = defaultdict(dict)
+    for (project_id, key), delta in deltas.items():
+        if delta and project_id is not None:
+            by_project[project_id][key] = by_project[project_id].get(key, 0) + delta
+
+    for project_id, key_deltas in by_project.items():
+        queryset = ProjectCounter.objects.filter(project_id=project_id, key__in=key_deltas)
+        increment = Case(*[When(key=key, then=Value(delta)) for key, delta in key_deltas.items()],
+                         default=Value(0))
+        updated = queryset.update(count=F('count') + increment)
+        if updated < len(key_deltas):
+            # compteurs pas encore créés pour ce projet (en cas de création concurrente,
+            # reconcile_project_counters remet les valeurs exactes). Jamais depuis une suppression :
+            # le projet peut être supprimé dans la même transaction (compteurs déjà supprimés)
+            existing = set(queryset.values_list('key', flat=True))
+            missing = [ProjectCounter(project_id=project_id, key=key, count=delta)
+                       for key, delta in key_deltas.items() if key not in existing and delta > 0]
+            if missing:
+                ProjectCounter.objects.bulk_create(missing, ignore_conflicts=True)
+
+
+def get_project_stats(project_id):
+    """
+    Statistics of a project read from its counters (O(1) : one row per key)
+    """
+    counts = dict(ProjectCounter.objects.filter(project_id=project_id).values_list('key', 'count'))
+    stats = {'project': project_id, 'issues': counts.get('issues', 0), 'comments': counts.get('comments', 0)}
+    for field, enum in COUNTED_FIELDS.items():
+        stats[field] = {item.value: counts.get(f'{field}:{item.value}', 0) for item in enum}
+    return stats
+
+
+def rebuild_counters(issue_model, counter_model, project_ids=None):
+    """
+    Rebuild the counters with a single grouped aggregate query
+    (models as parameters : also used by the migration with the historical models)
+    """
+    aggregates = {
+        'issues': Count('id', distinct=True),
+        'comments': Count('comments', distinct=True),
+    }
+    for field, enum in COUNTED_FIELDS.items():
+        for item in enum:
+            aggregates[f'{field}:{item.value}'] = Count('id', filter=Q(**{field: item.value}), distinct=True)
+
+    issues = issue_model.objects.all()
+    if project_ids is not None:
+        issues = issues.filter(project_id__in=project_ids)
+    rows = issues.values('project_id').annotate(**aggregates).order_by()
+
+    counters = [counter_model(project_id=row['project_id'], key=key, count=row[key])
+                for row in rows for key in aggregates]
+    with transaction.atomic():
+        existing = counter_model.objects.all()
+        if project_ids is not None:
+            existing = existing.filter(project_id__in=project_ids)
+        existing.delete()
+        counter_model.objects.bulk_create(counters)
+    return len(counters)
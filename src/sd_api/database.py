@@ -0,0 +1,91 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .caching import shared_cache
+
+
+REPLICA_ALIAS = 'replica'
+# lectures d'un utilisateur envoyées au primaire après une écriture (retard de réplication)
+STICKY_SECONDS = getattr(settings, 'SD_API_REPLICA_STICKY_SECONDS', 10)
+# journal WAL des fichiers SQLite (réécrit l'en-tête du fichier : désactivé par défaut, la base livrée reste intacte)
+SQLITE_WAL = getattr(settings, 'SD_API_SQLITE_WAL', False)
+
+# base des lectures de la requête en cours (None : primaire), propagée aux threads de sync_to_async
+read_database = ContextVar('sd_api_read_database', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def replica_reads():
+    # marqueur read-your-writes dans le cache : avec un cache par processus, l'écriture faite par un autre
+    # worker ne serait pas vue, les lectures restent sur le primaire
+    return replica_configured() and shared_cache()
+
+
+def sticky_key(user_id):
+    return f"sd_api:replica:sticky:{user_id}"
+
+
+def mark_sticky(request):
+    """
+    Read-your-writes: the next reads of the user go to the primary for STICKY_SECONDS
+    """
+    user = getattr(request, 'user', None)
+    if replica_reads() and user is not None and user.is_authenticated:
+        cache.set(sticky_key(user.pk), True, STICKY_SECONDS)
+
+
+def read_alias(request):
+    """
+    Database of the reads of a list / retrieve request: the replica, unless the user has just written
+    (primary without a shared cache)
+    """
+    if not replica_reads():
+        return None
+    if request.user and request.user.is_authenticated and cache.get(sticky_key(request.user.pk)):
+        return None
+    return REPLICA_ALIAS
+
+
+async def aread_alias(request):
+    if not replica_reads():
+        return None
+    if request.user and request.user.is_authenticated and await cache.aget(sticky_key(request.user.pk)):
+        return None
+    return REPLICA_ALIAS
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes on the primary ('default'), reads on the replica only inside the list / retrieve actions
+    of the sd_api viewsets (ReplicaReadMixin), never inside a transaction of the primary
+    """
+    def db_for_read(self, model, **hints):
+        alias = read_database.get()
+        if alias is None or connections['default'].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # mêmes données sur le primaire et le réplica
+        return True
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created (SD_API_SQLITE_WAL): WAL journal (readers do not block the writer)
+    and fewer fsync for the SQLite files
+    """
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    # connexion sqlite3 brute : hors journal des requêtes et des compteurs de métriques
+    connection.connection.execute('PRAGMA journal_mode=WAL')
+    connection.connection.execute('PRAGMA synchronous=NORMAL')
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Sum
+
+from .caching import bump_version, invalidate_versions
+from .counters import apply_counter_deltas
+from .membership import invalidate_membership
+from .models import Project, Contributor, Issue, Comment, ProjectCounter
+from .tasks import heartbeat, task
+
+
+# 'collector' : instance.delete() de Django (objets liés chargés en mémoire pour les signaux)
+# 'bulk' : DELETE par lots des commentaires / issues, signaux reproduits explicitement ; au-delà de
+# DEFER_DELETE_ABOVE issues + commentaires le projet est masqué et purgé par une tâche comme en 'deferred'
+# 'deferred' : projet masqué immédiatement, supprimé par lots ensuite par une tâche (python manage.py run_tasks)
+DELETE_MODE = getattr(settings, 'SD_API_DELETE_MODE', 'bulk')
+DELETE_BATCH_SIZE = getattr(settings, 'SD_API_DELETE_BATCH_SIZE', 1000)
+DEFER_DELETE_ABOVE = getattr(settings, 'SD_API_DEFER_DELETE_ABOVE', 10000)
+
+
+def raw_delete(queryset, using):
+    """
+    DELETE of the rows of the queryset in one statement, no objects loaded, no signals, no cascade
+    (the Collector's fast delete). Returns the number of deleted rows.
+    """
+    # QuerySet._raw_delete est privé : seul appel du projet, vérifié avec Django 5.0.7 (requirements.txt),
+    # à revérifier à chaque montée de version. QuerySet.delete() ne convient pas : Comment et Contributor ont
+    # des receivers post_delete, le Collector chargerait alors chaque ligne pour envoyer les signaux.
+    return queryset._raw_delete(using)
+
+
+def delete_in_batches(queryset, batch_size=DELETE_BATCH_SIZE, after_batch=None):
+    """
+    Deletes the rows of the queryset by batches of primary keys, with raw DELETEs (no objects loaded, no signals).
+    after_batch(pks) runs in the transaction of each batch. Returns the number of deleted rows.
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    queryset = queryset.using(using)
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic(using=using):
+            # suppression SQL directe, comme le fast delete du Collector (FTS : triggers SQLite)
+            deleted += raw_delete(model._base_manager.using(using).filter(pk__in=pks), using)
+            if after_batch is not None:
+                after_batch(pks)
+        # tâche de purge : le worker reste propriétaire de la tâche pendant les longues suppressions
+        heartbeat()
+
+
+def delete_contributors(project):
+    """
+    Raw delete of the contributors of the project, returns their user ids (memberships to invalidate)
+    """
+    using = router.db_for_write(Contributor)
+    queryset = Contributor.objects.using(using).filter(project_id=project.pk)
+    user_ids = list(queryset.values_list('user_id', flat=True))
+    raw_delete(queryset, using)
+    return user_ids
+
+
+def bulk_delete_issue(issue, batch_size=DELETE_BATCH_SIZE):
+    def comments_deleted(pks):
+        apply_counter_deltas({(issue.project_id, 'comments'): -len(pks)})
+
+    delete_in_batches(Comment.objects.filter(issue_id=issue.pk), batch_size, comments_deleted)
+    # plus de commentaires à charger : signaux de l'issue seule (compteurs, versions)
+    issue.delete()
+
+
+def bulk_delete_project(project, batch_size=DELETE_BATCH_SIZE):
+    """
+    Deletes the comments, issues and contributors of the project by batches, then the project.
+    The counters of the project are deleted with it, the caches are invalidated like the signals would.
+    """
+    delete_in_batches(Comment.objects.filter(issue__project_id=project.pk), batch_size)
+    delete_in_batches(Issue.objects.filter(project_id=project.pk), batch_size,
+                      lambda pks: transaction.on_commit(lambda: invalidate_versions('issue', pks)))
+    for user_id in delete_contributors(project):
+        invalidate_membership(user_id)
+    # compteurs supprimés en cascade (sans signaux), version du projet incrémentée par project_changed
+    project.delete()
+
+
+def hide_project(project):
+    """
+    Soft delete: the project disappears at once (contributors removed, hidden for the admins),
+    its rows are deleted later by purge_hidden_projects
+    """
+    with transaction.atomic():
+        Project.objects.filter(pk=project.pk).update(is_hidden=True)
+        user_ids = delete_contributors(project)
+    for user_id in user_ids:
+        invalidate_membership(user_id)
+    bump_version('project', project.pk)
+    # réponses des issues en cache (servies aux admins sans vérification d'appartenance)
+    issue_ids = list(Issue.objects.filter(project_id=project.pk).values_list('pk', flat=True))
+    for start in range(0, len(issue_ids), DELETE_BATCH_SIZE):
+        invalidate_versions('issue', issue_ids[start:start + DELETE_BATCH_SIZE])
+
+
+@task(max_attempts=5, retry_delay=60)
+def purge_project(project_id):
+    project = Project.objects.filter(pk=project_id, is_hidden=True).first()
+    if project is not None:
+        bulk_delete_project(project)
+
+
+def purge_hidden_projects(batch_size=DELETE_BATCH_SIZE):
+    """
+    Deletes the hidden projects (their purge task failed or was lost), returns their number
+    """
+    purged = 0
+    for project in Project.objects.filter(is_hidden=True).order_by('pk'):
+        bulk_delete_project(project, batch_size)
+        purged += 1
+    return purged
+
+
+def project_size(project):
+    """
+    Number of issues and comments of the project, read from its counters
+    """
+    counters = ProjectCounter.objects.filter(project_id=project.pk, key__in=('issues', 'comments'))
+    return counters.aggregate(size=Sum('count'))['size'] or 0
+
+
+def delete_project(project, mode=None):
+    mode = mode or DELETE_MODE
+    if mode == 'bulk' and project_size(project) > DEFER_DELETE_ABOVE:
+        mode = 'deferred'
+    if mode == 'deferred':
+        hide_project(project)
+        purge_project.delay(project_id=project.pk)
+    elif mode == 'bulk':
+        bulk_delete_project(project)
+    else:
+        project.delete()
+
+
+def delete_issue(issue, mode=None):
+    # pas de masquage pour une issue : suppression par lots dès que le mode n'est pas 'collector'
+    if (mode or DELETE_MODE) == 'collector':
+        issue.delete()
+    else:
+        bulk_delete_issue(issue)
@@ -40,3 +40,24 @@ class CustomStatus(Enum):
     @classmethod
     def choices(cls) -> list[tuple[str, str]]:
         return [(item.value, item.name.title()) for item in cls]
+
+
+class TaskStatus(Enum):
+    PENDING = 'PEND'
+    RUNNING = 'RUN'
+    DONE = 'DONE'
+    FAILED = 'FAIL'
+
+    @classmethod
+    def choices(cls) -> list[tuple[str, str]]:
+        return [(item.value, item.name.title()) for item in cls]
+
+
+class ChangeAction(Enum):
+    CREATE = 'CRE'
+    UPDATE = 'UPD'
+    DELETE = 'DEL'
+
+    @classmethod
+    def choices(cls) -> list[tuple[str, str]]:
+        return [(item.value, item.name.title()) for item in cls]
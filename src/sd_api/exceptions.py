@@ -39,3 +39,12 @@ class CustomBadRequest(APIException):
     Exception when bad request.
     """
     status_code = status.HTTP_400_BAD_REQUEST
+
+
+class CustomGone(APIException):
+    """
+    Exception when a resource is no longer available (ex : expired cursor)
+    """
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Ressource expirée'
+    default_code = 'gone'
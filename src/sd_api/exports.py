@@ -0,0 +1,100 @@
+import csv
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from rest_framework import serializers as drf_serializers
+
+from .models import Issue, Comment
+from .serializers import IssueSerializer, CommentSerializer
+from .exceptions import CustomBadRequest
+from .renderers import dumps
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# champs calculés des serializers (SerializerMethodField) => expression SQL exportée à la place.
+# Commentaires : la colonne "project" est l'id du projet seul, pas l'objet {id, name, description} de l'API
+COMPUTED_FIELDS = {
+    CommentSerializer: {'project': F('issue__project_id')},
+}
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer, the written line is returned instead of being stored
+    """
+    def write(self, value):
+        return value
+
+
+class RowExporter:
+    """
+    Rows of a serializer's field set read with .values(), without a serializer instance per row
+    """
+    def __init__(self, row_type, serializer_class):
+        self.row_type = row_type
+        self.fields = list(serializer_class.Meta.fields)
+        self.computed = COMPUTED_FIELDS.get(serializer_class, {})
+        # un seul serializer instancié pour récupérer la représentation des champs (dates...)
+        serializer_fields = serializer_class().fields
+        self.converters = {
+            name: field.to_representation
+            for name, field in serializer_fields.items()
+            if isinstance(field, (drf_serializers.DateTimeField, drf_serializers.UUIDField))
+        }
+
+    def iter_rows(self, queryset):
+        queryset = queryset.annotate(**{f'export_{name}': expression for name, expression in self.computed.items()})
+        value_names = [f'export_{name}' if name in self.computed else name for name in self.fields]
+        for values in queryset.values_list(*value_names).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            row = {'type': self.row_type}
+            for name, value in zip(self.fields, values):
+                if value is not None and name in self.converters:
+                    value = self.converters[name](value)
+                row[name] = value
+            yield row
+
+
+def project_export_rows(project):
+    issues = Issue.objects.filter(project=project).order_by('created_time', 'pk')
+    comments = Comment.objects.filter(issue__project=project).order_by('created_time', 'pk')
+    issue_exporter = RowExporter('issue', IssueSerializer)
+    comment_exporter = RowExporter('comment', CommentSerializer)
+    columns = ['type'] + issue_exporter.fields + [name for name in comment_exporter.fields
+                                                  if name not in issue_exporter.fields]
+    rows = (row for exporter, queryset in ((issue_exporter, issues), (comment_exporter, comments))
+            for row in exporter.iter_rows(queryset))
+    return columns, rows
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def stream_csv(columns, rows):
+    writer = csv.DictWriter(Echo(), fieldnames=columns)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', lambda columns, rows: stream_ndjson(rows)),
+    'csv': ('text/csv', stream_csv),
+}
+
+
+def project_export_response(project, output='ndjson'):
+    """
+    Streamed export of every issue and comment of the project, memory stays flat.
+    One row per object with a "type" column ('issue' / 'comment'); foreign keys, including the
+    "project" of the comments, are exported as bare ids.
+    """
+    if output not in EXPORT_FORMATS:
+        raise CustomBadRequest(f"Format d'export inconnu, valeurs possibles : {', '.join(EXPORT_FORMATS)}")
+    content_type, stream = EXPORT_FORMATS[output]
+    columns, rows = project_export_rows(project)
+    response = StreamingHttpResponse(stream(columns, rows), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="project-{project.pk}.{output}"'
+    return response
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers as drf_serializers
+from rest_framework.settings import api_settings
+
+from .metrics import serialization_timer
+from .serializers import CommentSerializer, sparse_field_names
+
+
+# champs dont la représentation DRF est la valeur lue en base (pas de conversion)
+IDENTITY_FIELDS = (
+    drf_serializers.IntegerField,
+    drf_serializers.CharField,
+    drf_serializers.ChoiceField,
+    drf_serializers.BooleanField,
+    drf_serializers.PrimaryKeyRelatedField,
+)
+# champs convertis avec le to_representation du champ DRF (format des dates, UUID...)
+CONVERTED_FIELDS = (
+    drf_serializers.DateTimeField,
+    drf_serializers.UUIDField,
+)
+
+# champs calculés (SerializerMethodField) : colonnes lues et construction de la valeur
+METHOD_FIELDS = {
+    # colonnes annotées par CommentViewSet.get_queryset, même valeur que CommentSerializer.get_project
+    (CommentSerializer, 'project'): (
+        ('issue__project_id', 'project_name', 'project_description'),
+        lambda row, tz: {
+            "id": row['issue__project_id'],
+            "name": row['project_name'],
+            "description": row['project_description'],
+        },
+    ),
+}
+
+
+def is_iso_datetime_field(field):
+    """
+    DateTimeField rendered in ISO 8601 in the current timezone (DRF default)
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    return (settings.USE_TZ and not hasattr(field, 'timezone')
+            and isinstance(output_format, str) and output_format.lower() == ISO_8601)
+
+
+def iso_datetime(value, tz):
+    # même résultat que DateTimeField.to_representation, le fuseau courant est lu une fois par page
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class ValuesSerializer:
+    """
+    Read-only representation of a ModelSerializer's fields built from .values() rows.
+    Columns and converters are computed once per serializer class, the output is the same as serializer.data
+    """
+    _mappings = {}
+
+    def __init__(self, serializer_class, field_names):
+        mapping = self.get_mapping(serializer_class)
+        self.fields = [(name, *mapping[name]) for name in field_names]
+        self.columns = ['pk', 'created_time']  # curseur de la pagination keyset
+        for name, columns, build in self.fields:
+            self.columns.extend(column for column in columns if column not in self.columns)
+
+    @classmethod
+    def for_request(cls, serializer_class, request):
+        """
+        None when a field of the serializer has no fast representation (normal serializer then)
+        """
+        mapping = cls.get_mapping(serializer_class)
+        if mapping is None:
+            return None
+        return cls(serializer_class, sparse_field_names(request, mapping))
+
+    @classmethod
+    def get_mapping(cls, serializer_class):
+        if serializer_class not in cls._mappings:
+            cls._mappings[serializer_class] = cls.build_mapping(serializer_class)
+        return cls._mappings[serializer_class]
+
+    @staticmethod
+    def build_mapping(serializer_class):
+        """
+        {field name: (columns, build(row, tz))}, or None if a field is not supported
+        """
+        mapping = {}
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if (serializer_class, name) in METHOD_FIELDS:
+                mapping[name] = METHOD_FIELDS[(serializer_class, name)]
+            elif isinstance(field, drf_serializers.SerializerMethodField) or '.' in field.source:
+                return None
+            elif isinstance(field, drf_serializers.DateTimeField) and is_iso_datetime_field(field):
+                mapping[name] = ((field.source,), lambda row, tz, source=field.source: iso_datetime(row[source], tz))
+            elif isinstance(field, CONVERTED_FIELDS):
+                mapping[name] = ((field.source,), lambda row, tz, source=field.source,
+                                 convert=field.to_representation: None if row[source] is None else convert(row[source]))
+            elif isinstance(field, IDENTITY_FIELDS):
+                mapping[name] = ((field.source,), lambda row, tz, source=field.source: row[source])
+            else:
+                return None
+        return mapping
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, rows):
+        fields = self.fields
+        tz = timezone.get_current_timezone()
+        with serialization_timer():
+            return [{name: build(row, tz) for name, columns, build in fields} for row in rows]
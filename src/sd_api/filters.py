@@ -1,22 +1,49 @@
 import django_filters
+from .enums import IssuePriority, IssueTag, CustomStatus
 from .models import Issue, Comment
+from .search import search_issues, search_comments
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class ChoiceInFilter(django_filters.BaseInFilter, django_filters.ChoiceFilter):
+    pass
 
 
 class IssueFilter(django_filters.FilterSet):
     project = django_filters.NumberFilter(field_name='project',  lookup_expr='exact')
-    # priority = django_filters.ChoiceFilter(choices=Issue.Priority.choices())
-    # tag = django_filters.ChoiceFilter(choices=Issue.Tag.choices())
-    # status = django_filters.ChoiceFilter(choices=Issue.Status.choices())
+    # valeurs multiples séparées par des virgules, ex : ?priority=HIGH,MED&status=TODO
+    # (index (project, <champ>, created_time) : cf. Issue.Meta.indexes)
+    priority = ChoiceInFilter(choices=IssuePriority.choices())
+    tag = ChoiceInFilter(choices=IssueTag.choices())
+    status = ChoiceInFilter(choices=CustomStatus.choices())
+    assignee = NumberInFilter(field_name='assignee')
+    author = NumberInFilter(field_name='author')
+    # ?created_time_after=2024-01-01T00:00:00&created_time_before=...
+    created_time = django_filters.IsoDateTimeFromToRangeFilter()
+    # recherche plein texte (titre / description), résultats classés par pertinence
+    search = django_filters.CharFilter(method='filter_search')
+    # ?ordering=-created_time (ignoré par la pagination keyset, triée sur created_time)
+    ordering = django_filters.OrderingFilter(fields=('created_time', 'updated_time', 'title', 'id'))
 
     class Meta:
         model = Issue
-        fields = ['project']  # , 'priority', 'tag', 'status']
+        fields = ['project', 'priority', 'tag', 'status', 'assignee', 'author', 'created_time']
+
+    def filter_search(self, queryset, name, value):
+        return search_issues(queryset, value)
 
 
 class CommentFilter(django_filters.FilterSet):
     issue = django_filters.NumberFilter(field_name='issue', lookup_expr='exact')
     project = django_filters.NumberFilter(field_name='issue__project', lookup_expr='exact')
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Comment
         fields = ['issue', 'project']
+
+    def filter_search(self, queryset, name, value):
+        return search_comments(queryset, value)
@@ -0,0 +1,79 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher,
+                                         make_password, verify_password)
+
+
+# nombre de hachages simultanés par processus (0 : hachage dans le thread de la requête)
+HASH_WORKERS = getattr(settings, 'SD_API_PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+
+
+# mêmes noms d'algorithme que Django : les hash existants restent vérifiables,
+# un changement de paramètres est détecté par must_update et donne un rehash à la connexion
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = getattr(settings, 'SD_API_SCRYPT_WORK_FACTOR', 2 ** 14)
+    block_size = getattr(settings, 'SD_API_SCRYPT_BLOCK_SIZE', 8)
+    parallelism = getattr(settings, 'SD_API_SCRYPT_PARALLELISM', 1)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id (pip install argon2-cffi), one lane per hash: the pool runs the hashes in parallel
+    """
+    time_cost = getattr(settings, 'SD_API_ARGON2_TIME_COST', 2)
+    memory_cost = getattr(settings, 'SD_API_ARGON2_MEMORY_COST', 19456)  # Kio
+    parallelism = getattr(settings, 'SD_API_ARGON2_PARALLELISM', 1)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = getattr(settings, 'SD_API_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+_executor = None
+_executor_pid = None
+
+
+def get_executor():
+    """
+    Bounded pool of the process (recreated after a fork: the threads are not inherited)
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='sd_api-hash')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def run_hashing(func, *args):
+    """
+    Run a hashing function in the pool: at most HASH_WORKERS hashes use the CPU at the same time
+    (hashlib / argon2 release the GIL)
+    """
+    if not HASH_WORKERS:
+        return func(*args)
+    return get_executor().submit(func, *args).result()
+
+
+async def arun_hashing(func, *args):
+    """
+    Async version of run_hashing: the event loop is not blocked during the hash
+    """
+    if not HASH_WORKERS:
+        return func(*args)
+    return await asyncio.wrap_future(get_executor().submit(func, *args))
+
+
+def verify_and_rehash(raw_password, encoded):
+    """
+    Check the password and, if the hasher or its parameters have changed, compute the new hash
+    (in the same pool job: the save is done by the calling thread)
+    """
+    is_correct, must_update = verify_password(raw_password, encoded)
+    if is_correct and must_update:
+        return True, make_password(raw_password)
+    return is_correct, None
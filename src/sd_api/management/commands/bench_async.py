@@ -0,0 +1,84 @@
+import asyncio
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from sd_api.benchmarks import isolated_cache
+from sd_api.models import CustomUser, Contributor, Issue
+from sd_api.mixins import ResponseCacheMixin
+from sd_api.throttles import CombinedRateThrottle
+
+
+def bypass_response_cache(self, key, handler, request, *args, check=None, **kwargs):
+    return handler(request, *args, **kwargs)
+
+
+class Command(BaseCommand):
+    help = "Load benchmark of the async read path against the sync viewsets (requests/sec and p99 latency)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="ID of the user making the requests")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--with-response-cache', action='store_true',
+                            help="Keep the response cache of the sync project / issue views")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        issue = Issue.objects.filter(project__contributors__user=user).first()
+        paths = ['projects/', 'issues/']
+        if issue is not None:
+            paths += [f'issues/?project={issue.project_id}', f'comments/?issue={issue.pk}']
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+        with ExitStack() as stack:
+            # cache dédié : le cache courant (partagé avec les workers) n'est ni lu ni vidé
+            stack.enter_context(isolated_cache())
+            # pas de limitation pendant la mesure
+            stack.enter_context(mock.patch.object(CombinedRateThrottle, 'THROTTLE_RATES', {}))
+            stack.enter_context(override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']))
+            if not options['with_response_cache']:
+                stack.enter_context(mock.patch.object(ResponseCacheMixin, 'cached_response', bypass_response_cache))
+            for path in paths:
+                for name, prefix in (("sync ", '/api/'), ("async", '/api/async/')):
+                    cache.clear()
+                    rps, p99, errors = asyncio.run(self.run_load(
+                        f'{prefix}{path}', headers, options['requests'], options['concurrency']))
+                    self.stdout.write(f"{name} {path:<30} {rps:8.1f} req/s   p99 {p99 * 1000:7.1f} ms"
+                                      + (f"   {errors} erreur(s)" if errors else ""))
+
+    def get_user(self, user_id):
+        queryset = CustomUser.objects.filter(pk=user_id) if user_id else CustomUser.objects.filter(
+            pk__in=Contributor.objects.values('user_id'))
+        user = queryset.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur contributeur trouvé")
+        return user
+
+    async def run_load(self, path, headers, nb_requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(nb_requests)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return nb_requests / elapsed, p99, errors
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from sd_api.authentication import ClaimsJWTAuthentication, ClaimsRefreshToken
+from sd_api.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Queries and latency per request of JWTAuthentication against ClaimsJWTAuthentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="ID of the authenticated user")
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(pk=options['user']).first() if options['user'] else CustomUser.objects.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur trouvé")
+        token = ClaimsRefreshToken.for_user(user).access_token
+        factory = APIRequestFactory()
+        nb_requests = options['requests']
+
+        results = {}
+        for authentication_class in (JWTAuthentication, ClaimsJWTAuthentication):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                for _ in range(nb_requests):
+                    request = Request(factory.get('/api/projects/', HTTP_AUTHORIZATION=f'Bearer {token}'),
+                                      authenticators=[authentication_class()])
+                    # même accès que les vues : pk et droits
+                    request.user.pk, request.user.is_staff, request.user.is_superuser
+                elapsed = time.perf_counter() - start
+            results[authentication_class.__name__] = (len(context.captured_queries) / nb_requests,
+                                                      elapsed / nb_requests * 1e6)
+
+        for name, (queries, latency) in results.items():
+            self.stdout.write(f"{name:<25} {queries:.2f} requête(s) SQL   {latency:7.1f} µs / requête")
+        (_, (base_queries, base_latency)), (_, (queries, latency)) = results.items()
+        self.stdout.write(f"Gain : {base_queries - queries:.2f} requête(s) SQL et "
+                          f"{base_latency - latency:.1f} µs par requête")
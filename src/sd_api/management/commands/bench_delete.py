@@ -0,0 +1,87 @@
+import gc
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from sd_api.benchmarks import isolated_cache
+from sd_api.deletion import DELETE_BATCH_SIZE, delete_project, delete_issue, purge_hidden_projects
+from sd_api.models import CustomUser, Project, Contributor, Issue, Comment
+
+
+class Command(BaseCommand):
+    help = ("Benchmark of the deletion of a large project / issue (test database): Django collector against "
+            "batched deletes and deferred deletion (time, peak memory, SQL queries)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issues', type=int, default=200, help="Issues of the deleted project")
+        parser.add_argument('--comments-per-issue', type=int, default=50)
+        parser.add_argument('--contributors', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        # base de test et cache dédiés : la base et le cache courants ne sont jamais modifiés
+        old_name = connection.settings_dict['NAME']
+        with isolated_cache():
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                # DEBUG : pas de journal des requêtes SQL pendant la mesure
+                with override_settings(DEBUG=False):
+                    self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                cache.clear()
+
+    def run(self, options):
+        users = CustomUser.objects.bulk_create([CustomUser(username=f'bench-delete-{index}', age=30)
+                                                for index in range(options['contributors'])])
+        self.stdout.write(f"projet : {options['issues']} issues x {options['comments_per_issue']} commentaires, "
+                          f"issue : {options['issues'] * options['comments_per_issue']} commentaires")
+        self.stdout.write(f"{'cas':<28} {'temps s':>9} {'mém. Mo':>9} {'req.':>7}")
+        for mode in ('collector', 'bulk', 'deferred'):
+            project = self.create_project(users, options['issues'], options['comments_per_issue'])
+            self.measure(f"projet {mode}", lambda: delete_project(project, mode))
+            if mode == 'deferred':
+                self.measure("  purge différée", lambda: purge_hidden_projects(options['batch_size']))
+        for mode in ('collector', 'bulk'):
+            # même nombre de commentaires que le projet, sur une seule issue
+            project = self.create_project(users, 1, options['issues'] * options['comments_per_issue'])
+            issue = project.issues.get()
+            self.measure(f"issue {mode}", lambda: delete_issue(issue, mode))
+            project.delete()
+
+    def create_project(self, users, nb_issues, comments_per_issue):
+        author = users[0]
+        project = Project.objects.create(name="Projet à supprimer", description="desc", type='BAE', author=author)
+        Contributor.objects.bulk_create([Contributor(project=project, user=user) for user in users])
+        Issue.objects.bulk_create([Issue(title=f"Issue {index}", description="desc " * 20, project=project,
+                                         author=author, assignee=author, priority='LOW', tag='BUG')
+                                   for index in range(nb_issues)])
+        for issue_id in project.issues.values_list('pk', flat=True):
+            Comment.objects.bulk_create([Comment(description="commentaire " * 10, issue_id=issue_id, author=author)
+                                         for _ in range(comments_per_issue)], batch_size=1000)
+        return project
+
+    def measure(self, name, delete):
+        nb_queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            # compteur seul : le texte des requêtes (listes IN du collector) fausserait la mémoire mesurée
+            nonlocal nb_queries
+            nb_queries += 1
+            return execute(sql, params, many, context)
+
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                delete()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(f"{name:<28} {elapsed:>9.3f} {peak / 1024 / 1024:>9.1f} {nb_queries:>7}")
@@ -0,0 +1,189 @@
+import gc
+import itertools
+import json
+import time
+import tracemalloc
+from contextlib import ExitStack
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from sd_api.benchmarks import SCENARIOS, BenchContext, generate_dataset, isolated_cache
+from sd_api.mixins import ResponseCacheMixin
+from sd_api.throttles import CombinedRateThrottle
+
+
+def bypass_response_cache(self, key, handler, request, *args, check=None, **kwargs):
+    return handler(request, *args, **kwargs)
+
+
+async def consume(chunks):
+    async for _ in chunks:
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Command(BaseCommand):
+    help = ("Regression benchmark of every sd_api route on a generated dataset (test database): "
+            "SQL queries, p50/p95/p99 latency and peak memory per endpoint, compared to a JSON baseline")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--projects', type=int, default=20)
+        parser.add_argument('--issues-per-project', type=int, default=30)
+        parser.add_argument('--comments-per-issue', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20, help="Measured requests per endpoint")
+        parser.add_argument('--only', help="Only the endpoints whose name contains this text")
+        parser.add_argument('--with-response-cache', action='store_true',
+                            help="Keep the response cache of the project / issue views")
+        parser.add_argument('--baseline', help="JSON baseline file to compare with (or to write)")
+        parser.add_argument('--save-baseline', action='store_true', help="Write the results to --baseline")
+        parser.add_argument('--output', help="Also write the results of this run to a JSON file")
+        # seuils de régression
+        parser.add_argument('--max-query-increase', type=int, default=0,
+                            help="Allowed extra SQL queries per request")
+        parser.add_argument('--max-latency-ratio', type=float, default=1.5, help="Allowed p95 latency ratio")
+        parser.add_argument('--max-memory-ratio', type=float, default=1.5, help="Allowed peak memory ratio")
+        parser.add_argument('--latency-floor-ms', type=float, default=2.0,
+                            help="p95 latencies below this value are not compared (noise)")
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError("--save-baseline nécessite --baseline")
+        baseline = None
+        if options['baseline'] and not options['save_baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = json.load(file)
+            except FileNotFoundError:
+                raise CommandError(f"Baseline introuvable : {options['baseline']}")
+
+        # base de test et cache dédiés : la base et le cache courants ne sont jamais modifiés
+        old_name = connection.settings_dict['NAME']
+        with isolated_cache():
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                sizes = generate_dataset(options['users'], options['projects'], options['issues_per_project'],
+                                         options['comments_per_issue'], options['seed'])
+                self.stdout.write("Jeu de données : "
+                                  + ", ".join(f"{count} {name}" for name, count in sizes.items()))
+                results = self.run_scenarios(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                cache.clear()
+
+        report = {'dataset': sizes, 'iterations': options['iterations'], 'endpoints': results}
+        for path in {options['output'], options['baseline'] if options['save_baseline'] else None} - {None}:
+            with open(path, 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+            self.stdout.write(f"Résultats écrits dans {path}")
+
+        failures = [f"{name} : statut {result['status']}" for name, result in results.items()
+                    if result['status'] >= 400]
+        if baseline is not None:
+            failures += self.compare(baseline, report, options)
+        if failures:
+            raise CommandError("Régressions détectées :\n" + "\n".join(failures))
+
+    def run_scenarios(self, options):
+        ctx = BenchContext()
+        client = Client()
+        results = {}
+        self.stdout.write(f"{'endpoint':<40} {'statut':>6} {'req.':>5} {'p50 ms':>8} {'p95 ms':>8} "
+                          f"{'p99 ms':>8} {'mém. Ko':>9}")
+        with ExitStack() as stack:
+            # pas de limitation pendant la mesure
+            stack.enter_context(mock.patch.object(CombinedRateThrottle, 'THROTTLE_RATES', {}))
+            # DEBUG : pas de journal des requêtes SQL en dehors de CaptureQueriesContext
+            stack.enter_context(override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False))
+            if not options['with_response_cache']:
+                stack.enter_context(mock.patch.object(ResponseCacheMixin, 'cached_response', bypass_response_cache))
+            iterations = itertools.count(1)
+            for name, method, auth, build in SCENARIOS:
+                if options['only'] and options['only'] not in name:
+                    continue
+                headers = {'Authorization': f'Bearer {ctx.tokens[auth]}'} if auth else {}
+
+                def send(path, data):
+                    kwargs = {'headers': headers}
+                    if data is not None:
+                        kwargs.update(data=data, content_type='application/json')
+                    response = getattr(client, method)(path, **kwargs)
+                    # consommation du flux (exports) dans la mesure
+                    if response.streaming and response.is_async:
+                        # flux SSE des vues async
+                        async_to_sync(consume)(response.streaming_content)
+                    elif response.streaming:
+                        b''.join(response.streaming_content)
+                    return response
+
+                # requête de chauffe : nombre de requêtes SQL et statut
+                # préparation (objet à supprimer, token...) hors mesure
+                path, data = build(ctx, next(iterations))
+                with CaptureQueriesContext(connection) as queries:
+                    response = send(path, data)
+                # journal vidé au début de chaque requête (signal request_started)
+                nb_queries = len(queries)
+
+                latencies = []
+                for _ in range(options['iterations']):
+                    path, data = build(ctx, next(iterations))
+                    start = time.perf_counter()
+                    send(path, data)
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+                # mémoire mesurée à part : tracemalloc ralentit les requêtes
+                path, data = build(ctx, next(iterations))
+                gc.collect()
+                tracemalloc.start()
+                try:
+                    send(path, data)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+                results[name] = result = {
+                    'status': response.status_code,
+                    'queries': nb_queries,
+                    'p50_ms': round(percentile(latencies, 0.50), 3),
+                    'p95_ms': round(percentile(latencies, 0.95), 3),
+                    'p99_ms': round(percentile(latencies, 0.99), 3),
+                    'peak_memory_kb': round(peak / 1024, 1),
+                }
+                self.stdout.write(f"{name:<40} {result['status']:>6} {result['queries']:>5} {result['p50_ms']:>8.2f} "
+                                  f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                                  f"{result['peak_memory_kb']:>9.1f}")
+        return results
+
+    def compare(self, baseline, report, options):
+        """
+        Regressions of the run against the baseline, as messages
+        """
+        failures = []
+        if baseline.get('dataset') != report['dataset']:
+            self.stderr.write("Attention : le jeu de données diffère de celui de la baseline")
+        for name, result in report['endpoints'].items():
+            reference = baseline.get('endpoints', {}).get(name)
+            if reference is None:
+                self.stdout.write(f"{name} : absent de la baseline")
+                continue
+            if result['queries'] > reference['queries'] + options['max_query_increase']:
+                failures.append(f"{name} : {result['queries']} requêtes SQL (baseline {reference['queries']})")
+            if (result['p95_ms'] > options['latency_floor_ms']
+                    and result['p95_ms'] > reference['p95_ms'] * options['max_latency_ratio']):
+                failures.append(f"{name} : p95 {result['p95_ms']:.2f} ms (baseline {reference['p95_ms']:.2f} ms)")
+            if result['peak_memory_kb'] > reference['peak_memory_kb'] * options['max_memory_ratio']:
+                failures.append(f"{name} : mémoire {result['peak_memory_kb']:.1f} Ko "
+                                f"(baseline {reference['peak_memory_kb']:.1f} Ko)")
+        return failures
@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from sd_api.benchmarks import isolated_cache
+from sd_api.models import CustomUser
+from sd_api.throttles import CombinedRateThrottle
+
+
+PASSWORD = 'bench-login-password'
+
+
+class Command(BaseCommand):
+    help = ("Logins per second and per core of POST /api/token/ for each password hasher policy (test database), "
+            "and throughput of the hashing pool with concurrent logins")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policies', default=','.join(settings.SD_API_PASSWORD_HASHER_POLICIES),
+                            help="Hasher policies to compare (comma separated)")
+        parser.add_argument('--logins', type=int, default=20, help="Measured logins per policy")
+        parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1,
+                            help="Simultaneous password checks for the pool throughput")
+
+    def handle(self, *args, **options):
+        policies = [name for name in options['policies'].split(',') if name]
+        unknown = set(policies) - set(settings.SD_API_PASSWORD_HASHER_POLICIES)
+        if unknown:
+            raise CommandError(f"Politique(s) inconnue(s) : {', '.join(sorted(unknown))}")
+
+        # base de test et cache dédiés : la base et le cache courants ne sont jamais modifiés
+        old_name = connection.settings_dict['NAME']
+        with isolated_cache():
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with mock.patch.object(CombinedRateThrottle, 'THROTTLE_RATES', {}), \
+                        override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False):
+                    self.stdout.write(f"{'politique':<10} {'ms / connexion':>15} {'connexions/s/cœur':>18} "
+                                      f"{'pool connexions/s':>18}")
+                    for policy in policies:
+                        self.run_policy(policy, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                cache.clear()
+
+    def run_policy(self, policy, options):
+        policies = settings.SD_API_PASSWORD_HASHER_POLICIES
+        hashers = [policies[policy], *(path for name, path in policies.items() if name != policy)]
+        with override_settings(PASSWORD_HASHERS=hashers):
+            try:
+                get_hasher().encode(PASSWORD, 'benchsalt')
+            except ValueError as exc:
+                # ex : argon2-cffi non installé
+                self.stdout.write(f"{policy:<10} ignorée ({exc})")
+                return
+            user = CustomUser.objects.create_user(username=f'bench-login-{policy}', age=30, password=PASSWORD)
+            client = Client()
+            client.post('/api/token/', {'username': user.username, 'password': PASSWORD})
+
+            # connexions séquentielles : un seul cœur occupé par le hachage
+            start = time.perf_counter()
+            for _ in range(options['logins']):
+                response = client.post('/api/token/', {'username': user.username, 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise CommandError(f"{policy} : statut {response.status_code} sur /api/token/")
+
+            # vérifications simultanées, bornées par le pool de hachage (SD_API_PASSWORD_HASH_WORKERS)
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                start = time.perf_counter()
+                checks = list(executor.map(lambda _: user.check_password(PASSWORD), range(options['logins'])))
+                pool_elapsed = time.perf_counter() - start
+            assert all(checks)
+
+        self.stdout.write(f"{policy:<10} {elapsed / options['logins'] * 1000:>15.1f} "
+                          f"{options['logins'] / elapsed:>18.1f} {options['logins'] / pool_elapsed:>18.1f}")
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from sd_api.middleware import CompressionMiddleware, brotli
+from sd_api.models import Issue, Comment
+from sd_api.renderers import ORJSONRenderer, orjson
+from sd_api.serializers import IssueSerializer, CommentSerializer
+
+
+class Command(BaseCommand):
+    help = "Render time of JSONRenderer against ORJSONRenderer, and gzip / brotli size and time, on list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Rows per page")
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson non installé : ORJSONRenderer utilise le rendu de DRF"))
+        pages = {
+            "issues": IssueSerializer(Issue.objects.order_by('created_time', 'pk')[:options['rows']], many=True).data,
+            # mêmes annotations que CommentViewSet.get_queryset
+            "comments": CommentSerializer(Comment.objects.select_related('issue').annotate(
+                project_name=F('issue__project__name'), project_description=F('issue__project__description'),
+            ).order_by('created_time', 'pk')[:options['rows']], many=True).data,
+        }
+        repeat = options['repeat']
+        for name, results in pages.items():
+            # page paginée telle que rendue par les vues (LimitOffsetPagination)
+            data = {'count': len(results), 'next': None, 'previous': None, 'results': results}
+            body = JSONRenderer().render(data)
+            self.stdout.write(f"{name} ({len(results)} lignes, {len(body)} octets)")
+            for renderer in (JSONRenderer(), ORJSONRenderer()):
+                elapsed = self.timed(lambda: renderer.render(data), repeat)
+                self.stdout.write(f"    {type(renderer).__name__:<16} {elapsed * 1e6:9.1f} µs / page")
+
+            codecs = {'gzip': lambda: compress_string(body, max_random_bytes=CompressionMiddleware.max_random_bytes)}
+            if brotli is not None:
+                codecs['br'] = lambda: brotli.compress(body, quality=CompressionMiddleware.brotli_quality)
+            for codec, compress in codecs.items():
+                elapsed = self.timed(compress, repeat)
+                self.stdout.write(f"    {codec:<16} {elapsed * 1e6:9.1f} µs / page   {len(compress())} octets "
+                                  f"({len(compress()) / len(body):.0%})")
+            if brotli is None:
+                self.stdout.write("    br               brotli non installé (pip install brotli)")
+
+    def timed(self, function, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        return (time.perf_counter() - start) / repeat
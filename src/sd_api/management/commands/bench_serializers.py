@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+
+from sd_api.fast_serializers import ValuesSerializer
+from sd_api.models import Project, Issue, Comment
+from sd_api.serializers import ProjectSerializer, IssueSerializer, CommentSerializer
+
+
+class Command(BaseCommand):
+    help = "Rows/sec of the ModelSerializers against the .values() fast path on list-sized pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Rows per page (20 to 100 in the list views)")
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        benchmarks = [
+            (ProjectSerializer, Project.objects.all()),
+            (IssueSerializer, Issue.objects.all()),
+            # mêmes annotations que CommentViewSet.get_queryset
+            (CommentSerializer, Comment.objects.select_related('issue').annotate(
+                project_name=F('issue__project__name'), project_description=F('issue__project__description'))),
+        ]
+        for serializer_class, queryset in benchmarks:
+            queryset = queryset.order_by('created_time', 'pk')[:options['rows']]
+            values_serializer = ValuesSerializer.for_request(serializer_class, None)
+
+            instances = list(queryset)
+            rows = list(values_serializer.values(queryset))
+            if not rows:
+                self.stdout.write(f"{serializer_class.__name__} : aucune ligne en base")
+                continue
+            identical = (renderer.render(serializer_class(instances, many=True).data)
+                         == renderer.render(values_serializer.to_representation(rows)))
+            self.stdout.write(f"{serializer_class.__name__} ({len(rows)} lignes, sortie identique : "
+                              f"{'oui' if identical else 'NON'})")
+
+            # représentation seule (lignes déjà chargées) puis requête + représentation
+            pages = {
+                "représentation": (lambda: serializer_class(instances, many=True).data,
+                                   lambda: values_serializer.to_representation(rows)),
+                "requête + représentation": (
+                    lambda: serializer_class(list(queryset), many=True).data,
+                    lambda: values_serializer.to_representation(list(values_serializer.values(queryset)))),
+            }
+            for name, (serializer_page, fast_page) in pages.items():
+                slow = self.rows_per_second(serializer_page, len(rows), options['repeat'])
+                fast = self.rows_per_second(fast_page, len(rows), options['repeat'])
+                self.stdout.write(f"    {name:<26} serializer {slow:10.0f} lignes/s   values {fast:10.0f} lignes/s"
+                                  f"   x{fast / slow:.1f}")
+
+    def rows_per_second(self, page, nb_rows, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            page()
+        return nb_rows * repeat / (time.perf_counter() - start)
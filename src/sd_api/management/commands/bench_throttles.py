@@ -0,0 +1,71 @@
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+
+from sd_api.models import CustomUser
+from sd_api.throttles import CustomThrottle, CombinedRateThrottle
+
+
+# taux très élevés : on mesure le coût d'une requête acceptée, pas le refus
+BENCH_RATE = '100000000/d'
+
+
+class BenchCustomThrottle(CustomThrottle):
+    rate = BENCH_RATE
+
+
+class BenchUserRateThrottle(UserRateThrottle):
+    rate = BENCH_RATE
+
+
+class BenchAnonRateThrottle(AnonRateThrottle):
+    rate = BENCH_RATE
+
+
+class BenchCombinedRateThrottle(CombinedRateThrottle):
+    THROTTLE_RATES = {'burst': BENCH_RATE, 'user': BENCH_RATE, 'anon': BENCH_RATE}
+
+    def __init__(self):
+        super().__init__()
+        # instance du cache fixée sur la classe par la commande (au lieu de caches[cache_alias])
+        self.cache = type(self).cache
+
+
+class Command(BaseCommand):
+    help = "Compare the per-request overhead of the previous throttle stack with CombinedRateThrottle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--cache', default='default', help="Cache alias used by the throttles")
+
+    def handle(self, *args, **options):
+        nb_requests = options['requests']
+        # instance dédiée du backend mesuré, clés sous un préfixe propre à l'exécution : le cache n'est pas vidé
+        # (clear() vide tout le serveur Redis / Memcached), les compteurs expirent avec leur fenêtre
+        cache = caches.create_connection(options['cache'])
+        cache.key_prefix = f"{cache.key_prefix}:bench:{uuid.uuid4().hex}"
+        request = Request(APIRequestFactory().get('/api/projects/', REMOTE_ADDR='10.0.0.1'))
+        request.user = CustomUser(pk=1, username='bench')
+
+        stacks = {
+            "CustomThrottle + UserRateThrottle + AnonRateThrottle":
+                [BenchCustomThrottle, BenchUserRateThrottle, BenchAnonRateThrottle],
+            "CombinedRateThrottle": [BenchCombinedRateThrottle],
+        }
+        for name, throttle_classes in stacks.items():
+            for throttle_class in throttle_classes:
+                throttle_class.cache = cache
+                throttle_class.cache_alias = options['cache']
+            start = time.perf_counter()
+            for _ in range(nb_requests):
+                # instanciation par requête, comme dans APIView.get_throttles()
+                for throttle in [throttle_class() for throttle_class in throttle_classes]:
+                    throttle.allow_request(request, None)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{name} : {elapsed / nb_requests * 1e6:.1f} µs/requête "
+                              f"({nb_requests} requêtes)")
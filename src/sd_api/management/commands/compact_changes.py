@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from sd_api.changes import CHANGES_RETENTION_DAYS, compact_changes, purge_old_changes
+from sd_api.deletion import DELETE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = ("Retention and compaction of the change log (to be scheduled, ex : cron): entries older than "
+            "--keep-days are deleted, older entries of an object replaced by a newer one too")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=float, default=CHANGES_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        purged = purge_old_changes(options['batch_size'], options['keep_days'])
+        compacted = compact_changes(options['batch_size'])
+        self.stdout.write(f"{purged} entrée(s) expirée(s) et {compacted} entrée(s) compactée(s) supprimée(s)")
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from sd_api import metrics
+
+
+class Command(BaseCommand):
+    help = ("Dump the per-endpoint histograms of every worker (read from the cache: needs a shared cache backend, "
+            "cf. DJANGO_CACHE_BACKEND)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['table', 'prometheus', 'json'], default='table')
+        parser.add_argument('--reset', action='store_true', help="Reset the histograms after the dump")
+
+    def handle(self, *args, **options):
+        histograms = metrics.collect()
+        if options['format'] == 'prometheus':
+            self.stdout.write(metrics.prometheus_text(histograms), ending='')
+        elif options['format'] == 'json':
+            self.stdout.write(json.dumps(histograms, indent=2))
+        else:
+            self.write_table(histograms)
+        if options['reset']:
+            metrics.reset()
+
+    def write_table(self, histograms):
+        latency_bounds = metrics.HISTOGRAMS['request_latency_seconds'][1]
+        self.stdout.write(f"{'endpoint':<45} {'requêtes':>9} {'p50 ms':>8} {'p99 ms':>8} {'SQL moy':>8} "
+                          f"{'SQL ms':>8} {'serial. ms':>10} {'octets moy':>11}")
+        latencies = histograms['request_latency_seconds']
+        for endpoint, series in sorted(latencies.items(), key=lambda item: -item[1][-2]):
+            count = series[-1]
+
+            def mean(name):
+                other = histograms[name].get(endpoint)
+                return other[-2] / other[-1] if other and other[-1] else 0
+
+            self.stdout.write(
+                f"{endpoint:<45} {count:>9} "
+                f"{metrics.quantile(latency_bounds, series, 0.5) * 1000:>8.0f} "
+                f"{metrics.quantile(latency_bounds, series, 0.99) * 1000:>8.0f} "
+                f"{mean('db_queries'):>8.1f} {mean('db_time_seconds') * 1000:>8.1f} "
+                f"{mean('serializer_time_seconds') * 1000:>10.1f} {mean('response_size_bytes'):>11.0f}")
@@ -0,0 +1,98 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from sd_api.models import CustomUser, Project, Contributor, Issue
+from sd_api.pagination import KeysetPagination
+from sd_api.views import ProjectViewSet, IssueViewSet, CommentViewSet
+
+
+# lignes de plan qui correspondent à la lecture complète d'une table, par moteur
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+    'mysql': re.compile(r'\btype\W+ALL\b'),
+}
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the list query of each viewset and report full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="ID of the user the queries are built for")
+        parser.add_argument('--verbose-plan', action='store_true', help="Print the whole query plan")
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        project = Project.objects.filter(contributors__user=user).first()
+        issue = Issue.objects.filter(project=project).first()
+        project_id = project.pk if project else 0
+        issue_id = issue.pk if issue else 0
+
+        queries = [
+            ("ProjectViewSet.list", self.list_queryset(ProjectViewSet, user)),
+            ("IssueViewSet.list ?project=", self.list_queryset(IssueViewSet, user, project=project_id)),
+            ("IssueViewSet.list ?project= (keyset)",
+             self.list_queryset(IssueViewSet, user, project=project_id).order_by(*KeysetPagination.ordering)),
+            # combinaisons courantes de IssueFilter
+            ("IssueViewSet.list ?project=&status=",
+             self.list_queryset(IssueViewSet, user, project=project_id, status='TODO,INPR')),
+            ("IssueViewSet.list ?project=&priority=&ordering=-created_time",
+             self.list_queryset(IssueViewSet, user, project=project_id, priority='HIGH', ordering='-created_time')),
+            ("IssueViewSet.list ?project=&tag=&created_time_after=",
+             self.list_queryset(IssueViewSet, user, project=project_id, tag='BUG',
+                                created_time_after='2024-01-01T00:00:00')),
+            ("IssueViewSet.list ?assignee=", self.list_queryset(IssueViewSet, user, assignee=user.pk)),
+            ("IssueViewSet.list ?author=&ordering=created_time",
+             self.list_queryset(IssueViewSet, user, author=user.pk, ordering='created_time')),
+            ("CommentViewSet.list ?issue=", self.list_queryset(CommentViewSet, user, issue=issue_id)),
+            ("CommentViewSet.list ?issue= (keyset)",
+             self.list_queryset(CommentViewSet, user, issue=issue_id).order_by(*KeysetPagination.ordering)),
+            ("CommentViewSet.list ?project=", self.list_queryset(CommentViewSet, user, project=project_id)),
+            ("ContributorViewSet.list_contributors", Contributor.objects.filter(project_id=project_id)),
+            ("ContributorMixin.get_contributor", Contributor.objects.filter(user_id=user.pk, project_id=project_id)),
+        ]
+
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Moteur non supporté : {connection.vendor}")
+
+        nb_full_scans = 0
+        for name, queryset in queries:
+            plan = queryset.explain()
+            full_scans = [line.strip() for line in plan.splitlines() if pattern.search(line)]
+            nb_full_scans += len(full_scans)
+            if full_scans:
+                self.stdout.write(self.style.WARNING(f"{name} : full scan"))
+                for line in full_scans:
+                    self.stdout.write(f"    {line}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name} : OK"))
+            if options['verbose_plan']:
+                self.stdout.write(plan)
+
+        self.stdout.write(f"{len(queries)} requêtes analysées, {nb_full_scans} full scan(s)")
+
+    def get_user(self, user_id):
+        if user_id is not None:
+            try:
+                return CustomUser.objects.get(pk=user_id)
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"Utilisateur {user_id} non trouvé")
+        # par défaut un utilisateur non admin, pour voir les filtres de visibilité
+        user = CustomUser.objects.filter(is_staff=False, is_superuser=False).first() or CustomUser.objects.first()
+        if user is None:
+            raise CommandError("Aucun utilisateur en base")
+        return user
+
+    def list_queryset(self, viewset_class, user, **params):
+        """
+        Queryset of the list action, built the same way as for a real request
+        """
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        view = viewset_class(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+        return view.filter_queryset(view.get_queryset())
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding / blacklisted tokens in batches (to be scheduled, ex : cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help="Pause between two batches (seconds), to leave room for other writes")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by()
+        nb_deleted = 0
+        while True:
+            # index sur expires_at (migration sd_api 0006) : chaque lot est une lecture d'index bornée
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            nb_deleted += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(f"{nb_deleted} token(s) expiré(s) supprimé(s)")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from sd_api.deletion import DELETE_BATCH_SIZE, purge_hidden_projects
+
+
+class Command(BaseCommand):
+    help = "Delete by batches the projects hidden by a deferred deletion (to be scheduled, ex : cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        purged = purge_hidden_projects(options['batch_size'])
+        self.stdout.write(f"{purged} projet(s) supprimé(s)")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from sd_api.counters import rebuild_counters
+from sd_api.models import Issue, ProjectCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized project counters and report the drifted ones (to be scheduled, ex : cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="ID of a project to reconcile (repeatable, all projects by default)")
+
+    def handle(self, *args, **options):
+        project_ids = options['projects']
+        counters = ProjectCounter.objects.all()
+        if project_ids:
+            counters = counters.filter(project_id__in=project_ids)
+
+        before = {(project_id, key): count for project_id, key, count in counters.values_list('project_id', 'key',
+                                                                                              'count')}
+        rebuild_counters(Issue, ProjectCounter, project_ids)
+        after = {(project_id, key): count for project_id, key, count in counters.values_list('project_id', 'key',
+                                                                                             'count')}
+
+        drifted = sorted(key for key in before.keys() | after.keys() if before.get(key, 0) != after.get(key, 0))
+        for project_id, key in drifted:
+            self.stdout.write(f"projet {project_id} {key:<15} {before.get((project_id, key), 0)} -> "
+                              f"{after.get((project_id, key), 0)}")
+        self.stdout.write(f"{len(after)} compteur(s) recalculé(s), {len(drifted)} écart(s) corrigé(s)")
@@ -0,0 +1,82 @@
+import multiprocessing
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from sd_api.enums import TaskStatus
+from sd_api.models import Task
+from sd_api.tasks import claim_task, run_task, worker_name
+
+
+class Command(BaseCommand):
+    help = "Worker of the background tasks (sd_api.tasks): a pool of processes polling the task table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Pause when the queue is empty (seconds)")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+        parser.add_argument('--keep-days', type=float, default=7,
+                            help="Retention of the finished tasks (status tracking)")
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+        # connexions non partagées entre processus : chaque worker ouvre les siennes
+        connections.close_all()
+        # fork : les processus héritent de la configuration Django (Unix)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=self.work, args=(options,)) for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def stop(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
+
+    def work(self, options):
+        worker = worker_name()
+        stopping = False
+
+        def stop(signum, frame):
+            # arrêt après la tâche en cours
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        counts = {}
+        last_cleanup = 0.0
+        while not stopping:
+            task_row = claim_task(worker)
+            if task_row is None:
+                if options['once']:
+                    break
+                if time.monotonic() - last_cleanup > 60:
+                    self.cleanup(options['keep_days'])
+                    last_cleanup = time.monotonic()
+                time.sleep(options['poll_interval'])
+                continue
+            status = run_task(task_row)
+            counts[status] = counts.get(status, 0) + 1
+            if status != TaskStatus.DONE.value:
+                self.stderr.write(f"{worker} : tâche {task_row.pk} ({task_row.name}) en échec, "
+                                  f"essai {task_row.attempts}/{task_row.max_attempts}")
+        connections.close_all()
+        summary = ", ".join(f"{count} {TaskStatus(status).name.lower()}" for status, count in counts.items())
+        self.stdout.write(f"{worker} : {summary or 'aucune tâche'}")
+
+    def cleanup(self, keep_days):
+        # tâches terminées : gardées pour le suivi, puis supprimées (les échecs définitifs aussi)
+        Task.objects.filter(status__in=[TaskStatus.DONE.value, TaskStatus.FAILED.value],
+                            updated_time__lt=timezone.now() - timedelta(days=keep_days)).delete()
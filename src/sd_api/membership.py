@@ -0,0 +1,103 @@
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from .caching import VERSION_TIMEOUT, shared_cache
+from .models import Contributor
+
+
+MEMBERSHIP_CACHE_TIMEOUT = 300  # secondes
+
+
+def _version_key(user_id):
+    return f"sd_api:membership:version:{user_id}"
+
+
+def get_membership_version(user_id):
+    """
+    Current version of the user's memberships in the shared cache
+    """
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # valeur initiale basée sur l'heure : une clé de version évincée ne peut pas réutiliser un ancien ensemble
+        cache.add(_version_key(user_id), time.time_ns(), VERSION_TIMEOUT)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def invalidate_membership(user_id):
+    """
+    Bump the user's version, the cached project-id sets of older versions are no longer read
+    """
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), VERSION_TIMEOUT)
+
+
+def _project_ids_key(user_id, version):
+    return f"sd_api:membership:{user_id}:{version}"
+
+
+def get_member_project_ids(request):
+    """
+    IDs of the projects the user contributes to.
+    Loaded once per request, from the shared cache or with a single query.
+    """
+    project_ids = getattr(request, '_member_project_ids', None)
+    if project_ids is not None:
+        return project_ids
+
+    user = request.user
+    if not user or not user.is_authenticated:
+        project_ids = frozenset()
+    elif not shared_cache():
+        # cache par processus : une invalidation faite par un autre worker ne serait pas vue, lecture en base
+        project_ids = frozenset(Contributor.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk)
+                                .values_list('project_id', flat=True))
+    else:
+        key = _project_ids_key(user.pk, get_membership_version(user.pk))
+        project_ids = cache.get(key)
+        if project_ids is None:
+            # toujours lu sur le primaire : un ensemble en retard (réplica) resterait en cache
+            project_ids = frozenset(Contributor.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk)
+                                    .values_list('project_id', flat=True))
+            cache.set(key, project_ids, MEMBERSHIP_CACHE_TIMEOUT)
+
+    request._member_project_ids = project_ids
+    return project_ids
+
+
+async def aget_membership_version(user_id):
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), time.time_ns(), None)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+async def aget_member_project_ids(request):
+    """
+    Async version of get_member_project_ids (async views)
+    """
+    project_ids = getattr(request, '_member_project_ids', None)
+    if project_ids is not None:
+        return project_ids
+
+    user = request.user
+    if not user or not user.is_authenticated:
+        project_ids = frozenset()
+    elif not shared_cache():
+        queryset = Contributor.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk)
+        project_ids = frozenset([project_id async for project_id in queryset.values_list('project_id', flat=True)])
+    else:
+        key = _project_ids_key(user.pk, await aget_membership_version(user.pk))
+        project_ids = await cache.aget(key)
+        if project_ids is None:
+            queryset = Contributor.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user.pk)
+            project_ids = frozenset([project_id async for project_id in queryset.values_list('project_id', flat=True)])
+            await cache.aset(key, project_ids, MEMBERSHIP_CACHE_TIMEOUT)
+
+    request._member_project_ids = project_ids
+    return project_ids
@@ -0,0 +1,275 @@
+import cProfile
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+METRICS_ENABLED = getattr(settings, 'SD_API_METRICS_ENABLED', True)
+FLUSH_INTERVAL = getattr(settings, 'SD_API_METRICS_FLUSH_INTERVAL', 10)  # secondes
+# profils cProfile : fraction des requêtes profilées (0 = désactivé) et seuil de latence pour garder le profil
+PROFILE_SAMPLE_RATE = getattr(settings, 'SD_API_PROFILE_SAMPLE_RATE', 0)
+PROFILE_SLOW_THRESHOLD = getattr(settings, 'SD_API_PROFILE_SLOW_THRESHOLD', 0.5)  # secondes
+PROFILE_DIR = getattr(settings, 'SD_API_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'sd_api_profiles'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# nom : (description, bornes des buckets)
+HISTOGRAMS = {
+    'request_latency_seconds': ("Total latency of the request", LATENCY_BUCKETS),
+    'db_queries': ("SQL queries per request", (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'db_time_seconds': ("Time spent in SQL queries per request", LATENCY_BUCKETS),
+    'serializer_time_seconds': ("Time spent in serializers per request", LATENCY_BUCKETS),
+    'response_size_bytes': ("Size of the response body (after compression)",
+                            (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)),
+}
+
+GENERATION_KEY = 'sd_api:metrics:generation'
+# une clé par processus (slot pris avec cache.add, atomique) : un worker arrêté disparaît après PROCESS_TTL
+# sans publication, son slot est alors réutilisable
+PROCESS_TTL = getattr(settings, 'SD_API_METRICS_PROCESS_TTL', 3600)  # secondes
+MAX_PROCESSES = getattr(settings, 'SD_API_METRICS_MAX_PROCESSES', 256)
+
+# mesures de la requête en cours (propagées aux threads de sync_to_async)
+current_stats = ContextVar('sd_api_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('endpoint', 'queries', 'db_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.endpoint = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+class Registry:
+    """
+    Histograms of the process by endpoint: {name: {endpoint: [bucket counts..., sum, count]}}
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.last_flush = 0.0
+        self.generation = None  # valeur de GENERATION_KEY lors de la dernière publication
+        self.slot = None  # slot du processus dans le cache
+
+    def observe(self, name, endpoint, value):
+        bounds = HISTOGRAMS[name][1]
+        with self.lock:
+            series = self.histograms[name].get(endpoint)
+            if series is None:
+                # un compteur par borne + celui de +Inf, puis somme et nombre d'observations
+                series = self.histograms[name][endpoint] = [0] * (len(bounds) + 3)
+            # bucket non cumulatif ici, cumulé à l'export
+            series[bisect_left(bounds, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {name: {endpoint: list(series) for endpoint, series in by_endpoint.items()}
+                    for name, by_endpoint in self.histograms.items()}
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+
+
+registry = Registry()
+
+
+def process_name():
+    # calculé à chaque publication : un processus forké après l'import a son propre nom
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _slot_key(slot):
+    return f"sd_api:metrics:slot:{slot}"
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """
+    Database execute wrapper (connection.execute_wrappers): query count and time of the current request
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - start
+
+
+def install_query_wrapper(connection, **kwargs):
+    # connection_created : chaque connexion (y compris celles des threads async) est instrumentée une fois
+    if query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_wrapper)
+
+
+@contextmanager
+def serialization_timer():
+    """
+    Time spent in the outermost serializer of the request (nested / child serializers are not counted twice).
+    Used explicitly by the API serializers (serializers.TimedSerializerMixin) and ValuesSerializer.
+    """
+    stats = current_stats.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+        stats.serializing = False
+
+
+def endpoint_name(view_func, request):
+    """
+    Label of the endpoint: ViewSet.action, view class name, or URL name
+    """
+    actions = getattr(view_func, 'actions', None)
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is not None and actions:
+        return f"{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    if view_class is not None:
+        viewset_class = getattr(view_func, 'view_initkwargs', {}).get('viewset_class')
+        if viewset_class is not None:
+            return f"{view_class.__name__}[{viewset_class.__name__}]"
+        return view_class.__name__
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def start_profiler():
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    return None
+
+
+def stop_profiler(profiler, endpoint, latency):
+    """
+    Keeps the profile of a sampled request only when it was slow
+    """
+    profiler.disable()
+    if latency < PROFILE_SLOW_THRESHOLD:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = re.sub(r'[^\w.-]', '_', endpoint)
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{name}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def record(stats, response, latency):
+    endpoint = stats.endpoint or 'unresolved'
+    registry.observe('request_latency_seconds', endpoint, latency)
+    registry.observe('db_queries', endpoint, stats.queries)
+    registry.observe('db_time_seconds', endpoint, stats.db_time)
+    registry.observe('serializer_time_seconds', endpoint, stats.serializer_time)
+    # taille inconnue pour les réponses en flux (exports)
+    if not response.streaming:
+        registry.observe('response_size_bytes', endpoint, len(response.content))
+    if time.monotonic() - registry.last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """
+    Publishes the snapshot of the process in the cache, so that the command / endpoint see every worker
+    """
+    registry.last_flush = time.monotonic()
+    generation = cache.get_or_set(GENERATION_KEY, 0, None)
+    if registry.generation is not None and generation != registry.generation:
+        # remise à zéro demandée (dump_metrics --reset) depuis la dernière publication
+        registry.clear()
+    registry.generation = generation
+    publish((process_name(), registry.snapshot()))
+
+
+def publish(payload):
+    """
+    Writes (process name, snapshot) in the slot of the process, a free slot is taken on the first publication
+    (or when the slot expired / was reset)
+    """
+    if registry.slot is not None:
+        current = cache.get(_slot_key(registry.slot))
+        if current is not None and current[0] == payload[0]:
+            cache.set(_slot_key(registry.slot), payload, PROCESS_TTL)
+            return
+    registry.slot = None
+    for slot in range(MAX_PROCESSES):
+        if cache.add(_slot_key(slot), payload, PROCESS_TTL):
+            registry.slot = slot
+            return
+
+
+def collect():
+    """
+    Histograms of every process merged
+    """
+    flush()
+    merged = {name: {} for name in HISTOGRAMS}
+    for _, snapshot in cache.get_many([_slot_key(slot) for slot in range(MAX_PROCESSES)]).values():
+        for name, by_endpoint in snapshot.items():
+            for endpoint, series in by_endpoint.items():
+                total = merged[name].setdefault(endpoint, [0] * len(series))
+                for index, value in enumerate(series):
+                    total[index] += value
+    return merged
+
+
+def reset():
+    cache.delete_many([_slot_key(slot) for slot in range(MAX_PROCESSES)])
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+    registry.clear()
+
+
+def quantile(bounds, series, q):
+    """
+    Approximate quantile (upper bound of the bucket) of a histogram series
+    """
+    count = series[-1]
+    if not count:
+        return None
+    cumulative = 0
+    for bound, value in zip((*bounds, float('inf')), series[:-2]):
+        cumulative += value
+        if cumulative >= q * count:
+            return bound
+    return float('inf')
+
+
+def prometheus_text(histograms):
+    """
+    Prometheus text exposition format (histogram type, one series per endpoint)
+    """
+    lines = []
+    for name, (description, bounds) in HISTOGRAMS.items():
+        metric = f"sd_api_{name}"
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} histogram"]
+        for endpoint, series in sorted(histograms.get(name, {}).items()):
+            label = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, value in zip((*bounds, '+Inf'), series[:-2]):
+                cumulative += value
+                lines.append(f'{metric}_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{endpoint="{label}"}} {series[-2]}')
+            lines.append(f'{metric}_count{{endpoint="{label}"}} {series[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,178 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip uniquement
+    brotli = None
+
+from . import metrics
+from .database import mark_sticky
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compression of large JSON / NDJSON / CSV responses (lists, exports), encoding negotiated on Accept-Encoding:
+    brotli when installed and accepted, else gzip. Same rules as django.middleware.gzip.GZipMiddleware otherwise.
+    """
+    min_length = getattr(settings, 'SD_API_COMPRESSION_MIN_LENGTH', 1024)  # octets
+    brotli_quality = getattr(settings, 'SD_API_BROTLI_QUALITY', 5)  # 0-11, niveau adapté aux réponses dynamiques
+    content_types = ('application/json', 'application/x-ndjson', 'text/csv')
+    max_random_bytes = 100  # atténuation BREACH de Django pour gzip
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.get('Content-Type', '').split(';')[0].strip() not in self.content_types:
+            return response
+        if not response.streaming and len(response.content) < self.min_length:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, encoding)
+            # taille compressée inconnue avant la fin du flux
+            del response.headers['Content-Length']
+        else:
+            content = self.compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # ETag fort => faible (RFC 9110 8.8.1), les If-None-Match restent comparés en faible
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def negotiate(self, accept_encoding):
+        """
+        'br' or 'gzip' (by preference), None when the client accepts neither
+        """
+        accepted = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.strip().partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+        candidates = [coding for coding in candidates if accepted.get(coding, accepted.get('*', 0)) > 0]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda coding: accepted.get(coding, accepted.get('*', 0)))
+
+    def compress(self, content, encoding):
+        if encoding == 'br':
+            return brotli.compress(content, quality=self.brotli_quality)
+        return compress_string(content, max_random_bytes=self.max_random_bytes)
+
+    def compress_stream(self, response, encoding):
+        if response.is_async:
+            return self.acompress_stream(response.streaming_content, encoding)
+        if encoding == 'gzip':
+            return compress_sequence(response.streaming_content, max_random_bytes=self.max_random_bytes)
+        return self.brotli_stream(response.streaming_content)
+
+    def brotli_stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.brotli_quality)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+    async def acompress_stream(self, chunks, encoding):
+        if encoding == 'gzip':
+            # même traitement que GZipMiddleware : chaque morceau est un membre gzip
+            async for chunk in chunks:
+                yield compress_string(chunk, max_random_bytes=self.max_random_bytes)
+            return
+        # un flux brotli ne se concatène pas : un seul compresseur pour toute la réponse
+        compressor = brotli.Compressor(quality=self.brotli_quality)
+        async for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class InstrumentationMiddleware:
+    """
+    Per-endpoint (ViewSet.action) histograms: latency, SQL queries and time, serializer time, response size.
+    Sampled cProfile captures of slow requests with SD_API_PROFILE_SAMPLE_RATE (sync requests).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics.METRICS_ENABLED:
+            return self.get_response(request)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_query_wrapper(connection)
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        profiler = metrics.start_profiler()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        latency = time.perf_counter() - start
+        if profiler is not None:
+            metrics.stop_profiler(profiler, stats.endpoint or 'unresolved', latency)
+        metrics.record(stats, response, latency)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.METRICS_ENABLED:
+            return await self.get_response(request)
+        # connexions des threads de sync_to_async : instrumentées à leur création (signal connection_created)
+        stats = metrics.RequestStats()
+        token = metrics.current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_stats.reset(token)
+        metrics.record(stats, response, time.perf_counter() - start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = metrics.current_stats.get()
+        if stats is not None:
+            stats.endpoint = metrics.endpoint_name(view_func, request)
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes with a read replica: after a successful POST / PUT / DELETE, the reads of the user
+    go to the primary for SD_API_REPLICA_STICKY_SECONDS (user set by the DRF authentication)
+    """
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            mark_sticky(request)
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_contributors(apps, schema_editor):
+    # garde le plus ancien contributeur de chaque couple (user, project) avant la contrainte d'unicité
+    Contributor = apps.get_model('sd_api', 'Contributor')
+    keep_ids = (Contributor.objects.values('user', 'project')
+                .annotate(keep_id=Min('id')).values_list('keep_id', flat=True))
+    Contributor.objects.exclude(id__in=list(keep_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0003_alter_issue_status_alter_project_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'created_time'], name='comment_issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'created_time'], name='issue_project_created_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_contributors, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='contributor',
+            constraint=models.UniqueConstraint(fields=('user', 'project'), name='unique_contributor'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+# index sur la date d'expiration des tokens (table de simplejwt) pour la purge par lots
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0005_timestampmodel_updated_time'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX sd_api_outstandingtoken_expires_at_idx ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX sd_api_outstandingtoken_expires_at_idx',
+        ),
+    ]
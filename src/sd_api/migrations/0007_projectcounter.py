@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_counters(apps, schema_editor):
+    from sd_api.counters import rebuild_counters
+    rebuild_counters(apps.get_model('sd_api', 'Issue'), apps.get_model('sd_api', 'ProjectCounter'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0006_outstandingtoken_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='sd_api.project')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projectcounter',
+            constraint=models.UniqueConstraint(fields=('project', 'key'), name='unique_project_counter'),
+        ),
+        # compteurs initiaux calculés à partir des issues / commentaires existants
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+# index plein texte des issues / commentaires (SQLite FTS5), cf. sd_api/search.py
+def create_fts(apps, schema_editor):
+    from sd_api.search import CREATE_SQL, fts_enabled
+    if fts_enabled(schema_editor.connection):
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    from sd_api.search import DROP_SQL, fts_enabled
+    if fts_enabled(schema_editor.connection):
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0007_projectcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
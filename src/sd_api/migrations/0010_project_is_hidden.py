@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0009_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='is_hidden',
+            field=models.BooleanField(default=False),
+        ),
+    ]
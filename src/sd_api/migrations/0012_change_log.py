@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:56
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sd_api', '0011_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='changes_horizon',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=36)),
+                ('action', models.CharField(choices=[('CRE', 'Create'), ('UPD', 'Update'), ('DEL', 'Delete')], max_length=3)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='sd_api.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'id'], name='change_project_id_idx'), models.Index(fields=['object_type', 'object_id', 'id'], name='change_object_idx'), models.Index(fields=['created_time'], name='change_created_idx')],
+            },
+        ),
+    ]
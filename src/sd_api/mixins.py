@@ -1,7 +1,22 @@
-from rest_framework_simplejwt.tokens import RefreshToken
+import hashlib
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import mixins, status
+from rest_framework.response import Response
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from .models import CustomUser, Project, Contributor, Issue
 from .exceptions import CustomNotFound, CustomBadRequest
+from .membership import get_member_project_ids
+from .caching import RESPONSE_CACHE_TIMEOUT, shared_cache
+from .database import read_database, read_alias
+from .authentication import ClaimsRefreshToken
+from .serializers import sparse_field_names
+from .fast_serializers import ValuesSerializer
 
 
 class ValidationMixin:
@@ -18,7 +33,12 @@ class ValidationMixin:
         # return Project.objects.get(pk=project_id)
         if not isinstance(project_id, int):
             raise CustomBadRequest("L'ID du projet doit être un nombre entier")
-        if not Project.objects.filter(pk=project_id).exists():
+        # un projet dont l'utilisateur est contributeur existe forcément et n'est pas masqué
+        # (contributeurs supprimés avec le masquage) : pas de requête
+        if project_id in self.get_member_project_ids():
+            return project_id
+        # projet masqué (suppression différée) : plus aucune écriture
+        if not Project.objects.filter(pk=project_id, is_hidden=False).exists():
             raise CustomNotFound("Projet non trouvé")
         return project_id
 
@@ -30,6 +50,9 @@ class ValidationMixin:
         # return CustomUser.objects.get(pk=user_id)
         if not isinstance(user_id, int):
             raise CustomBadRequest("L'ID de l'utilisateur doit être un nombre entier")
+        request = getattr(self, 'request', None)
+        if request is not None and request.user.is_authenticated and user_id == request.user.pk:
+            return user_id
         if not CustomUser.objects.filter(pk=user_id).exists():
             raise CustomNotFound("Utilisateur non trouvé")
         return user_id
@@ -37,13 +60,21 @@ class ValidationMixin:
     def validate_issue_id(self, issue_id):
         if issue_id is None:
             raise CustomBadRequest("L'ID de l'issue est requis")
-        if not Issue.objects.filter(pk=issue_id).exists():
+        # issue d'un projet masqué : traitée comme supprimée
+        issue = Issue.objects.filter(pk=issue_id, project__is_hidden=False).first()
+        if issue is None:
             raise CustomNotFound("Issue non trouvée")
-        return Issue.objects.get(pk=issue_id)
+        return issue
+
+    def get_member_project_ids(self):
+        request = getattr(self, 'request', None)
+        if request is None:
+            return frozenset()
+        return get_member_project_ids(request)
 
     def validate_refresh_token(self, refresh_token):
         try:
-            RefreshToken(refresh_token)
+            ClaimsRefreshToken(refresh_token)
         except (TokenError, InvalidToken) as e:
             raise CustomBadRequest(f"{str(e)}")
         except Exception as e:
@@ -59,3 +90,200 @@ class ContributorMixin:
             return Contributor.objects.get(user_id=user_id, project_id=project_id)
         except Contributor.DoesNotExist:
             raise CustomNotFound("Contributeur non trouvé")
+
+
+class BulkCreateMixin:
+    """
+    Mixins for list-payload creation (bulk)
+    """
+    bulk_max_items = 500
+
+    def validate_bulk_items(self, items, references, serializer_class=None):
+        """
+        Validate each item of the payload.
+        references: {item key: (queryset, required)}, the IDs of each key are loaded with a single query.
+        Returns (validated data list, errors list), errors[i] is {} when item i is valid.
+        """
+        if not isinstance(items, list) or not items:
+            raise CustomBadRequest("Une liste non vide est attendue")
+        if len(items) > self.bulk_max_items:
+            raise CustomBadRequest(f"{self.bulk_max_items} éléments maximum par requête")
+
+        preloaded = {}
+        for key, (queryset, required) in references.items():
+            ids = {item.get(key) for item in items if isinstance(item, dict)}
+            preloaded[key] = queryset.in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+        validated, errors = [], []
+        for item in items:
+            if not isinstance(item, dict):
+                validated.append(None)
+                errors.append({'non_field_errors': ["Un objet est attendu"]})
+                continue
+
+            data, item_errors = {}, {}
+            if serializer_class is not None:
+                serializer = serializer_class(data=item, context=self.get_serializer_context())
+                # les références sont résolues plus bas, à partir des objets préchargés
+                for key in references:
+                    serializer.fields.pop(key, None)
+                if serializer.is_valid():
+                    data.update(serializer.validated_data)
+                else:
+                    item_errors.update(serializer.errors)
+
+            for key, (queryset, required) in references.items():
+                pk = item.get(key)
+                if pk is None:
+                    if required:
+                        item_errors[key] = ["ID requis"]
+                elif not isinstance(pk, int) or isinstance(pk, bool):
+                    item_errors[key] = ["L'ID doit être un nombre entier"]
+                elif pk not in preloaded[key]:
+                    item_errors[key] = ["Objet non trouvé"]
+                else:
+                    data[key] = preloaded[key][pk]
+
+            validated.append(None if item_errors else data)
+            errors.append(item_errors)
+        return validated, errors
+
+    def raise_bulk_errors(self, errors):
+        if any(errors):
+            # rien n'est créé, les erreurs sont rendues dans l'ordre des éléments
+            raise CustomBadRequest({"errors": errors})
+
+
+class ConditionalGetMixin:
+    """
+    Mixins for ETag / If-None-Match (304) handling, the ETag is computed without serializing the body
+    """
+    def make_etag(self, request, *parts):
+        digest = hashlib.sha1('|'.join(str(part) for part in (request.build_absolute_uri(), *parts)).encode())
+        return quote_etag(digest.hexdigest())
+
+    def etag_matches(self, request, etag):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if etag is None or not if_none_match:
+            return False
+        # comparaison faible : ETag rendu faible ("W/") par la compression des réponses
+        etags = [value.removeprefix('W/') for value in parse_etags(if_none_match)]
+        return '*' in etags or etag.removeprefix('W/') in etags
+
+    def not_modified(self, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        return response
+
+    def validated_response(self, request, response, etag):
+        """
+        Adds ETag (and Last-Modified for a single object) to a 200 response, or turns it into a 304
+        """
+        if response.status_code != status.HTTP_200_OK or etag is None:
+            return response
+        if self.etag_matches(request, etag):
+            return self.not_modified(etag)
+        response['ETag'] = etag
+        updated_time = response.data.get('updated_time') if isinstance(response.data, dict) else None
+        if updated_time:
+            response['Last-Modified'] = http_date(parse_datetime(updated_time).timestamp())
+        return response
+
+    def timestamp_etag_parts(self, queryset, *timestamp_fields):
+        """
+        Count and latest timestamps of the queryset, a single aggregate query
+        """
+        aggregates = {'count': Count('pk')}
+        aggregates.update({f'max_{index}': Max(field) for index, field in enumerate(timestamp_fields)})
+        return sorted(queryset.order_by().aggregate(**aggregates).items())
+
+    def conditional_response(self, etag, handler, request, *args, **kwargs):
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        if self.etag_matches(request, etag):
+            return self.not_modified(etag)
+        return self.validated_response(request, handler(request, *args, **kwargs), etag)
+
+
+class ResponseCacheMixin(ConditionalGetMixin):
+    """
+    Mixins for read-through caching of responses (list / retrieve)
+    The cache key only depends on object versions, its digest is also the ETag.
+    """
+    def cached_response(self, key, handler, request, *args, check=None, **kwargs):
+        """
+        Response served from the cache when the key is known (and check(data) is true), else built by handler.
+        Auth, permissions and throttling have already run (APIView.initial).
+        Without a shared cache the versions of the key can be stale in this worker: no caching, no ETag.
+        """
+        if key is None or not shared_cache():
+            return handler(request, *args, **kwargs)
+        etag = quote_etag(key.rsplit(':', 1)[-1])
+        data = cache.get(key)
+        if data is not None and (check is None or check(data)):
+            return self.validated_response(request, Response(data), etag)
+        # réponse rendue depuis le primaire : des données en retard (réplica) resteraient en cache sous cette version
+        token = read_database.set(None)
+        try:
+            response = handler(request, *args, **kwargs)
+        finally:
+            read_database.reset(token)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT)
+        return self.validated_response(request, response, etag)
+
+
+class ReplicaReadMixin:
+    """
+    Mixins for read-replica routing: the queries of list / retrieve go to the replica (when configured),
+    except for a user who has just written (read-your-writes, see ReplicaStickinessMiddleware)
+    """
+    @contextmanager
+    def replica_reads(self, request):
+        token = read_database.set(read_alias(request))
+        try:
+            yield
+        finally:
+            read_database.reset(token)
+
+
+class SparseFieldsMixin:
+    """
+    Mixins for ?fields= / ?omit=: the columns of the pruned serializer fields are not loaded
+    """
+    def get_sparse_field_names(self):
+        return sparse_field_names(self.request, self.get_serializer_class().Meta.fields)
+
+    def sparse_queryset(self, queryset):
+        kept = self.get_sparse_field_names()
+        deferred = []
+        for name in self.get_serializer_class().Meta.fields:
+            if name in kept:
+                continue
+            try:
+                field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            # les FK restent chargées (select_related / permissions), seules les colonnes simples sont différées
+            if field.concrete and not field.is_relation and not field.primary_key:
+                deferred.append(name)
+        return queryset.defer(*deferred) if deferred else queryset
+
+    def sparse_cache_key(self):
+        # à inclure dans les clés de cache qui ne dépendent pas de l'URL
+        return ','.join(self.get_sparse_field_names())
+
+
+class FastListMixin:
+    """
+    Mixins for the read-only list fast path: rows read with .values() and rendered without serializer instances
+    """
+    def fast_list(self, request, *args, **kwargs):
+        values_serializer = ValuesSerializer.for_request(self.get_serializer_class(), request)
+        if values_serializer is None:
+            return mixins.ListModelMixin.list(self, request, *args, **kwargs)
+        queryset = values_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+        return Response(values_serializer.to_representation(queryset))
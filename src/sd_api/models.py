@@ -1,11 +1,15 @@
 import uuid
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 # from django.core import serializers
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
+from django.contrib.auth.hashers import make_password
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils import timezone
 
-from .enums import ProjectType, IssuePriority, IssueTag, CustomStatus
+from .enums import ProjectType, IssuePriority, IssueTag, CustomStatus, TaskStatus, ChangeAction
+from .hashers import arun_hashing, run_hashing, verify_and_rehash
 
 
 class CustomUserManager(BaseUserManager):
@@ -48,9 +52,30 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.username
 
+    # hachage dans le pool borné de sd_api.hashers (création de compte, connexion, utilisateur inconnu)
+    def set_password(self, raw_password):
+        self.password = run_hashing(make_password, raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        is_correct, password = run_hashing(verify_and_rehash, raw_password, self.password)
+        if password is not None:
+            # rehash transparent : hasher ou paramètres modifiés depuis le dernier hachage
+            self.password = password
+            self.save(update_fields=['password'])
+        return is_correct
+
+    async def acheck_password(self, raw_password):
+        is_correct, password = await arun_hashing(verify_and_rehash, raw_password, self.password)
+        if password is not None:
+            self.password = password
+            await self.asave(update_fields=['password'])
+        return is_correct
+
 
 class TimestampModel(models.Model):
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
@@ -67,12 +92,22 @@ class Project(TimestampModel, AuthorModel):
     name = models.CharField(max_length=100)
     description = models.TextField()
     type = models.CharField(max_length=3, choices=ProjectType.choices())
+    # suppression différée (SD_API_DELETE_MODE = 'deferred') : masqué en attendant la purge
+    is_hidden = models.BooleanField(default=False)
+    # id de la dernière entrée du journal des changements supprimée par la rétention (curseurs antérieurs refusés)
+    changes_horizon = models.BigIntegerField(default=0)
 
 
 class Contributor(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='contributions')
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='contributors')
 
+    class Meta:
+        constraints = [
+            # sert aussi d'index pour contributors__user et les recherches (user_id, project_id)
+            models.UniqueConstraint(fields=['user', 'project'], name='unique_contributor'),
+        ]
+
 
 class Issue(TimestampModel, AuthorModel):
     title = models.CharField(max_length=100)
@@ -83,8 +118,84 @@ class Issue(TimestampModel, AuthorModel):
     tag = models.CharField(max_length=4, choices=IssueTag.choices(), blank=False)
     status = models.CharField(max_length=4, choices=CustomStatus.choices(), default=CustomStatus.TODO.value)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'created_time'], name='issue_project_created_idx'),
+            # filtres de IssueFilter, dans un projet (visibilité) puis triés par date de création
+            models.Index(fields=['project', 'status', 'created_time'], name='issue_project_status_idx'),
+            models.Index(fields=['project', 'priority', 'created_time'], name='issue_project_priority_idx'),
+            models.Index(fields=['project', 'tag', 'created_time'], name='issue_project_tag_idx'),
+            models.Index(fields=['assignee', 'created_time'], name='issue_assignee_created_idx'),
+            models.Index(fields=['author', 'created_time'], name='issue_author_created_idx'),
+        ]
+
 
 class Comment(TimestampModel, AuthorModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     description = models.TextField()
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='comments')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', 'created_time'], name='comment_issue_created_idx'),
+        ]
+
+
+class ProjectCounter(models.Model):
+    """
+    Denormalized counter of a project (issues, comments, issues by status / priority / tag)
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='counters')
+    key = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'key'], name='unique_project_counter'),
+        ]
+
+
+class Task(TimestampModel):
+    """
+    Background task, run by python manage.py run_tasks (sd_api.tasks)
+    """
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=4, choices=TaskStatus.choices(), default=TaskStatus.PENDING.value)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # prochaine tâche à exécuter : statut puis date d'exécution
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+
+class Change(models.Model):
+    """
+    Append-only change log of a project (sd_api.changes): one row per created / updated / deleted
+    project, issue, comment or contributor. The id is the cursor of GET /api/projects/{id}/changes/?since=
+    """
+    # sans contrainte en base : une cascade depuis un utilisateur peut journaliser ses issues après la suppression
+    # de son projet dans la même transaction (entrées orphelines supprimées par compact_changes)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='changes', db_constraint=False)
+    object_type = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=36)
+    action = models.CharField(max_length=3, choices=ChangeAction.choices())
+    # champs de l'objet après modification (None pour une suppression)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_time = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # lecture des deltas d'un projet à partir d'un curseur
+            models.Index(fields=['project', 'id'], name='change_project_id_idx'),
+            # compactage : entrées plus récentes du même objet
+            models.Index(fields=['object_type', 'object_id', 'id'], name='change_object_idx'),
+            models.Index(fields=['created_time'], name='change_created_idx'),
+        ]
@@ -0,0 +1,110 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .exceptions import CustomBadRequest
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on (created_time, pk)
+    The pk is the tie-breaker for rows created at the same time (compared as values, UUID included),
+    so a page is an index range scan instead of an OFFSET scan.
+    The total count is only computed with ?count=true
+    """
+    ordering = ('created_time', 'pk')
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_time, pk = self.decode_cursor(cursor, queryset.model)
+            queryset = queryset.filter(Q(created_time__gt=created_time)
+                                       | Q(created_time=created_time, pk__gt=pk))
+
+        # une ligne de plus pour savoir s'il existe une page suivante
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+        return self.page
+
+    def get_paginated_response(self, data):
+        response_data = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response_data = {'count': self.count, **response_data}
+        return Response(response_data)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if limit <= 0:
+            return self.page_size
+        return min(limit, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def encode_cursor(self, obj):
+        # objet du modèle, ou ligne .values() (FastListMixin)
+        if isinstance(obj, dict):
+            position = f"{obj['created_time'].isoformat()}|{obj['pk']}"
+        else:
+            position = f"{obj.created_time.isoformat()}|{obj.pk}"
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            created_time, pk = urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+            created_time = parse_datetime(created_time)
+            pk = model._meta.pk.to_python(pk)
+        except (Base64Error, UnicodeDecodeError, ValueError, TypeError):
+            raise CustomBadRequest("Curseur invalide")
+        if created_time is None:
+            raise CustomBadRequest("Curseur invalide")
+        return created_time, pk
+
+
+class OptInKeysetPagination(LimitOffsetPagination):
+    """
+    LimitOffset pagination by default, keyset pagination when the client asks for it
+    (?pagination=cursor or a ?cursor= value)
+    """
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.keyset_class.cursor_query_param in request.query_params):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
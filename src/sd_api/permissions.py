@@ -1,6 +1,7 @@
 from rest_framework.permissions import BasePermission
 
-from .models import Contributor, Project, Issue, Comment
+from .models import Project, Issue, Comment
+from .membership import get_member_project_ids
 
 
 class IsMeOrAdmin(BasePermission):
@@ -27,15 +28,15 @@ class IsContributor(BasePermission):
     Check if the user is a contributor to the project
     """
     def has_object_permission(self, request, view, obj):
-        # On recupère l'instance du projet en fonction du type d'objet source
+        # On recupère l'ID du projet en fonction du type d'objet source (sans charger le projet)
         if isinstance(obj, Comment):
-            project = obj.issue.project
+            project_id = obj.issue.project_id
         elif isinstance(obj, Issue):
-            project = obj.project
+            project_id = obj.project_id
         elif isinstance(obj, Project):
-            project = obj
+            project_id = obj.pk
         else:
             return False
 
-        # On regarde si l'utilisateur est contributeur du projet
-        return Contributor.objects.filter(user=request.user, project=project).exists()
+        # On regarde si l'utilisateur est contributeur du projet (ensemble chargé une fois par requête)
+        return project_id in get_member_project_ids(request)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : rendu / parsing JSON standard de DRF
+    orjson = None
+
+
+# UUID et datetime sérialisés nativement par orjson ('Z' pour UTC, comme l'encodeur de DRF)
+ORJSON_OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer based on orjson when installed, same output as JSONRenderer (compact, UTF-8)
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # types inconnus d'orjson (Decimal, chaînes lazy...) : encodeur de DRF
+        return orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+
+
+class ORJSONParser(parsers.JSONParser):
+    """
+    JSON parser based on orjson when installed
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding).encode()
+            return orjson.loads(content)
+        except (ValueError, UnicodeError) as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def dumps(data):
+    """
+    Compact JSON as str (NDJSON export lines)
+    """
+    if orjson is None:
+        return renderers.JSONRenderer().render(data).decode()
+    return orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS).decode()
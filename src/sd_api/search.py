@@ -0,0 +1,135 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# index plein texte SQLite (FTS5), tenu à jour par des triggers : save, delete, bulk_create et update
+# des querysets passent tous par eux.
+# Les issues ont une clé primaire entière : la table FTS lit son contenu directement dans sd_api_issue.
+# Les commentaires ont un UUID : leur texte est recopié dans sd_api_comment_search (clé entière stable,
+# le rowid implicite pouvant changer après un VACUUM) qui sert de contenu à la table FTS.
+ISSUE_FTS_TABLE = 'sd_api_issue_fts'
+COMMENT_FTS_TABLE = 'sd_api_comment_fts'
+COMMENT_SEARCH_TABLE = 'sd_api_comment_search'
+
+# poids BM25 des colonnes : un mot du titre compte plus qu'un mot de la description
+ISSUE_RANK = f"bm25({ISSUE_FTS_TABLE}, 10.0, 1.0)"
+COMMENT_RANK = f"bm25({COMMENT_FTS_TABLE})"
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+# ids correspondant à la recherche (filtre pk__in) et rang d'une ligne (sous-requête corrélée, bm25() n'est
+# disponible que dans une requête MATCH sur la table FTS)
+ISSUE_MATCH_SQL = f"SELECT rowid FROM {ISSUE_FTS_TABLE} WHERE {ISSUE_FTS_TABLE} MATCH %s"
+ISSUE_RANK_SQL = (f"SELECT {ISSUE_RANK} FROM {ISSUE_FTS_TABLE} "
+                  f"WHERE {ISSUE_FTS_TABLE} MATCH %s AND rowid = sd_api_issue.id")
+COMMENT_MATCH_SQL = (f"SELECT search.comment_id FROM {COMMENT_FTS_TABLE} "
+                     f"JOIN {COMMENT_SEARCH_TABLE} search ON search.id = {COMMENT_FTS_TABLE}.rowid "
+                     f"WHERE {COMMENT_FTS_TABLE} MATCH %s")
+COMMENT_RANK_SQL = (f"SELECT {COMMENT_RANK} FROM {COMMENT_FTS_TABLE} "
+                    f"JOIN {COMMENT_SEARCH_TABLE} search ON search.id = {COMMENT_FTS_TABLE}.rowid "
+                    f"WHERE {COMMENT_FTS_TABLE} MATCH %s AND search.comment_id = sd_api_comment.id")
+
+CREATE_SQL = [
+    f"CREATE VIRTUAL TABLE {ISSUE_FTS_TABLE} USING fts5("
+    f"title, description, content='sd_api_issue', content_rowid='id', {TOKENIZE})",
+    f"""CREATE TRIGGER sd_api_issue_fts_insert AFTER INSERT ON sd_api_issue BEGIN
+        INSERT INTO {ISSUE_FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER sd_api_issue_fts_delete AFTER DELETE ON sd_api_issue BEGIN
+        INSERT INTO {ISSUE_FTS_TABLE}({ISSUE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER sd_api_issue_fts_update AFTER UPDATE OF title, description ON sd_api_issue BEGIN
+        INSERT INTO {ISSUE_FTS_TABLE}({ISSUE_FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {ISSUE_FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+
+    f"""CREATE TABLE {COMMENT_SEARCH_TABLE} (
+        id INTEGER PRIMARY KEY, comment_id char(32) NOT NULL UNIQUE, description TEXT NOT NULL)""",
+    f"CREATE VIRTUAL TABLE {COMMENT_FTS_TABLE} USING fts5("
+    f"description, content='{COMMENT_SEARCH_TABLE}', content_rowid='id', {TOKENIZE})",
+    f"""CREATE TRIGGER sd_api_comment_search_insert AFTER INSERT ON {COMMENT_SEARCH_TABLE} BEGIN
+        INSERT INTO {COMMENT_FTS_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER sd_api_comment_search_delete AFTER DELETE ON {COMMENT_SEARCH_TABLE} BEGIN
+        INSERT INTO {COMMENT_FTS_TABLE}({COMMENT_FTS_TABLE}, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER sd_api_comment_fts_insert AFTER INSERT ON sd_api_comment BEGIN
+        INSERT INTO {COMMENT_SEARCH_TABLE}(comment_id, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER sd_api_comment_fts_delete AFTER DELETE ON sd_api_comment BEGIN
+        DELETE FROM {COMMENT_SEARCH_TABLE} WHERE comment_id = old.id;
+    END""",
+    f"""CREATE TRIGGER sd_api_comment_fts_update AFTER UPDATE OF description ON sd_api_comment BEGIN
+        DELETE FROM {COMMENT_SEARCH_TABLE} WHERE comment_id = old.id;
+        INSERT INTO {COMMENT_SEARCH_TABLE}(comment_id, description) VALUES (new.id, new.description);
+    END""",
+
+    # indexation des lignes existantes
+    f"INSERT INTO {ISSUE_FTS_TABLE}({ISSUE_FTS_TABLE}) VALUES ('rebuild')",
+    f"INSERT INTO {COMMENT_SEARCH_TABLE}(comment_id, description) SELECT id, description FROM sd_api_comment",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS sd_api_comment_fts_update",
+    "DROP TRIGGER IF EXISTS sd_api_comment_fts_delete",
+    "DROP TRIGGER IF EXISTS sd_api_comment_fts_insert",
+    f"DROP TABLE IF EXISTS {COMMENT_FTS_TABLE}",
+    f"DROP TABLE IF EXISTS {COMMENT_SEARCH_TABLE}",
+    "DROP TRIGGER IF EXISTS sd_api_issue_fts_update",
+    "DROP TRIGGER IF EXISTS sd_api_issue_fts_delete",
+    "DROP TRIGGER IF EXISTS sd_api_issue_fts_insert",
+    f"DROP TABLE IF EXISTS {ISSUE_FTS_TABLE}",
+]
+
+
+def fts_enabled(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """
+    User input to an FTS5 query : every word quoted (no operator / syntax error), all words required
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def ranked_matches(queryset, match_sql, rank_sql, query):
+    """
+    Rows of the queryset whose pk is in the FTS matches, best ranked (lowest bm25) first
+    """
+    return (queryset.filter(pk__in=RawSQL(match_sql, [query]))
+            .annotate(search_rank=RawSQL(rank_sql, [query]))
+            .order_by('search_rank'))
+
+
+def search_issues(queryset, text):
+    """
+    Issues of the queryset matching every word of text (title / description), best ranked first
+    """
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+    if not fts_enabled():
+        # autres bases : pas d'index plein texte, recherche simple sans classement
+        return queryset.filter(*[Q(title__icontains=word) | Q(description__icontains=word)
+                                 for word in re.findall(r'\w+', text)])
+    return ranked_matches(queryset, ISSUE_MATCH_SQL, ISSUE_RANK_SQL, query)
+
+
+def search_comments(queryset, text):
+    """
+    Comments of the queryset matching every word of text, best ranked first
+    """
+    query = fts_query(text)
+    if not query:
+        return queryset.none()
+    if not fts_enabled():
+        return queryset.filter(*[Q(description__icontains=word) for word in re.findall(r'\w+', text)])
+    return ranked_matches(queryset, COMMENT_MATCH_SQL, COMMENT_RANK_SQL, query)
@@ -1,9 +1,53 @@
 from rest_framework import serializers
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import CustomUser, Project, Contributor, Issue, Comment
 from .exceptions import CustomBadRequest
-
-
-class CustomUserSerializer(serializers.ModelSerializer):
+from .authentication import ClaimsRefreshToken, USER_CLAIMS
+from .metrics import serialization_timer
+
+
+def sparse_field_names(request, names):
+    """
+    Field names kept by ?fields= / ?omit= (comma separated), read requests only
+    """
+    names = list(names)
+    if request is None or request.method != 'GET':
+        return names
+    params = getattr(request, 'query_params', request.GET)
+    fields = [name for name in params.get('fields', '').split(',') if name]
+    omit = [name for name in params.get('omit', '').split(',') if name]
+    unknown = sorted(set(fields + omit) - set(names))
+    if unknown:
+        raise CustomBadRequest(f"Champ(s) inconnu(s) : {', '.join(unknown)}")
+    if fields:
+        names = [name for name in names if name in fields]
+    return [name for name in names if name not in omit]
+
+
+class SparseFieldsMixin:
+    """
+    Mixin for ?fields= / ?omit= on the rendered fields (views: mixins.SparseFieldsMixin for the columns)
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        kept = sparse_field_names(self.context.get('request'), fields)
+        return {name: field for name, field in fields.items() if name in kept}
+
+
+class TimedSerializerMixin:
+    """
+    Mixin for the serializers of the API: time spent in to_representation counted in the request metrics
+    (lists: the items, nested serializers are not counted twice)
+    """
+    def to_representation(self, instance):
+        with serialization_timer():
+            return super().to_representation(instance)
+
+
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'password', 'age', 'is_superuser']
@@ -18,57 +62,101 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return user
 
 
-class CustomUserDetailSerializer(serializers.ModelSerializer):
+class CustomUserDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         # fields = '__all__' => pb affiche même le mdp
         fields = ['id', 'username', 'age', 'can_be_contacted', 'can_data_be_shared', 'is_active', 'created_at']
 
 
-class CustomUserUpdateSerializer(serializers.ModelSerializer):
+class CustomUserUpdateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['username', 'age', 'can_be_contacted', 'can_data_be_shared']
 
 
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    # is_staff / is_superuser dans les tokens : authentification sans lecture de l'utilisateur en base
+    token_class = ClaimsRefreshToken
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with the blacklist checked from the cache. The user is read again (one query per refresh):
+    deleted / inactive users are rejected, USER_CLAIMS of the new tokens come from the database.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        try:
+            user_id = refresh[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user = (CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .only('is_active', *USER_CLAIMS).first())
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("Utilisateur inconnu ou inactif", code='user_inactive')
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+
+        data = {'access': str(refresh.access_token)}
+        # même rotation que TokenRefreshSerializer
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
 class TokenBlacklistSerializer(serializers.Serializer):
     refresh = serializers.CharField()
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'type', 'author', 'created_time']
-        read_only_fields = ['author', 'created_time']
+        fields = ['id', 'name', 'description', 'type', 'author', 'created_time', 'updated_time']
+        read_only_fields = ['author', 'created_time', 'updated_time']
 
 
-class ContributorSerializer(serializers.ModelSerializer):
+class ContributorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Contributor
         fields = ['user', 'project']
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     # project_details = ProjectSerializer(source='project', read_only=True)
 
     class Meta:
         model = Issue
         fields = ['id', 'title', 'project', 'description', 'assignee',
-                  'priority', 'tag', 'status', 'author', 'created_time']
-        read_only_fields = ['author', 'created_time']
+                  'priority', 'tag', 'status', 'author', 'created_time', 'updated_time']
+        read_only_fields = ['author', 'created_time', 'updated_time']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     # ajout du projet via une methode (champ non présent dans le model)
     project = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'description', 'issue', 'project', 'author', 'created_time']
-        read_only_fields = ['id', 'issue', 'author', 'created_time']
+        fields = ['id', 'description', 'issue', 'project', 'author', 'created_time', 'updated_time']
+        read_only_fields = ['id', 'issue', 'author', 'created_time', 'updated_time']
 
     def get_project(self, obj):
+        # champs annotés par CommentViewSet.get_queryset, sinon on passe par l'issue (ex : après un create)
+        if hasattr(obj, 'project_name'):
+            return {
+                "id": obj.issue.project_id,
+                "name": obj.project_name,
+                "description": obj.project_description
+            }
         return {
             "id": obj.issue.project.id,
             "name": obj.issue.project.name,
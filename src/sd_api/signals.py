@@ -0,0 +1,203 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .models import CustomUser, Project, Contributor, Issue, Comment
+from .membership import invalidate_membership
+from .caching import bump_version
+from .blacklist import mark_blacklisted, revoke_user
+from .counters import COUNTED_FIELDS, apply_counter_deltas, issue_counter_keys, issue_values
+from .changes import record_change
+from .enums import ChangeAction
+
+
+def deleted_with(origin, *models):
+    """
+    True if the deletion is a cascade from one of the models (instance or queryset origin)
+    """
+    return isinstance(origin, models) or getattr(origin, 'model', None) in models
+
+
+def project_deleted_with(origin, project_id):
+    """
+    True if the project is deleted in the same cascade: origin project, or its author (instance or queryset)
+    """
+    if deleted_with(origin, Project):
+        return True
+    if not deleted_with(origin, CustomUser):
+        return False
+    project_ids = getattr(origin, '_deleted_project_ids', None)
+    if project_ids is None:
+        # lu une fois par cascade, les projets sont supprimés après leurs issues / commentaires
+        authors = [origin.pk] if isinstance(origin, CustomUser) else origin.values('pk')
+        project_ids = set(Project.objects.filter(author__in=authors).values_list('pk', flat=True))
+        origin._deleted_project_ids = project_ids
+    return project_id in project_ids
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    bump_version('users', 'all')
+
+
+@receiver(post_save, sender=CustomUser)
+def user_deactivated(sender, instance, **kwargs):
+    if not instance.is_active:
+        revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Contributor)
+def contributor_changed(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id)
+    bump_version('project', instance.project_id)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def project_changed(sender, instance, **kwargs):
+    bump_version('project', instance.pk)
+
+
+@receiver(pre_save, sender=Issue)
+def issue_moving(sender, instance, **kwargs):
+    # état précédent de l'issue : invalidation de l'ancien projet et mise à jour des compteurs
+    instance._previous_state = None
+    if instance.pk is not None:
+        instance._previous_state = Issue.objects.filter(pk=instance.pk).values(
+            'project_id', *COUNTED_FIELDS).first()
+        previous = instance._previous_state
+        if previous is not None and previous['project_id'] != instance.project_id:
+            bump_version('project', previous['project_id'])
+
+
+@receiver([post_save, post_delete], sender=Issue)
+def issue_changed(sender, instance, **kwargs):
+    bump_version('issue', instance.pk)
+    bump_version('project', instance.project_id)
+
+
+@receiver(post_save, sender=Issue)
+def issue_counters_saved(sender, instance, created, **kwargs):
+    deltas = {}
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        for key in issue_counter_keys(issue_values(instance)):
+            deltas[(instance.project_id, key)] = 1
+    else:
+        for key in issue_counter_keys(previous):
+            deltas[(previous['project_id'], key)] = -1
+        for key in issue_counter_keys(issue_values(instance)):
+            deltas[(instance.project_id, key)] = deltas.get((instance.project_id, key), 0) + 1
+        if previous['project_id'] != instance.project_id:
+            # les commentaires suivent l'issue dans son nouveau projet
+            nb_comments = instance.comments.count()
+            deltas[(previous['project_id'], 'comments')] = -nb_comments
+            deltas[(instance.project_id, 'comments')] = nb_comments
+    apply_counter_deltas(deltas)
+
+
+@receiver(pre_delete, sender=Issue)
+def issue_deleting(sender, instance, origin=None, **kwargs):
+    # nb de commentaires supprimés en cascade, lu avant leur suppression
+    if not deleted_with(origin, Project):
+        instance._nb_comments = instance.comments.count()
+
+
+@receiver(post_delete, sender=Issue)
+def issue_counters_deleted(sender, instance, origin=None, **kwargs):
+    # suppression du projet (ou de son auteur) : ses compteurs sont supprimés en cascade
+    if project_deleted_with(origin, instance.project_id):
+        return
+    deltas = {(instance.project_id, key): -1 for key in issue_counter_keys(issue_values(instance))}
+    deltas[(instance.project_id, 'comments')] = -getattr(instance, '_nb_comments', 0)
+    apply_counter_deltas(deltas)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # les réponses projet / issue n'incluent pas les commentaires : seule la version de l'issue change
+    bump_version('issue', instance.issue_id)
+
+
+def comment_project_id(comment):
+    if Comment.issue.is_cached(comment):
+        return comment.issue.project_id
+    return Issue.objects.filter(pk=comment.issue_id).values_list('project_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_counters_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_counter_deltas({(comment_project_id(instance), 'comments'): 1})
+
+
+@receiver(post_delete, sender=Comment)
+def comment_counters_deleted(sender, instance, origin=None, **kwargs):
+    # suppression en cascade d'une issue / d'un projet : déjà pris en compte par issue_counters_deleted
+    if deleted_with(origin, Issue, Project):
+        return
+    project_id = comment_project_id(instance)
+    if not project_deleted_with(origin, project_id):
+        apply_counter_deltas({(project_id, 'comments'): -1})
+
+
+# journal des changements (sd_api.changes) : les suppressions en cascade d'un projet emportent son journal,
+# celles d'une issue sous-entendent ses commentaires
+
+
+def saved_action(created):
+    return ChangeAction.CREATE if created else ChangeAction.UPDATE
+
+
+@receiver(post_save, sender=Project)
+def project_logged(sender, instance, created, **kwargs):
+    record_change(instance, saved_action(created), instance.pk)
+
+
+@receiver(post_save, sender=Contributor)
+def contributor_logged(sender, instance, created, **kwargs):
+    record_change(instance, saved_action(created), instance.project_id)
+
+
+@receiver(post_delete, sender=Contributor)
+def contributor_log_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Project):
+        record_change(instance, ChangeAction.DELETE, instance.project_id)
+
+
+@receiver(post_save, sender=Issue)
+def issue_logged(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if previous is not None and previous['project_id'] != instance.project_id:
+        # issue déplacée : supprimée de l'ancien projet, créée dans le nouveau
+        record_change(instance, ChangeAction.DELETE, previous['project_id'])
+        created = True
+    record_change(instance, saved_action(created), instance.project_id)
+
+
+@receiver(post_delete, sender=Issue)
+def issue_log_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Project):
+        record_change(instance, ChangeAction.DELETE, instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_logged(sender, instance, created, **kwargs):
+    record_change(instance, saved_action(created), comment_project_id(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_log_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Issue, Project):
+        record_change(instance, ChangeAction.DELETE, comment_project_id(instance))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    # quel que soit le chemin (vue, refresh avec rotation, admin) le cache du blacklist est mis à jour
+    outstanding = instance.token
+    mark_blacklisted(outstanding.jti, outstanding.expires_at.timestamp())
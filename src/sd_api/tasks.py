@@ -0,0 +1,142 @@
+import os
+import socket
+import traceback
+from contextvars import ContextVar
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .enums import TaskStatus
+from .models import Task
+
+
+# {nom : fonction} des tâches déclarées avec @task
+TASKS = {}
+# tâche "running" dont le worker a disparu (arrêt brutal) : reprise après ce délai
+STALE_AFTER = getattr(settings, 'SD_API_TASKS_STALE_AFTER', 600)  # secondes
+# tâche longue : locked_at rafraîchi par heartbeat() au plus souvent tous les HEARTBEAT_INTERVAL,
+# une tâche encore en cours n'est donc jamais reprise par un autre worker
+HEARTBEAT_INTERVAL = STALE_AFTER / 4
+
+# tâche exécutée par ce worker (run_task), lue par heartbeat()
+_running_task = ContextVar('sd_api_running_task', default=None)
+
+
+def task(max_attempts=3, retry_delay=10):
+    """
+    Declares a background task: func.delay(**kwargs) enqueues it (JSON kwargs).
+    Retried max_attempts times in all, retry_delay (seconds) doubled after each failure.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__name__}"
+        func.task_name = name
+        func.max_attempts = max_attempts
+        func.retry_delay = retry_delay
+        func.delay = lambda **kwargs: enqueue(name, kwargs)
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, kwargs, delay=0):
+    """
+    Task row written in the transaction of the request: it only exists (and runs) if the write is committed.
+    SD_API_TASKS_EAGER runs it at once instead (development without worker).
+    """
+    func = get_task(name)
+    if getattr(settings, 'SD_API_TASKS_EAGER', False):
+        transaction.on_commit(lambda: func(**kwargs))
+        return None
+    return Task.objects.create(name=name, kwargs=kwargs, max_attempts=func.max_attempts,
+                               run_after=timezone.now() + timedelta(seconds=delay))
+
+
+def get_task(name):
+    if name not in TASKS:
+        # module de la tâche pas encore importé par ce processus (worker)
+        import_module(name.rsplit('.', 1)[0])
+    return TASKS[name]
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_task(worker):
+    """
+    Next due task marked as running by this worker, None when the queue is empty.
+    Optimistic claim (conditional UPDATE), no SELECT ... FOR UPDATE needed: works with SQLite.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(
+        Q(status=TaskStatus.PENDING.value, run_after__lte=now)
+        | Q(status=TaskStatus.RUNNING.value, locked_at__lt=now - timedelta(seconds=STALE_AFTER))
+    ).order_by('run_after', 'pk')
+    for candidate in due.values('pk', 'status', 'locked_at')[:10]:
+        claimed = Task.objects.filter(pk=candidate['pk'], status=candidate['status'],
+                                      locked_at=candidate['locked_at']).update(
+            status=TaskStatus.RUNNING.value, locked_by=worker, locked_at=now, updated_time=now)
+        if claimed:
+            return Task.objects.get(pk=candidate['pk'])
+        # prise par un autre worker entre la lecture et la mise à jour : candidate suivante
+    return None
+
+
+def heartbeat():
+    """
+    Refreshes locked_at of the task being run, called by long tasks in their batch loops.
+    No-op outside a task or when the last refresh is recent.
+    """
+    task_row = _running_task.get()
+    if task_row is None:
+        return
+    now = timezone.now()
+    if now - task_row.locked_at < timedelta(seconds=HEARTBEAT_INTERVAL):
+        return
+    Task.objects.filter(pk=task_row.pk, locked_by=task_row.locked_by).update(locked_at=now)
+    task_row.locked_at = now
+
+
+def run_task(task_row):
+    """
+    Runs a claimed task, then records its status (done, retry later, or failed)
+    """
+    task_row.attempts += 1
+    token = _running_task.set(task_row)
+    try:
+        func = get_task(task_row.name)
+        func(**task_row.kwargs)
+    except Exception:
+        task_row.last_error = traceback.format_exc()[-4000:]
+        if task_row.attempts < task_row.max_attempts:
+            delay = getattr(TASKS.get(task_row.name), 'retry_delay', 10) * 2 ** (task_row.attempts - 1)
+            task_row.status = TaskStatus.PENDING.value
+            task_row.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            task_row.status = TaskStatus.FAILED.value
+    else:
+        task_row.status = TaskStatus.DONE.value
+    finally:
+        _running_task.reset(token)
+    task_row.locked_at = None
+    task_row.save(update_fields=['attempts', 'status', 'run_after', 'last_error', 'locked_at', 'updated_time'])
+    return task_row.status
+
+
+def run_pending(worker=None, limit=None):
+    """
+    Runs the due tasks until the queue is empty (or limit tasks), returns the number run
+    """
+    worker = worker or worker_name()
+    done = 0
+    while limit is None or done < limit:
+        task_row = claim_task(worker)
+        if task_row is None:
+            break
+        run_task(task_row)
+        done += 1
+    return done
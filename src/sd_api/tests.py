@@ -0,0 +1,1270 @@
+import csv
+import gzip
+import json
+import os
+import runpy
+import tempfile
+import threading
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.urls import resolve
+from django.utils import timezone
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ListSerializer, Serializer
+from rest_framework import urls as rest_framework_urls
+from rest_framework.test import APITestCase, APITransactionTestCase, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import CustomUser, Project, Contributor, Issue, Comment, Task
+from .membership import get_member_project_ids
+from .counters import get_project_stats
+from .caching import get_version
+from .serializers import ProjectSerializer, IssueSerializer, CommentSerializer
+from .renderers import ORJSONRenderer, ORJSONParser, orjson
+from . import database, metrics, urls
+from .authentication import ClaimsRefreshToken, ClaimsJWTAuthentication
+from .benchmarks import SCENARIOS, BenchContext, generate_dataset, isolated_cache
+from .database import PrimaryReplicaRouter
+from .changes import compact_changes
+from .deletion import bulk_delete_issue, bulk_delete_project, hide_project, raw_delete
+from .search import COMMENT_SEARCH_TABLE, fts_enabled
+from .tasks import STALE_AFTER, task, claim_task, heartbeat, run_pending
+from .enums import TaskStatus
+from .hashers import TunedPBKDF2PasswordHasher, TunedScryptPasswordHasher, verify_and_rehash
+from .throttles import CombinedRateThrottle
+from sd_support import settings as settings_module
+
+
+class FixturesMixin:
+    """
+    Fixture helpers of the sd_api tests, the cache is emptied before each test
+    """
+    def setUp(self):
+        # compteurs du throttle, versions et appartenances stockés dans le cache
+        cache.clear()
+
+    @staticmethod
+    def create_user(username, **kwargs):
+        return CustomUser.objects.create_user(username=username, age=30, password='pwd', **kwargs)
+
+    @staticmethod
+    def create_project(author, name="projet", contributor=True):
+        """
+        Project of the author, also its contributor (as with POST /api/projects/) unless contributor=False
+        """
+        project = Project.objects.create(name=name, description="desc", type='BAE', author=author)
+        if contributor:
+            Contributor.objects.create(user=author, project=project)
+        return project
+
+    @staticmethod
+    def create_issue(project, author, title="issue", **kwargs):
+        fields = {'description': "desc", 'assignee': author, 'priority': 'LOW', 'tag': 'BUG', **kwargs}
+        return Issue.objects.create(title=title, project=project, author=author, **fields)
+
+
+class SdApiTestCase(FixturesMixin, APITestCase):
+    """
+    Base class of the sd_api API tests (APITransactionTestCase classes use FixturesMixin directly)
+    """
+
+
+class CommentQueryBudgetTests(SdApiTestCase):
+    """
+    Regression: the comment endpoints must not do one query per row (N+1 on the project)
+    """
+    # appartenance + agrégat de l'ETag + count (pagination) + page de commentaires
+    LIST_QUERY_BUDGET = 4
+    # appartenance + agrégat de l'ETag + commentaire
+    RETRIEVE_QUERY_BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('alice')
+        for index in range(3):
+            project = cls.create_project(cls.user, f"projet {index}")
+            issue = cls.create_issue(project, cls.user, f"issue {index}")
+            for _ in range(10):
+                Comment.objects.create(description="commentaire", issue=issue, author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        for limit in (1, 5, 20):
+            cache.clear()
+            nb_queries, response = self.count_queries(f'/api/comments/?limit={limit}')
+            self.assertEqual(len(response.data['results']), limit)
+            self.assertLessEqual(nb_queries, self.LIST_QUERY_BUDGET, f"limit={limit}")
+
+    def test_list_project_fields(self):
+        _, response = self.count_queries('/api/comments/?limit=30')
+        for row in response.data['results']:
+            comment = Comment.objects.get(pk=row['id'])
+            self.assertEqual(row['project'], {
+                "id": comment.issue.project.id,
+                "name": comment.issue.project.name,
+                "description": comment.issue.project.description,
+            })
+
+    def test_retrieve_query_count(self):
+        comment = Comment.objects.first()
+        nb_queries, response = self.count_queries(f'/api/comments/{comment.pk}/')
+        self.assertEqual(response.data['project']['id'], comment.issue.project_id)
+        self.assertLessEqual(nb_queries, self.RETRIEVE_QUERY_BUDGET)
+
+
+class KeysetPaginationTests(SdApiTestCase):
+    """
+    Keyset mode: every comment exactly once, ties on created_time broken by the (UUID) pk
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('bob')
+        project = cls.create_project(cls.user)
+        issue = cls.create_issue(project, cls.user)
+        for _ in range(7):
+            Comment.objects.create(description="commentaire", issue=issue, author=cls.user)
+        # même created_time pour forcer le départage par la pk
+        Comment.objects.update(created_time=Comment.objects.first().created_time)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_walk_all_pages(self):
+        seen = []
+        response = self.client.get('/api/comments/?pagination=cursor&limit=3&count=true')
+        self.assertEqual(response.data['count'], 7)
+        url = '/api/comments/?pagination=cursor&limit=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/comments/?cursor=pas-un-curseur')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SD_API_SHARED_CACHE=True)
+class MembershipCacheTests(SdApiTestCase):
+    """
+    The contributor check is served from the cache and follows Contributor changes
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = cls.create_user('carol')
+        cls.other = cls.create_user('dave')
+        cls.project = cls.create_project(cls.owner)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.other)
+
+    def member_project_ids(self):
+        # nouvelle requête à chaque appel : seul le cache partagé est réutilisé
+        request = APIRequestFactory().get('/')
+        request.user = self.other
+        return get_member_project_ids(request)
+
+    def test_invalidated_on_contributor_change(self):
+        self.assertNotIn(self.project.pk, self.member_project_ids())
+        contributor = Contributor.objects.create(user=self.other, project=self.project)
+        self.assertIn(self.project.pk, self.member_project_ids())
+        with self.assertNumQueries(0):
+            self.member_project_ids()
+        contributor.delete()
+        self.assertNotIn(self.project.pk, self.member_project_ids())
+
+    def test_permission_served_from_cache(self):
+        Contributor.objects.create(user=self.other, project=self.project)
+        url = f'/api/projects/{self.project.pk}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(0):
+            # appartenance et réponse viennent du cache
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(SD_API_SHARED_CACHE=False)
+    def test_per_process_cache_reads_db(self):
+        contributor = Contributor.objects.create(user=self.other, project=self.project)
+        url = f'/api/projects/{self.project.pk}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertNotIn('ETag', self.client.get(url))
+        # retrait fait par un autre worker : aucune invalidation dans le cache de ce processus
+        raw_delete(Contributor.objects.filter(pk=contributor.pk), connection.alias)
+        self.assertNotIn(self.project.pk, self.member_project_ids())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class BulkCreateTests(SdApiTestCase):
+    """
+    List payloads: one query per referenced model, nothing created when an item is invalid
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('erin')
+        cls.other = cls.create_user('frank')
+        cls.project = cls.create_project(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def issue_payload(self, title, **kwargs):
+        return {'title': title, 'description': "desc", 'project': self.project.pk,
+                'priority': 'LOW', 'tag': 'BUG', **kwargs}
+
+    def test_bulk_issues_and_comments(self):
+        payload = [self.issue_payload(f"issue {index}") for index in range(20)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/issues/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 20)
+        self.assertLess(len(context.captured_queries), 10)
+
+        payload = [{'issue': row['id'], 'description': "commentaire"} for row in response.data]
+        response = self.client.post('/api/comments/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertEqual(response.data[0]['project']['id'], self.project.pk)
+
+    def test_bulk_errors_per_item(self):
+        payload = [self.issue_payload("ok"), self.issue_payload("ko", project=0), self.issue_payload("")]
+        response = self.client.post('/api/issues/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('project', errors[1])
+        self.assertIn('title', errors[2])
+        self.assertFalse(Issue.objects.exists())
+
+    def test_bulk_contributors(self):
+        url = f'/api/projects/{self.project.pk}/contributors/'
+        response = self.client.post(url, [{'user_id': self.other.pk}, {'user_id': self.user.pk}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0], {})
+        response = self.client.post(url, [{'user_id': self.other.pk}], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Contributor.objects.filter(user=self.other, project=self.project).exists())
+
+
+class CombinedRateThrottleTests(SdApiTestCase):
+    """
+    The burst limit applies per user, not per IP
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = cls.create_user('gina')
+        cls.second = cls.create_user('hugo')
+
+    def test_burst_limit_per_user(self):
+        self.client.force_authenticate(self.first)
+        statuses = [self.client.get('/api/projects/').status_code for _ in range(11)]
+        self.assertEqual(statuses[:10], [200] * 10)
+        self.assertEqual(statuses[10], 429)
+        # même IP, autre utilisateur : compteur distinct
+        self.client.force_authenticate(self.second)
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+
+    def test_denied_requests_not_counted(self):
+        self.client.force_authenticate(self.first)
+        with mock.patch.object(CombinedRateThrottle, 'timer', mock.Mock(return_value=86400 * 100 + 30)):
+            statuses = [self.client.get('/api/projects/').status_code for _ in range(15)]
+        self.assertEqual(statuses.count(429), 5)
+        # quota journalier : seules les requêtes acceptées sont comptées
+        key = CombinedRateThrottle.cache_format % {'scope': 'user', 'ident': self.first.pk, 'duration': 86400,
+                                                   'window': 100}
+        self.assertEqual(cache.get(key), 10)
+
+
+@override_settings(SD_API_SHARED_CACHE=True)
+class ResponseCacheTests(SdApiTestCase):
+    """
+    Cached project / issue responses follow the changes of the objects
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('ines')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_invalidated_on_save(self):
+        # 10 requêtes / minute maximum (throttle burst)
+        # version de l'issue créée par la première réponse 200, réponse mise en cache par la suivante
+        self.client.get(f'/api/issues/{self.issue.pk}/')
+        for url in (f'/api/projects/{self.project.pk}/', f'/api/issues/{self.issue.pk}/', '/api/projects/'):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                self.client.get(url)
+
+        self.issue.title = "renommée"
+        self.issue.save()
+        self.assertEqual(self.client.get(f'/api/issues/{self.issue.pk}/').data['title'], "renommée")
+        self.project.name = "renommé"
+        self.project.save()
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}/').data['name'], "renommé")
+        self.assertEqual(self.client.get('/api/projects/').data['results'][0]['name'], "renommé")
+
+    def test_not_served_to_other_users(self):
+        other = self.create_user('jules')
+        self.client.get(f'/api/issues/{self.issue.pk}/')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/issues/{self.issue.pk}/').status_code, 404)
+
+    def test_no_version_for_unknown_objects(self):
+        self.assertEqual(self.client.get('/api/issues/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/projects/999999/contributors/').status_code, 404)
+        self.assertIsNone(get_version('issue', 999999, create=False))
+        self.assertIsNone(get_version('project', 999999, create=False))
+
+
+@override_settings(SD_API_SHARED_CACHE=True)
+class ConditionalGetTests(SdApiTestCase):
+    """
+    ETag / If-None-Match on the polled endpoints
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('karim')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user)
+        Comment.objects.create(description="commentaire", issue=cls.issue, author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified_then_modified(self):
+        urls = (f'/api/projects/{self.project.pk}/', f'/api/issues/?project={self.project.pk}',
+                f'/api/comments/?issue={self.issue.pk}')
+        etags = {}
+        for url in urls:
+            response = self.client.get(url)
+            etags[url] = response['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304)
+        self.assertIn('Last-Modified', self.client.get(urls[0]))
+
+        Comment.objects.create(description="nouveau", issue=self.issue, author=self.user)
+        response = self.client.get(urls[2], HTTP_IF_NONE_MATCH=etags[urls[2]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+
+class AsyncReadPathTests(SdApiTestCase):
+    """
+    The async read path returns the same bodies as the DRF viewsets
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('lea')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user)
+        cls.comment = Comment.objects.create(description="commentaire", issue=cls.issue, author=cls.user)
+        cls.token = str(RefreshToken.for_user(cls.user).access_token)
+
+    async def test_same_body_as_sync(self):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        for path in ('projects/', f'projects/{self.project.pk}/', f'issues/?project={self.project.pk}',
+                     f'issues/{self.issue.pk}/', f'comments/?issue={self.issue.pk}', f'comments/{self.comment.pk}/'):
+            await cache.aclear()
+            sync_response = await self.async_client.get(f'/api/{path}', headers=headers)
+            await cache.aclear()
+            async_response = await self.async_client.get(f'/api/async/{path}', headers=headers)
+            self.assertEqual(async_response.status_code, 200, path)
+            self.assertEqual(async_response.content, sync_response.content, path)
+
+    async def test_errors(self):
+        response = await self.async_client.get('/api/async/projects/')
+        self.assertEqual(response.status_code, 401)
+        headers = {'Authorization': f'Bearer {self.token}'}
+        response = await self.async_client.get('/api/async/comments/pas-un-uuid/', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['status_code'], 404)
+
+
+class ClaimsAuthenticationTests(SdApiTestCase):
+    """
+    Tokens from /api/token/ carry the claims : no SELECT of the user per request
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('marc')
+
+    def test_no_user_query(self):
+        response = self.client.post('/api/token/', {'username': 'marc', 'password': 'pwd'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.client.get('/api/projects/')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if 'sd_api_customuser' in query['sql']])
+
+    def test_deferred_fields_loaded_on_access(self):
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        user = ClaimsJWTAuthentication().get_user(token)
+        self.assertEqual((user.pk, user.is_staff, user.is_superuser), (self.user.pk, False, False))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'marc')
+
+    def test_refresh_reads_user(self):
+        refresh = str(ClaimsRefreshToken.for_user(self.user))
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AccessToken(response.data['access'])['is_staff'])
+
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+        CustomUser.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    def test_staff_claims_not_swapped(self):
+        staff = self.create_user('admin', is_staff=True)
+        user = ClaimsJWTAuthentication().get_user(ClaimsRefreshToken.for_user(staff).access_token)
+        self.assertEqual((user.pk, user.is_staff, user.is_superuser, user.is_active), (staff.pk, True, False, True))
+
+    def test_deleted_user_cannot_write(self):
+        access = str(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.user.delete()
+        # révocation faite par un autre worker (cache par processus) : l'écriture relit l'utilisateur
+        cache.clear()
+        response = self.client.post('/api/projects/', {'name': "p", 'description': "d", 'type': 'BAE'})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Project.objects.exists())
+
+    def test_deactivated_user_refused(self):
+        access = str(ClaimsRefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.get('/api/projects/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/projects/').status_code, 401)
+
+
+@override_settings(SD_API_SHARED_CACHE=True)
+class TokenBlacklistCacheTests(SdApiTestCase):
+    """
+    The blacklist check of the refresh tokens is served from the cache
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('nina')
+
+    def test_refresh_then_blacklist(self):
+        refresh = self.client.post('/api/token/', {'username': 'nina', 'password': 'pwd'}).data['refresh']
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 200)
+        # lecture de l'utilisateur seulement, le blacklist est lu dans le cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 200)
+
+        access = self.client.post('/api/token/refresh/', {'refresh': refresh}).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(self.client.post('/api/token/blacklist/', {'refresh': refresh}).status_code, 205)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    @override_settings(SD_API_SHARED_CACHE=False)
+    def test_not_blacklisted_not_cached_per_process(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 200)
+        # mise en blacklist par un autre worker (sans le signal qui met à jour le cache de ce processus)
+        outstanding = OutstandingToken.objects.get(jti=refresh['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+
+
+class ProjectCounterTests(SdApiTestCase):
+    """
+    Denormalized project counters follow the writes and match a full recount
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('oscar')
+        cls.project = cls.create_project(cls.user)
+        cls.other_project = cls.create_project(cls.user, "autre", contributor=False)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def assert_reconciled(self):
+        expected = [get_project_stats(self.project.pk), get_project_stats(self.other_project.pk)]
+        call_command('reconcile_project_counters', stdout=StringIO())
+        self.assertEqual([get_project_stats(self.project.pk), get_project_stats(self.other_project.pk)], expected)
+
+    def test_counters_follow_writes(self):
+        issue = self.create_issue(self.project, self.user)
+        other = self.create_issue(self.project, self.user, status='INPR')
+        Comment.objects.create(description="c", issue=issue, author=self.user)
+        Comment.objects.create(description="c", issue=other, author=self.user)
+        stats = get_project_stats(self.project.pk)
+        self.assertEqual((stats['issues'], stats['comments']), (2, 2))
+        self.assertEqual(stats['status'], {'TODO': 1, 'INPR': 1, 'FINI': 0})
+
+        issue.priority = 'HIGH'
+        issue.project = self.other_project
+        issue.save()
+        other.delete()
+        stats = get_project_stats(self.project.pk)
+        self.assertEqual((stats['issues'], stats['comments'], stats['status']['INPR']), (0, 0, 0))
+        stats = get_project_stats(self.other_project.pk)
+        self.assertEqual((stats['issues'], stats['comments'], stats['priority']['HIGH']), (1, 1, 1))
+        self.assert_reconciled()
+
+    def test_delete_project_author(self):
+        # régression : l'utilisateur supprimé entraîne son projet, ses issues et ses commentaires
+        author = self.create_user('auteur')
+        project = self.create_project(author, "projet de l'auteur", contributor=False)
+        issue = self.create_issue(project, author)
+        Comment.objects.create(description="commentaire", issue=issue, author=author)
+        # issue et commentaire de l'auteur dans un projet qui reste
+        other_issue = self.create_issue(self.project, self.user)
+        Issue.objects.filter(pk=other_issue.pk).update(author=author)
+        self.create_issue(self.project, self.user)
+        Comment.objects.create(description="commentaire", issue=self.create_issue(self.project, self.user), author=author)
+        admin = self.create_user('admin-oscar', is_staff=True)
+        self.client.force_authenticate(admin)
+
+        self.assertEqual(self.client.delete(f'/api/users/{author.pk}/').status_code, 204)
+        connection.check_constraints()
+        self.assertFalse(Project.objects.filter(pk=project.pk).exists())
+        self.assertEqual(get_project_stats(self.project.pk)['issues'], 2)
+        self.assertEqual(get_project_stats(self.project.pk)['comments'], 0)
+        self.assert_reconciled()
+
+    def test_stats_endpoint_and_bulk(self):
+        payload = [{'title': f"issue {index}", 'description': "desc", 'project': self.project.pk,
+                    'priority': 'MED', 'tag': 'TASK'} for index in range(3)]
+        issues = self.client.post('/api/issues/', payload, format='json').data
+        self.client.post('/api/comments/', [{'issue': row['id'], 'description': "c"} for row in issues],
+                         format='json')
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/projects/{self.project.pk}/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['issues'], response.data['comments']), (3, 3))
+        self.assertEqual(response.data['tag'], {'BUG': 0, 'FEAT': 0, 'TASK': 3})
+        self.assert_reconciled()
+        self.assertEqual(self.client.get(f'/api/projects/{self.other_project.pk}/stats/').status_code, 404)
+
+
+class FullTextSearchTests(SdApiTestCase):
+    """
+    ?search= over issues and comments: index kept in sync, ranked, same visibility as the lists
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('paula')
+        cls.other = cls.create_user('quentin')
+        cls.project = cls.create_project(cls.user)
+        cls.hidden = cls.create_project(cls.other, "caché")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def search_titles(self, text):
+        response = self.client.get('/api/issues/', {'search': text})
+        return [row['title'] for row in response.data['results']]
+
+    def test_issue_search(self):
+        in_description = self.create_issue(self.project, self.user, "autre", description="problème de connexion")
+        self.create_issue(self.project, self.user, "Connexion impossible")
+        self.create_issue(self.hidden, self.user, "connexion cachée")
+        # le titre pèse plus que la description ; accents ignorés ; projet non visible exclu
+        self.assertEqual(self.search_titles("connexion"), ["Connexion impossible", "autre"])
+        self.assertEqual(self.search_titles('probleme "connexion'), ["autre"])
+
+        in_description.description = "rien"
+        in_description.save()
+        self.assertEqual(self.search_titles("connexion"), ["Connexion impossible"])
+        Issue.objects.filter(title="Connexion impossible").delete()
+        self.assertEqual(self.search_titles("connexion"), [])
+
+    def test_comment_search(self):
+        issue = self.create_issue(self.project, self.user)
+        comment = Comment.objects.create(description="erreur serveur", issue=issue, author=self.user)
+        Comment.objects.bulk_create([Comment(description="serveur lent", issue=issue, author=self.user)])
+        hidden_issue = self.create_issue(self.hidden, self.user)
+        Comment.objects.create(description="serveur caché", issue=hidden_issue, author=self.other)
+
+        response = self.client.get('/api/comments/', {'search': "serveur"})
+        self.assertEqual(response.data['count'], 2)
+        comment.delete()
+        response = self.client.get('/api/comments/', {'search': "erreur"})
+        self.assertEqual(response.data['count'], 0)
+
+
+class IssueFilterTests(SdApiTestCase):
+    """
+    Multi-value filters, created_time range and ordering on the issue list
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('romain')
+        cls.other = cls.create_user('sarah')
+        cls.project = cls.create_project(cls.user)
+        for index, (priority, status, assignee) in enumerate([('LOW', 'TODO', cls.user), ('HIGH', 'INPR', cls.other),
+                                                              ('MED', 'FINI', cls.other)]):
+            cls.create_issue(cls.project, cls.user, f"issue {index}", assignee=assignee, priority=priority,
+                             status=status)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, **params):
+        response = self.client.get('/api/issues/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.data['results']]
+
+    def test_filters_and_ordering(self):
+        self.assertEqual(self.titles(priority='HIGH,MED', ordering='title'), ["issue 1", "issue 2"])
+        self.assertEqual(self.titles(status='TODO,FINI', ordering='-title'), ["issue 2", "issue 0"])
+        self.assertEqual(self.titles(assignee=self.other.pk, priority='HIGH'), ["issue 1"])
+        self.assertEqual(len(self.titles(author=self.user.pk, created_time_after='2000-01-01T00:00:00')), 3)
+        self.assertEqual(self.titles(created_time_before='2000-01-01T00:00:00'), [])
+        self.assertEqual(self.client.get('/api/issues/', {'priority': 'URGENT'}).status_code, 400)
+
+
+class SparseFieldsetTests(SdApiTestCase):
+    """
+    ?fields= / ?omit= prune the rendered fields and the loaded columns
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('thomas')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user, description="longue description")
+        Comment.objects.create(description="commentaire", issue=cls.issue, author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_issue_board_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/issues/', {'fields': 'id,title,status'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'status'])
+        self.assertFalse(any('"description"' in query['sql'] for query in context.captured_queries))
+
+        response = self.client.get(f'/api/issues/{self.issue.pk}/', {'omit': 'description'})
+        self.assertNotIn('description', response.data)
+        self.assertIn('description', self.client.get(f'/api/issues/{self.issue.pk}/').data)
+        self.assertEqual(self.client.get('/api/issues/', {'fields': 'id,inconnu'}).status_code, 400)
+
+    def test_comment_without_project(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/comments/', {'omit': 'project,description'})
+        self.assertEqual(list(response.data['results'][0]),
+                         ['id', 'issue', 'author', 'created_time', 'updated_time'])
+        self.assertFalse(any('"sd_api_project"."description"' in query['sql']
+                             for query in context.captured_queries))
+        response = self.client.get('/api/comments/', {'fields': 'project'})
+        self.assertEqual(response.data['results'][0]['project']['description'], "desc")
+
+
+class FastListTests(SdApiTestCase):
+    """
+    The .values() list path renders the same bytes as the ModelSerializers
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('ursula')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user, assignee=None)
+        Comment.objects.create(description="commentaire", issue=cls.issue, author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_same_output_as_serializers(self):
+        renderer = JSONRenderer()
+        expected = {
+            '/api/projects/': ProjectSerializer(Project.objects.all(), many=True).data,
+            '/api/issues/': IssueSerializer(Issue.objects.all(), many=True).data,
+            '/api/comments/': CommentSerializer(Comment.objects.all(), many=True).data,
+        }
+        for url, data in expected.items():
+            response = self.client.get(url)
+            self.assertEqual(renderer.render(response.data['results']), renderer.render(data))
+        response = self.client.get('/api/issues/', {'pagination': 'cursor', 'limit': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ProjectExportTests(SdApiTestCase):
+    """
+    Streamed NDJSON / CSV export of the issues and comments of a project
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('ulrich')
+        cls.other = cls.create_user('ulla')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user)
+        cls.comment = Comment.objects.create(description="commentaire, avec virgule", issue=cls.issue,
+                                             author=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(f'/api/projects/{self.project.pk}/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        issue, comment = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(list(issue), ['type', *IssueSerializer.Meta.fields])
+        self.assertEqual(issue['type'], 'issue')
+        self.assertEqual(issue['title'], "issue")
+        self.assertEqual(issue['created_time'], IssueSerializer(self.issue).data['created_time'])
+        self.assertEqual(list(comment), ['type', *CommentSerializer.Meta.fields])
+        # id du projet seul, pas l'objet {id, name, description} de l'API
+        self.assertEqual((comment['type'], comment['issue'], comment['project']),
+                         ('comment', self.issue.pk, self.project.pk))
+
+    def test_csv(self):
+        response, body = self.export(output='csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'project-{self.project.pk}.csv', response['Content-Disposition'])
+        header, issue, comment = csv.reader(StringIO(body))
+        self.assertEqual(header, ['type', 'id', 'title', 'project', 'description', 'assignee', 'priority', 'tag',
+                                  'status', 'author', 'created_time', 'updated_time', 'issue'])
+        row = dict(zip(header, comment))
+        self.assertEqual((row['type'], row['description'], row['project'], row['title']),
+                         ('comment', "commentaire, avec virgule", str(self.project.pk), ''))
+        self.assertEqual(dict(zip(header, issue))['issue'], '')
+
+    def test_unknown_output(self):
+        response = self.client.get(f'/api/projects/{self.project.pk}/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_contributor(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}/export/').status_code, 404)
+
+
+class RenderingAndCompressionTests(SdApiTestCase):
+    """
+    orjson renderer / parser output and negotiated compression of large responses
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('victor')
+        cls.project = cls.create_project(cls.user)
+        cls.issue = cls.create_issue(cls.project, cls.user, description="desc " * 50)
+        Comment.objects.bulk_create([Comment(description="é" * 100, issue=cls.issue, author=cls.user)
+                                     for _ in range(20)])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    @skipIf(orjson is None, "orjson non installé")
+    def test_orjson_same_output(self):
+        comment = Comment.objects.first()
+        data = {'comments': CommentSerializer(Comment.objects.all(), many=True).data,
+                'raw': [comment.pk, comment.created_time.astimezone(dt_timezone.utc), Decimal('1.5')]}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONParser().parse(BytesIO('{"a": ["é", 1]}'.encode())), {'a': ["é", 1]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+    def test_compression(self):
+        plain = self.client.get('/api/comments/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/comments/', HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response['ETag'].startswith('W/'))
+        # If-None-Match avec l'ETag faible : comparaison faible
+        response = self.client.get('/api/comments/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(f'/api/projects/{self.project.pk}/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 21)
+        small = self.client.get(f'/api/projects/{self.project.pk}/stats/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', small)
+
+
+class InstrumentationTests(SdApiTestCase):
+    """
+    Per-endpoint histograms recorded by the middleware and exported as Prometheus text
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('wendy')
+        cls.admin = cls.create_user('xavier', is_staff=True)
+        cls.project = cls.create_project(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+        # cache vidé : pas de remise à zéro à détecter
+        metrics.registry.generation = None
+
+    def test_histograms_by_action(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/projects/')
+        self.client.get(f'/api/projects/{self.project.pk}/stats/')
+        histograms = metrics.collect()
+        queries = histograms['db_queries']['ProjectViewSet.list']
+        self.assertEqual(queries[-1], 1)
+        self.assertGreater(queries[-2], 0)
+        self.assertEqual(histograms['request_latency_seconds']['ProjectViewSet.stats'][-1], 1)
+        self.assertGreater(histograms['serializer_time_seconds']['ProjectViewSet.list'][-2], 0)
+
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        text = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('sd_api_db_queries_bucket{endpoint="ProjectViewSet.list",le="+Inf"} 1', text)
+        self.assertIn('sd_api_request_latency_seconds_count{endpoint="ProjectViewSet.stats"} 1', text)
+
+    def test_slow_request_profile(self):
+        self.client.force_authenticate(self.user)
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.multiple(metrics, PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_THRESHOLD=0, PROFILE_DIR=directory):
+            self.client.get('/api/projects/')
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_reset(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/projects/')
+        metrics.flush()
+        call_command('dump_metrics', '--reset', stdout=StringIO())
+        self.assertEqual(metrics.collect()['request_latency_seconds'], {})
+
+    def test_serializer_time_without_patch(self):
+        self.client.force_authenticate(self.user)
+        self.client.get(f'/api/projects/{self.project.pk}/')
+        self.assertGreater(metrics.collect()['serializer_time_seconds']['ProjectViewSet.retrieve'][-2], 0)
+        # classes de DRF non modifiées
+        for serializer_class in (Serializer, ListSerializer):
+            self.assertEqual(serializer_class.__dict__['data'].fget.__module__, 'rest_framework.serializers')
+
+    def test_process_slots(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/projects/')
+        metrics.flush()
+        # autre worker : son propre slot, libéré par expiration quand il ne publie plus
+        other = metrics._slot_key(metrics.registry.slot + 1)
+        cache.add(other, ('autre:1', metrics.registry.snapshot()), metrics.PROCESS_TTL)
+        self.assertEqual(metrics.collect()['db_queries']['ProjectViewSet.list'][-1], 2)
+        cache.delete(other)
+        self.assertEqual(metrics.collect()['db_queries']['ProjectViewSet.list'][-1], 1)
+        # slot repris par un autre worker après une remise à zéro : un slot libre est pris
+        slot = metrics.registry.slot
+        metrics.reset()
+        cache.add(metrics._slot_key(slot), ('autre:1', {}), metrics.PROCESS_TTL)
+        metrics.flush()
+        self.assertNotEqual(metrics.registry.slot, slot)
+
+
+class BenchmarkScenarioTests(SdApiTestCase):
+    """
+    The endpoint benchmark covers every route of sd_api/urls.py and its scenarios succeed on a generated dataset
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.sizes = generate_dataset(users=5, projects=3, issues_per_project=4, comments_per_issue=2, seed=1)
+
+    def test_dataset(self):
+        project = Project.objects.annotate(nb_issues=Count('issues')).filter(author__username='bench-user-0').first()
+        self.assertEqual(get_project_stats(project.pk)['issues'], project.nb_issues)
+        self.assertEqual(self.sizes['issues'], Issue.objects.count())
+
+    def test_isolated_cache(self):
+        cache.set('sd_api:bench:test', 1)
+        with isolated_cache():
+            self.assertIsNone(cache.get('sd_api:bench:test'))
+            cache.clear()
+        self.assertEqual(cache.get('sd_api:bench:test'), 1)
+
+    def test_every_route_succeeds(self):
+        ctx = BenchContext()
+        covered = set()
+        with mock.patch.object(CombinedRateThrottle, 'THROTTLE_RATES', {}):
+            for index, (name, method, auth, build) in enumerate(SCENARIOS):
+                path, data = build(ctx, index)
+                covered.add(resolve(path.split('?')[0]).url_name)
+                headers = {'Authorization': f'Bearer {ctx.tokens[auth]}'} if auth else {}
+                response = getattr(self.client, method)(path, data, format='json', headers=headers)
+                self.assertLess(response.status_code, 400, name)
+
+        names = {pattern.name for pattern in [*urls.urlpatterns, *urls.router.urls, *rest_framework_urls.urlpatterns]
+                 if getattr(pattern, 'name', None)}
+        self.assertEqual(names - covered, {'contributors-list', 'contributors-detail'})
+
+
+@override_settings(SD_API_SHARED_CACHE=True)
+class ReplicaRoutingTests(FixturesMixin, APITransactionTestCase):
+    """
+    list / retrieve read from the replica, except just after a write of the same user (read-your-writes)
+    """
+    # hors transaction de test : le routeur garde sur le primaire les lectures d'un bloc atomique
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('yvonne')
+        project = self.create_project(self.user)
+        self.issue = self.create_issue(project, self.user)
+        self.client.force_authenticate(self.user)
+
+    def read_aliases(self, method, url, data=None):
+        aliases = []
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return None
+
+        # réplica simulé par la base de test du primaire : seul l'alias choisi par le routeur est vérifié
+        with mock.patch.object(database, 'replica_configured', return_value=True), \
+                mock.patch.object(database, 'REPLICA_ALIAS', 'replica'), \
+                mock.patch.object(PrimaryReplicaRouter, 'db_for_read', spy):
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, aliases
+
+    def test_reads_on_replica(self):
+        response, aliases = self.read_aliases('get', f'/api/comments/?issue={self.issue.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('replica', aliases)
+
+    def test_read_your_writes(self):
+        response, aliases = self.read_aliases('post', '/api/comments/', {'issue': self.issue.pk, 'description': "c"})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('replica', aliases)
+        _, aliases = self.read_aliases('get', f'/api/comments/?issue={self.issue.pk}')
+        self.assertTrue(aliases)
+        self.assertNotIn('replica', aliases)
+
+    @override_settings(SD_API_SHARED_CACHE=False)
+    def test_primary_without_shared_cache(self):
+        response, aliases = self.read_aliases('get', f'/api/comments/?issue={self.issue.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(aliases)
+        self.assertNotIn('replica', aliases)
+
+
+class BatchedDeletionTests(SdApiTestCase):
+    """
+    Batched / deferred deletions leave counters, caches and search index as the collector would
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('zoe')
+        cls.admin = cls.create_user('admin-zoe', is_staff=True)
+
+    def setUp(self):
+        super().setUp()
+        self.project = self.create_project(self.user)
+        self.issues = [self.create_issue(self.project, self.user, f"issue {index}") for index in range(3)]
+        for issue in self.issues:
+            for _ in range(5):
+                Comment.objects.create(description="commentaire", issue=issue, author=self.user)
+
+    def test_bulk_delete_issue(self):
+        bulk_delete_issue(self.issues[0], batch_size=2)
+        self.assertFalse(Comment.objects.filter(issue_id=self.issues[0].pk).exists())
+        stats = get_project_stats(self.project.pk)
+        self.assertEqual((stats['issues'], stats['comments']), (2, 10))
+        call_command('reconcile_project_counters', stdout=StringIO())
+        self.assertEqual(get_project_stats(self.project.pk), stats)
+
+    def test_bulk_delete_project(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(self.client.get('/api/projects/').data['results']), 1)
+        bulk_delete_project(self.project, batch_size=2)
+        self.assertFalse(Comment.objects.exists() or Issue.objects.exists() or Contributor.objects.exists())
+        self.assertEqual(self.client.get('/api/projects/').data['results'], [])
+        if fts_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {COMMENT_SEARCH_TABLE}")
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_deferred_delete(self):
+        self.client.force_authenticate(self.admin)
+        issue_url = f'/api/issues/{self.issues[0].pk}/'
+        self.assertEqual(self.client.get(issue_url).status_code, 200)
+        self.client.force_authenticate(self.user)
+        with mock.patch('sd_api.deletion.DELETE_MODE', 'deferred'):
+            self.assertEqual(self.client.delete(f'/api/projects/{self.project.pk}/').status_code, 204)
+        # masqué aussitôt : membres et admins ne le voient plus
+        self.assertEqual(self.client.get('/api/projects/').data['results'], [])
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(issue_url).status_code, 404)
+        self.assertEqual(self.client.get('/api/comments/').data['results'], [])
+        self.assertEqual(Comment.objects.count(), 15)
+
+        call_command('purge_hidden_projects', stdout=StringIO())
+        self.assertFalse(Project.objects.exists() or Comment.objects.exists())
+
+    def test_large_project_deferred_by_default(self):
+        self.client.force_authenticate(self.user)
+        # 3 issues + 15 commentaires
+        with mock.patch('sd_api.deletion.DEFER_DELETE_ABOVE', 17):
+            self.assertEqual(self.client.delete(f'/api/projects/{self.project.pk}/').status_code, 204)
+        self.assertTrue(Project.objects.filter(pk=self.project.pk, is_hidden=True).exists())
+        self.assertEqual(Task.objects.get().name, 'sd_api.deletion.purge_project')
+        call_command('run_tasks', '--processes', '1', '--once', stdout=StringIO())
+        self.assertFalse(Project.objects.exists() or Comment.objects.exists())
+
+    def test_small_project_deleted_inline(self):
+        self.client.force_authenticate(self.user)
+        with mock.patch('sd_api.deletion.DEFER_DELETE_ABOVE', 18):
+            self.assertEqual(self.client.delete(f'/api/projects/{self.project.pk}/').status_code, 204)
+        self.assertFalse(Project.objects.exists() or Task.objects.exists())
+
+    def test_hidden_project_read_only(self):
+        hide_project(self.project)
+        self.client.force_authenticate(self.user)
+        url = f'/api/projects/{self.project.pk}/contributors/'
+        # contributeurs retirés avec le masquage : l'utilisateur ne peut pas se réinscrire
+        self.assertEqual(self.client.post(url, {'user_id': self.user.pk}, format='json').status_code, 404)
+        self.assertEqual(self.client.post(url, [{'user_id': self.admin.pk}], format='json').status_code, 404)
+        issue = {'title': "issue", 'description': "desc", 'project': self.project.pk, 'priority': 'LOW', 'tag': 'BUG'}
+        self.assertEqual(self.client.post('/api/issues/', issue).status_code, 404)
+        self.assertEqual(self.client.post('/api/issues/', [issue], format='json').status_code, 400)
+        comment = {'issue': self.issues[0].pk, 'description': "commentaire"}
+        self.assertEqual(self.client.post('/api/comments/', comment).status_code, 404)
+        self.assertEqual(self.client.post('/api/comments/', [comment], format='json').status_code, 400)
+        self.assertFalse(Contributor.objects.exists())
+        self.assertEqual((Issue.objects.count(), Comment.objects.count()), (3, 15))
+
+
+@task(max_attempts=2, retry_delay=0)
+def failing_task(message):
+    raise RuntimeError(message)
+
+
+@task(max_attempts=1)
+def long_batches_task(batches):
+    # chaque lot dure plus que STALE_AFTER (horloge simulée)
+    for _ in range(batches):
+        long_batches_task.now += timedelta(seconds=STALE_AFTER + 1)
+        heartbeat()
+        long_batches_task.reclaimed.append(claim_task('autre:2'))
+
+
+class TaskQueueTests(SdApiTestCase):
+    """
+    Side effects deferred to the task table run in the worker, with retries and status tracking
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('paul')
+
+    def test_blacklist_not_deferred(self):
+        # révocation : écrite en base dans la requête, sans worker
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.assertEqual(self.client.post('/api/token/blacklist/', {'refresh': str(refresh)}).status_code, 205)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=refresh['jti']).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+
+    def test_retries_then_failure(self):
+        failing_task.delay(message="boom")
+        self.assertEqual(run_pending(), 2)
+        task_row = Task.objects.get()
+        self.assertEqual((task_row.status, task_row.attempts), (TaskStatus.FAILED.value, 2))
+        self.assertIn("boom", task_row.last_error)
+
+    def test_stale_task_reclaimed(self):
+        task_row = failing_task.delay(message="boom")
+        Task.objects.filter(pk=task_row.pk).update(status=TaskStatus.RUNNING.value, locked_by='mort:1',
+                                                   locked_at=timezone.now() - timedelta(hours=1))
+        self.assertIsNotNone(claim_task('vivant:2'))
+        self.assertIsNone(claim_task('vivant:3'))
+
+    def test_long_task_not_reclaimed(self):
+        long_batches_task.delay(batches=3)
+        long_batches_task.now, long_batches_task.reclaimed = timezone.now(), []
+        with mock.patch('sd_api.tasks.timezone.now', lambda: long_batches_task.now):
+            self.assertEqual(run_pending('vivant:1'), 1)
+        self.assertEqual(long_batches_task.reclaimed, [None] * 3)
+        self.assertEqual(Task.objects.get().status, TaskStatus.DONE.value)
+
+    def test_deferred_project_purge(self):
+        project = self.create_project(self.user)
+        self.client.force_authenticate(self.user)
+        with mock.patch('sd_api.deletion.DELETE_MODE', 'deferred'):
+            self.assertEqual(self.client.delete(f'/api/projects/{project.pk}/').status_code, 204)
+        self.assertTrue(Project.objects.filter(pk=project.pk, is_hidden=True).exists())
+        call_command('run_tasks', '--processes', '1', '--once', stdout=StringIO())
+        self.assertFalse(Project.objects.filter(pk=project.pk).exists())
+
+
+class PasswordHashingTests(SdApiTestCase):
+    """
+    Hashing in the bounded pool, with transparent rehash on login when the hasher policy changes
+    """
+    def login(self, password='pwd'):
+        return self.client.post('/api/token/', {'username': 'paul', 'password': password})
+
+    def test_unknown_policy(self):
+        with mock.patch.dict(os.environ, {'SD_API_PASSWORD_HASHER': 'md5'}), \
+                self.assertRaisesMessage(ImproperlyConfigured, "scrypt, argon2, pbkdf2"):
+            runpy.run_path(settings_module.__file__)
+
+    def test_rehash_to_preferred_hasher_on_login(self):
+        user = CustomUser.objects.create_user(username='paul', age=30)
+        with mock.patch.object(TunedPBKDF2PasswordHasher, 'iterations', 1000):
+            user.password = make_password('pwd', hasher='pbkdf2_sha256')
+            user.save()
+            self.assertEqual(self.login('wrong').status_code, 401)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_rehash_when_parameters_change(self):
+        with mock.patch.object(TunedScryptPasswordHasher, 'work_factor', 2 ** 12):
+            user = self.create_user('paul')
+        self.assertIn('$4096$', user.password)
+        self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertIn(f'${TunedScryptPasswordHasher.work_factor}$', user.password)
+
+    def test_hashing_runs_in_pool(self):
+        threads = []
+
+        def spy(raw_password, encoded):
+            threads.append(threading.current_thread().name)
+            return verify_and_rehash(raw_password, encoded)
+
+        user = self.create_user('paul')
+        with mock.patch('sd_api.models.verify_and_rehash', spy):
+            self.assertEqual(self.login().status_code, 200)
+            self.assertTrue(async_to_sync(user.acheck_password)('pwd'))
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('sd_api-hash') for name in threads))
+
+
+class ChangeLogTests(SdApiTestCase):
+    """
+    Deltas of a project from a cursor, by polling or server-sent events, with retention and compaction
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user('lea')
+        cls.other = cls.create_user('paul')
+        cls.project = cls.create_project(cls.user)
+        cls.token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        return self.client.get(f'/api/projects/{self.project.pk}/changes/', params)
+
+    def test_deltas_since_cursor(self):
+        cursor = self.changes().json()['cursor']
+        issue_id = self.client.post('/api/issues/', {'title': "issue", 'description': "desc", 'project': self.project.pk,
+                                                     'priority': 'LOW', 'tag': 'BUG'}).json()['id']
+        comment_id = self.client.post('/api/comments/', {'issue': issue_id, 'description': "com"}).json()['id']
+        self.client.put(f'/api/issues/{issue_id}/', {'title': "modifiée", 'description': "desc",
+                                                     'project': self.project.pk, 'priority': 'LOW', 'tag': 'BUG'})
+        self.client.delete(f'/api/comments/{comment_id}/')
+
+        body = self.changes(cursor).json()
+        self.assertEqual([(change['object_type'], change['action']) for change in body['results']],
+                         [('issue', 'create'), ('comment', 'create'), ('issue', 'update'), ('comment', 'delete')])
+        self.assertEqual(body['results'][2]['data']['title'], "modifiée")
+        self.assertIsNone(body['results'][3]['data'])
+        self.assertEqual(self.changes(body['cursor']).json()['results'], [])
+
+        page = self.changes(cursor, limit=3).json()
+        self.assertTrue(page['has_more'])
+        self.assertEqual(len(self.changes(page['cursor']).json()['results']), 1)
+
+    def test_bulk_create_logged(self):
+        cursor = self.changes().json()['cursor']
+        payload = [{'title': f"issue {index}", 'description': "desc", 'project': self.project.pk,
+                    'priority': 'LOW', 'tag': 'BUG'} for index in range(2)]
+        self.assertEqual(self.client.post('/api/issues/', payload, format='json').status_code, 201)
+        self.assertEqual(len(self.changes(cursor).json()['results']), 2)
+
+    def test_access_and_invalid_cursor(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.other).access_token}")
+        self.assertEqual(self.changes(0).status_code, 404)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(self.changes('abc').status_code, 400)
+
+    def test_retention_and_compaction(self):
+        issue = self.create_issue(self.project, self.user)
+        issue.title = "v2"
+        issue.save()
+        issue.title = "v3"
+        issue.save()
+        self.assertEqual(compact_changes(older_than=timezone.now() + timedelta(seconds=1)), 2)
+        body = self.changes(0).json()
+        issue_changes = [change for change in body['results'] if change['object_type'] == 'issue']
+        self.assertEqual([change['data']['title'] for change in issue_changes], ["v3"])
+
+        cursor = body['cursor']
+        call_command('compact_changes', '--keep-days', '0', stdout=StringIO())
+        self.assertEqual(self.changes(0).status_code, 410)
+        # curseur à jour : rien de manqué
+        self.assertEqual(self.changes(cursor).json()['results'], [])
+        self.assertEqual(self.changes().json()['cursor'], cursor)
+
+    async def test_event_stream(self):
+        headers = {'Authorization': f'Bearer {self.token}'}
+        issue = await Issue.objects.acreate(title="issue", description="desc", project=self.project,
+                                            author=self.user, assignee=self.user, priority='LOW', tag='BUG')
+        response = await self.async_client.get(f'/api/async/projects/{self.project.pk}/changes/?since=0&timeout=0',
+                                               headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: change', events)
+        last_id = max(int(line[4:]) for line in events.splitlines() if line.startswith('id: '))
+        self.assertIn(f'"object_id":"{issue.pk}"', events.replace(' ', ''))
+
+        response = await self.async_client.get(f'/api/async/projects/{self.project.pk}/changes/?timeout=0',
+                                               headers={**headers, 'Last-Event-ID': str(last_id)})
+        events = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertNotIn('event: change', events)
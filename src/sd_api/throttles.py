@@ -1,4 +1,8 @@
-from rest_framework.throttling import SimpleRateThrottle
+import time
+
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
 
 
 class CustomThrottle(SimpleRateThrottle):
@@ -12,3 +16,84 @@ class CustomThrottle(SimpleRateThrottle):
         # user = request.user
         # if user.is_authenticated:
         #     return f"user_{user.id}"
+
+
+class CombinedRateThrottle(BaseThrottle):
+    """
+    Single throttle replacing CustomThrottle + UserRateThrottle + AnonRateThrottle.
+    Keyed on the user id (IP for anonymous users), one counter per rate and window (O(1) state),
+    sliding window approximated with the previous window's counter. Only allowed requests are counted.
+    Counters use cache.incr : atomic between workers with a shared backend (Redis, Memcached).
+    """
+    cache_alias = 'default'
+    cache_format = 'throttle_%(scope)s_%(ident)s_%(duration)s_%(window)s'
+    timer = time.time
+    THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+    # scopes de DEFAULT_THROTTLE_RATES appliqués selon le type d'utilisateur
+    user_scopes = ['burst', 'user']
+    anon_scopes = ['burst', 'anon']
+
+    def __init__(self):
+        self.cache = caches[self.cache_alias]
+        self.user_rates = self.get_rates(self.user_scopes)
+        self.anon_rates = self.get_rates(self.anon_scopes)
+
+    def get_rates(self, scopes):
+        rates = []
+        for scope in scopes:
+            rate = self.THROTTLE_RATES.get(scope)
+            if rate is not None:
+                rates.append(self.parse_rate(rate))
+        return rates
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+    def get_ident_key(self, request):
+        user = request.user
+        if user and user.is_authenticated:
+            return 'user', str(user.pk)
+        return 'anon', self.get_ident(request)
+
+    def incr(self, key, timeout):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # première requête de la fenêtre (ou clé expirée entre-temps)
+            if self.cache.add(key, 1, timeout):
+                return 1
+            return self.cache.incr(key)
+
+    def allow_request(self, request, view):
+        scope, ident = self.get_ident_key(request)
+        rates = self.user_rates if scope == 'user' else self.anon_rates
+        now = self.timer()
+        self.wait_time = None
+
+        keys = []
+        for num_requests, duration in rates:
+            window = int(now // duration)
+            key = self.cache_format % {'scope': scope, 'ident': ident, 'duration': duration, 'window': window}
+            previous_key = self.cache_format % {'scope': scope, 'ident': ident, 'duration': duration,
+                                                'window': window - 1}
+            keys.append((num_requests, duration, key, previous_key))
+        counts = self.cache.get_many([name for *_, key, previous_key in keys for name in (key, previous_key)])
+
+        # toutes les fenêtres vérifiées avant de compter : une requête refusée n'est comptée dans aucune
+        # (sinon un client limité par le burst épuiserait aussi son quota journalier)
+        for num_requests, duration, key, previous_key in keys:
+            elapsed = (now % duration) / duration
+            # poids de la fenêtre précédente proportionnel à la part encore couverte par la fenêtre glissante
+            estimated = counts.get(previous_key, 0) * (1 - elapsed) + counts.get(key, 0) + 1
+            if estimated > num_requests:
+                self.wait_time = max(self.wait_time or 0, duration * (1 - elapsed))
+        if self.wait_time is not None:
+            return False
+
+        for num_requests, duration, key, previous_key in keys:
+            self.incr(key, duration * 2)
+        return True
+
+    def wait(self):
+        return self.wait_time
@@ -2,9 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (CustomUserViewSet, ProjectViewSet,
                     ContributorViewSet, IssueViewSet,
-                    CommentViewSet, TokenBlacklistViewSet
+                    CommentViewSet, TokenBlacklistViewSet, MetricsView
                     )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .async_views import AsyncListView, AsyncRetrieveView, ChangeStreamView
 
 
 router = DefaultRouter()
@@ -20,6 +21,8 @@ urlpatterns = [
      path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
      path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
      path('api/token/blacklist/', TokenBlacklistViewSet.as_view({'post': 'token_blacklist'}), name='token_blacklist'),
+     # histogrammes par endpoint (admins), format Prometheus
+     path('api/metrics/', MetricsView.as_view(), name='metrics'),
      path('api/', include(router.urls)),
      # spécifique contributors
      path('api/projects/<int:project_id>/contributors/',
@@ -31,4 +34,17 @@ urlpatterns = [
      path('api/users/<int:user_id>/projects/',
           ContributorViewSet.as_view({'get': 'user_projects'}),
           name='user-projects'),
+     # lecture seule en async (ASGI), mêmes règles d'accès que les viewsets
+     path('api/async/projects/', AsyncListView.as_view(viewset_class=ProjectViewSet), name='async-projects-list'),
+     path('api/async/projects/<int:pk>/', AsyncRetrieveView.as_view(viewset_class=ProjectViewSet),
+          name='async-projects-detail'),
+     # journal des changements d'un projet en server-sent events
+     path('api/async/projects/<int:pk>/changes/', ChangeStreamView.as_view(),
+          name='async-projects-changes'),
+     path('api/async/issues/', AsyncListView.as_view(viewset_class=IssueViewSet), name='async-issue-list'),
+     path('api/async/issues/<int:pk>/', AsyncRetrieveView.as_view(viewset_class=IssueViewSet),
+          name='async-issue-detail'),
+     path('api/async/comments/', AsyncListView.as_view(viewset_class=CommentViewSet), name='async-comment-list'),
+     path('api/async/comments/<str:pk>/', AsyncRetrieveView.as_view(viewset_class=CommentViewSet),
+          name='async-comment-detail'),
 ]
@@ -1,7 +1,13 @@
+import uuid
+
 from rest_framework.response import Response
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework_simplejwt.tokens import RefreshToken  # pour gérer la blacklist
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import CustomUser, Project, Contributor, Issue, Comment
@@ -15,16 +21,29 @@ from .serializers import (CustomUserSerializer,
                           TokenBlacklistSerializer,
                           )
 from .filters import IssueFilter, CommentFilter
-from .throttles import CustomThrottle
-from .mixins import ValidationMixin, ContributorMixin
+from .throttles import CombinedRateThrottle
+from .exceptions import CustomBadRequest
+from .pagination import OptInKeysetPagination
+from .mixins import (ValidationMixin, ContributorMixin, BulkCreateMixin,
+                     ConditionalGetMixin, ResponseCacheMixin, SparseFieldsMixin, FastListMixin, ReplicaReadMixin)
+from .membership import invalidate_membership, get_member_project_ids
+from .caching import get_version, get_versions, bump_version, response_cache_key, shared_cache
+from .exports import project_export_response
+from .deletion import delete_project, delete_issue
+from .counters import get_project_stats, apply_counter_deltas, issue_deltas, comment_deltas
+from .changes import (changes_since, check_cursor, current_cursor, parse_cursor, parse_limit, record_changes,
+                      serialize_change)
+from .enums import ChangeAction
+from .authentication import ClaimsRefreshToken  # pour gérer la blacklist
+from . import metrics
 from .permissions import IsMeOrAdmin, IsContributor, IsProjectOwner
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(viewsets.ModelViewSet, ConditionalGetMixin):
     serializer_class = CustomUserSerializer
     detail_serializer_class = CustomUserDetailSerializer
     update_serializer_class = CustomUserUpdateSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
     http_method_names = ['get', 'post', 'put', 'delete']  # on n'authorise pas le PATCH
 
     def get_permissions(self):
@@ -43,6 +62,21 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         # pour les utilisateurs affiche leurs infos uniquement
         return CustomUser.objects.filter(pk=user.pk)
 
+    # lectures sur le primaire : l'ETag (version) ne dépend pas des données lues, un réplica en retard
+    # associerait un contenu périmé à la nouvelle version
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(self.users_etag(request), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(self.users_etag(request), super().retrieve, request, *args, **kwargs)
+
+    def users_etag(self, request):
+        # version globale des utilisateurs, incrémentée à chaque enregistrement / suppression
+        # (sans cache partagé, la version de ce worker peut être en retard : pas d'ETag)
+        if not shared_cache():
+            return None
+        return self.make_etag(request, request.user.pk, get_version('users', 'all'))
+
     def get_serializer_class(self):
         if self.action in ['retrieve']:
             return self.detail_serializer_class
@@ -59,22 +93,25 @@ class CustomUserViewSet(viewsets.ModelViewSet):
 
 class TokenBlacklistViewSet(viewsets.ModelViewSet, ValidationMixin):
     serializer_class = TokenBlacklistSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
     http_method_names = ['post']
 
     def token_blacklist(self, request):
         try:
             refresh_token = request.data.get("refresh")
-            token = RefreshToken(refresh_token)
+            # validation (signature, expiration, déjà blacklisté) dans la requête
+            token = ClaimsRefreshToken(refresh_token)
+            # écriture en base dans la requête (révocation : pas de file d'attente), cache mis à jour par signal
             token.blacklist()
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response({"erreur": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ProjectViewSet(viewsets.ModelViewSet, ValidationMixin):
+class ProjectViewSet(viewsets.ModelViewSet, ValidationMixin, ResponseCacheMixin, SparseFieldsMixin,
+                     FastListMixin, ReplicaReadMixin):
     serializer_class = ProjectSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
     http_method_names = ['get', 'post', 'put', 'delete']  # on n'authorise pas le PATCH
 
     def get_permissions(self):
@@ -86,7 +123,23 @@ class ProjectViewSet(viewsets.ModelViewSet, ValidationMixin):
 
     def get_queryset(self):
         user = self.request.user
-        return Project.objects.filter(contributors__user=user)
+        return self.sparse_queryset(Project.objects.filter(contributors__user=user))
+
+    def list(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            # clé : versions des projets de l'utilisateur (la liste ne dépend que d'eux)
+            project_ids = sorted(get_member_project_ids(request))
+            versions = get_versions('project', project_ids)
+            key = response_cache_key('projects', request.build_absolute_uri(), sorted(versions.items()))
+            return self.cached_response(key, self.fast_list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            key = None
+            pk = self.kwargs.get('pk', '')
+            if pk.isdigit() and int(pk) in get_member_project_ids(request):
+                key = response_cache_key('project', pk, get_version('project', int(pk)), self.sparse_cache_key())
+            return self.cached_response(key, super().retrieve, request, *args, **kwargs)
 
     def perform_create(self, serializer):
         project = serializer.save(author=self.request.user)
@@ -96,17 +149,51 @@ class ProjectViewSet(viewsets.ModelViewSet, ValidationMixin):
         serializer.save()
 
     def perform_destroy(self, instance):
-        instance.delete()
-
-
-class ContributorViewSet(viewsets.ViewSet, ValidationMixin, ContributorMixin):
+        # issues / commentaires supprimés par lots sans être chargés, ou projet masqué puis purgé (SD_API_DELETE_MODE)
+        delete_project(instance)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        # ?output=ndjson (par défaut) ou csv ; "format" est réservé par DRF
+        project = self.get_object()
+        return project_export_response(project, request.query_params.get('output', 'ndjson'))
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        # lecture des compteurs dénormalisés (pas d'agrégat sur les issues / commentaires)
+        project = self.get_object()
+        return Response(get_project_stats(project.pk))
+
+    @action(detail=True, methods=['get'])
+    def changes(self, request, pk=None):
+        # deltas depuis ?since=<curseur> ; sans curseur : curseur courant (à lire avant de charger les collections)
+        # lu sur le primaire : un réplica en retard ferait avancer le curseur au-delà d'entrées manquantes
+        project = self.get_object()
+        since = parse_cursor(request.query_params.get('since'))
+        if since is None:
+            return Response({'cursor': current_cursor(project), 'has_more': False, 'results': []})
+        check_cursor(since, project.changes_horizon)
+        limit = parse_limit(request.query_params.get('limit'))
+        changes = list(changes_since(project.pk, since)[:limit + 1])
+        results = [serialize_change(change) for change in changes[:limit]]
+        return Response({
+            'cursor': results[-1]['id'] if results else since,
+            'has_more': len(changes) > limit,
+            'results': results,
+        })
+
+
+class ContributorViewSet(viewsets.ViewSet, ValidationMixin, ContributorMixin, BulkCreateMixin,
+                         ConditionalGetMixin):
     permission_classes = [IsAuthenticated]
     serializer_class = ContributorSerializer
     project_serializer_class = ProjectSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
     http_method_names = ['get', 'post', 'put', 'delete']  # on n'authorise pas le PATCH
 
     def create(self, request, project_id=None):
+        if isinstance(request.data, list):
+            return self.bulk_create(request, project_id)
         # récupération de l'user_id via le body
         user_id = request.data.get('user_id')
 
@@ -116,10 +203,45 @@ class ContributorViewSet(viewsets.ViewSet, ValidationMixin, ContributorMixin):
         project = Project.objects.get(pk=project_id)
         user = CustomUser.objects.get(pk=user_id)
 
-        contributor = Contributor.objects.create(user=user, project=project)
+        try:
+            with transaction.atomic():
+                contributor = Contributor.objects.create(user=user, project=project)
+        except IntegrityError:
+            # contrainte d'unicité (user, project)
+            raise CustomBadRequest("L'utilisateur est déjà contributeur du projet")
         serializer = self.serializer_class(contributor)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def bulk_create(self, request, project_id=None):
+        # body : [{"user_id": 1}, {"user_id": 2}, ...]
+        self.validate_project_id(project_id)
+        validated, errors = self.validate_bulk_items(
+            request.data, {'user_id': (CustomUser.objects.all(), True)})
+
+        user_ids = [data['user_id'].pk for data in validated if data]
+        existing = set(Contributor.objects.filter(project_id=project_id, user_id__in=user_ids)
+                       .values_list('user_id', flat=True))
+        seen = set()
+        for index, data in enumerate(validated):
+            if not data:
+                continue
+            user_id = data['user_id'].pk
+            if user_id in existing or user_id in seen:
+                errors[index] = {'user_id': ["L'utilisateur est déjà contributeur du projet"]}
+            seen.add(user_id)
+        self.raise_bulk_errors(errors)
+
+        with transaction.atomic():
+            contributors = Contributor.objects.bulk_create(
+                [Contributor(user=data['user_id'], project_id=project_id) for data in validated])
+            record_changes(contributors, ChangeAction.CREATE)
+        # bulk_create n'émet pas post_save : invalidation explicite du cache d'appartenance et des réponses
+        for user_id in seen:
+            invalidate_membership(user_id)
+        bump_version('project', project_id)
+        serializer = self.serializer_class(contributors, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def destroy(self, request, project_id=None, user_id=None):
         self.validate_project_id(project_id)
         self.validate_user_id(user_id)
@@ -129,24 +251,37 @@ class ContributorViewSet(viewsets.ViewSet, ValidationMixin, ContributorMixin):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def list_contributors(self, request, project_id=None):
+        # projet vérifié avant de lire (créer) sa version : pas de clé pour un id inconnu ou masqué
         self.validate_project_id(project_id)
+        # la version du projet change à chaque ajout / retrait de contributeur (cache partagé uniquement)
+        etag = self.make_etag(request, get_version('project', project_id)) if shared_cache() else None
+        if self.etag_matches(request, etag):
+            return self.not_modified(etag)
+
         project = Project.objects.get(pk=project_id)
 
         contributors = Contributor.objects.filter(project=project)
         serializer = self.serializer_class(contributors, many=True)
-        return Response(serializer.data)
+        return self.validated_response(request, Response(serializer.data), etag)
 
     def user_projects(self, request, user_id=None):
+        projects = Project.objects.filter(contributors__user_id=user_id)
+        etag = self.make_etag(request, *self.timestamp_etag_parts(projects, 'updated_time'))
+        if self.etag_matches(request, etag):
+            return self.not_modified(etag)
+
         self.validate_user_id(user_id)
         user = CustomUser.objects.get(pk=user_id)
         projects = Project.objects.filter(contributors__user=user)
         serializer = self.project_serializer_class(projects, many=True)
-        return Response(serializer.data)
+        return self.validated_response(request, Response(serializer.data), etag)
 
 
-class IssueViewSet(viewsets.ModelViewSet, ValidationMixin):
+class IssueViewSet(viewsets.ModelViewSet, ValidationMixin, BulkCreateMixin, ResponseCacheMixin,
+                   SparseFieldsMixin, FastListMixin, ReplicaReadMixin):
     serializer_class = IssueSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
+    pagination_class = OptInKeysetPagination
     filter_backends = [DjangoFilterBackend]
     http_method_names = ['get', 'post', 'put', 'delete']  # on n'authorise pas le PATCH
     filterset_class = IssueFilter
@@ -161,11 +296,40 @@ class IssueViewSet(viewsets.ModelViewSet, ValidationMixin):
 
     def get_queryset(self):
         user = self.request.user
-        # si admin retourne tout
+        # si admin retourne tout (hors projets masqués en attente de purge)
         if user.is_superuser or user.is_staff:
-            return Issue.objects.all()
+            return self.sparse_queryset(Issue.objects.filter(project__is_hidden=False))
         # sinon retourne que ses Issues
-        return Issue.objects.filter(project__contributors__user=user)
+        return self.sparse_queryset(Issue.objects.filter(project__contributors__user=user))
+
+    def list(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            key = None
+            user = request.user
+            # un admin voit toutes les issues : pas de mise en cache
+            if not (user.is_superuser or user.is_staff):
+                versions = get_versions('project', sorted(get_member_project_ids(request)))
+                key = response_cache_key('issues', request.build_absolute_uri(), sorted(versions.items()))
+            return self.cached_response(key, self.fast_list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            key = None
+            pk = self.kwargs.get('pk', '')
+            # version lue sans être créée : elle ne l'est qu'après une réponse 200 (issue existante et visible)
+            version = get_version('issue', int(pk), create=False) if pk.isdigit() else None
+            if version is not None:
+                key = response_cache_key('issue', pk, version, self.sparse_cache_key())
+
+            def check(data):
+                # mêmes règles que get_queryset / IsContributor | IsAdminUser
+                # (sans le champ project, ?fields=..., la réponse est reconstruite à partir du queryset)
+                return request.user.is_staff or data.get('project') in get_member_project_ids(request)
+
+            response = self.cached_response(key, super().retrieve, request, *args, check=check, **kwargs)
+            if key is None and pk.isdigit() and response.status_code == status.HTTP_200_OK and shared_cache():
+                get_version('issue', int(pk))
+            return response
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -178,16 +342,47 @@ class IssueViewSet(viewsets.ModelViewSet, ValidationMixin):
 
         serializer.save(project=project, author=user, assignee=assignee)
 
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        user = request.user
+        validated, errors = self.validate_bulk_items(request.data, {
+            'project': (Project.objects.filter(is_hidden=False), True),
+            'assignee': (CustomUser.objects.all(), False),
+        }, serializer_class=self.get_serializer_class())
+        self.raise_bulk_errors(errors)
+
+        issues = []
+        for data in validated:
+            # si pas d'assignation de l'issue, met par défaut le créateur
+            data.setdefault('assignee', user)
+            issues.append(Issue(author=user, **data))
+        with transaction.atomic():
+            Issue.objects.bulk_create(issues)
+            # bulk_create n'émet pas post_save : compteurs, journal et versions des projets mis à jour explicitement
+            apply_counter_deltas(issue_deltas(issues))
+            record_changes(issues, ChangeAction.CREATE)
+        for project_id in {issue.project_id for issue in issues}:
+            bump_version('project', project_id)
+        serializer = self.get_serializer(issues, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def perform_update(self, serializer):
         serializer.save()
 
     def perform_destroy(self, instance):
-        instance.delete()
+        # commentaires supprimés par lots sans être chargés (SD_API_DELETE_MODE)
+        delete_issue(instance)
 
 
-class CommentViewSet(viewsets.ModelViewSet, ValidationMixin):
+class CommentViewSet(viewsets.ModelViewSet, ValidationMixin, BulkCreateMixin, ConditionalGetMixin,
+                     SparseFieldsMixin, FastListMixin, ReplicaReadMixin):
     serializer_class = CommentSerializer
-    throttle_classes = [CustomThrottle]
+    throttle_classes = [CombinedRateThrottle]
+    pagination_class = OptInKeysetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = CommentFilter
     http_method_names = ['get', 'post', 'put', 'delete']  # on n'authorise pas le PATCH
@@ -201,11 +396,41 @@ class CommentViewSet(viewsets.ModelViewSet, ValidationMixin):
 
     def get_queryset(self):
         user = self.request.user
-        # si admin retourne tout
+        # issue chargée par jointure et champs du projet annotés => nb de requêtes constant (pas de N+1)
+        # la description de l'issue jointe n'est jamais rendue
+        queryset = self.sparse_queryset(Comment.objects.select_related('issue').defer('issue__description'))
+        if 'project' in self.get_sparse_field_names():
+            queryset = queryset.annotate(
+                project_name=F('issue__project__name'),
+                project_description=F('issue__project__description'),
+            )
+        # si admin retourne tout (hors projets masqués en attente de purge)
         if user.is_superuser or user.is_staff:
-            return Comment.objects.all()
+            return queryset.filter(issue__project__is_hidden=False)
         # sinon retourne que ses les comments auquel l'user a accès
-        return Comment.objects.filter(issue__project__contributors__user=user)
+        return queryset.filter(issue__project__contributors__user=user)
+
+    def get_timestamp_etag(self, request, queryset):
+        # les commentaires embarquent des champs de l'issue / du projet : leurs dates de modification comptent aussi
+        return self.make_etag(request, request.user.pk, sorted(get_member_project_ids(request)),
+                              *self.timestamp_etag_parts(queryset, 'updated_time', 'issue__updated_time',
+                                                         'issue__project__updated_time'))
+
+    def list(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            etag = self.get_timestamp_etag(request, self.filter_queryset(self.get_queryset()))
+            return self.conditional_response(etag, self.fast_list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with self.replica_reads(request):
+            etag = None
+            try:
+                pk = uuid.UUID(self.kwargs.get('pk', ''))
+            except ValueError:
+                pk = None
+            if pk is not None:
+                etag = self.get_timestamp_etag(request, self.get_queryset().filter(pk=pk))
+            return self.conditional_response(etag, super().retrieve, request, *args, **kwargs)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -213,8 +438,42 @@ class CommentViewSet(viewsets.ModelViewSet, ValidationMixin):
         issue = self.validate_issue_id(issue_id)
         serializer.save(author=user, issue=issue)
 
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        # body : [{"issue": 1, "description": "..."}, ...]
+        validated, errors = self.validate_bulk_items(request.data, {
+            'issue': (Issue.objects.filter(project__is_hidden=False).select_related('project'), True),
+        }, serializer_class=self.get_serializer_class())
+        self.raise_bulk_errors(errors)
+
+        comments = [Comment(author=request.user, **data) for data in validated]
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            # bulk_create n'émet pas post_save : compteurs, journal et versions des issues mis à jour explicitement
+            apply_counter_deltas(comment_deltas(comments))
+            record_changes(comments, ChangeAction.CREATE, lambda comment: comment.issue.project_id)
+        for issue_id in {comment.issue_id for comment in comments}:
+            bump_version('issue', issue_id)
+        serializer = self.get_serializer(comments, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def perform_update(self, serializer):
         serializer.save()
 
     def perform_destroy(self, instance):
         instance.delete()
+
+
+class MetricsView(APIView):
+    """
+    Per-endpoint histograms of every worker, Prometheus text format
+    """
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [CombinedRateThrottle]
+
+    def get(self, request):
+        return HttpResponse(metrics.prometheus_text(metrics.collect()), content_type='text/plain; version=0.0.4')
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # mesures par endpoint (latence, requêtes SQL, taille de la réponse compressée)
+    'sd_api.middleware.InstrumentationMiddleware',
+    # avant les middlewares qui lisent / modifient le contenu des réponses
+    'sd_api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +60,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # lectures sur le primaire après une écriture (réplica en lecture)
+    'sd_api.middleware.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'sd_support.urls'
@@ -79,13 +88,94 @@ WSGI_APPLICATION = 'sd_support.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# configuration par variables d'environnement (SQLite embarqué par défaut), ex. PostgreSQL :
+# DJANGO_DB_ENGINE=django.db.backends.postgresql DJANGO_DB_NAME=sd_support DJANGO_DB_HOST=... DJANGO_DB_USER=...
+# réplica en lecture : DJANGO_DB_REPLICA_NAME (+ DJANGO_DB_REPLICA_HOST...), un second fichier SQLite en local
+
+
+def database_settings(prefix, default_name):
+    # valeurs du primaire par défaut pour le réplica
+    engine = os.environ.get(f'{prefix}_ENGINE', os.environ.get('DJANGO_DB_ENGINE', 'django.db.backends.sqlite3'))
+    config = {
+        'ENGINE': engine,
+        'NAME': os.environ.get(f'{prefix}_NAME', default_name),
+        # connexions persistantes (secondes, 0 : une connexion par requête), vérifiées avant réutilisation
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if engine == 'django.db.backends.sqlite3':
+        # attente d'un verrou en écriture avant "database is locked" (secondes), WAL : SD_API_SQLITE_WAL
+        config['OPTIONS'] = {'timeout': float(os.environ.get('DJANGO_DB_SQLITE_TIMEOUT', 20))}
+    else:
+        config.update({key: os.environ.get(f'{prefix}_{key}', os.environ.get(f'DJANGO_DB_{key}', ''))
+                       for key in ('USER', 'PASSWORD', 'HOST', 'PORT')})
+    return config
+
+
 DATABASES = {
+    'default': database_settings('DJANGO_DB', BASE_DIR / 'db.sqlite3'),
+}
+if os.environ.get('DJANGO_DB_REPLICA_NAME'):
+    DATABASES['replica'] = database_settings('DJANGO_DB_REPLICA', None)
+    # en test, le réplica est la base de test du primaire
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# écritures sur le primaire, list / retrieve des viewsets sd_api sur le réplica
+DATABASE_ROUTERS = ['sd_api.database.PrimaryReplicaRouter']
+# journal WAL pour SQLite (DJANGO_DB_SQLITE_WAL=1) : lecteurs et écrivain concurrents, au prix d'une
+# modification du fichier db.sqlite3 (en-tête) et des fichiers -wal / -shm à côté
+SD_API_SQLITE_WAL = os.environ.get('DJANGO_DB_SQLITE_WAL', '') == '1'
+# lectures d'un utilisateur sur le primaire après une écriture (secondes)
+SD_API_REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Redis en production (ex : DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# et DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379), cache fichier possible pour simuler un cache partagé en test
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'sd_support'),
+        'TIMEOUT': 300,
+        'KEY_PREFIX': 'sd_support',
     }
 }
 
+# cache partagé entre workers : versions, réponses, appartenances et blacklist négative mises en cache.
+# Déduit du backend si non défini (LocMem : cache par processus, lectures en base) ; '1' / '0' pour forcer
+SD_API_SHARED_CACHE = {'1': True, '0': False}.get(os.environ.get('SD_API_SHARED_CACHE', ''))
+
+# durée de vie des réponses projets / issues mises en cache (invalidées par signaux)
+SD_API_RESPONSE_CACHE_TIMEOUT = 300
+# durée de vie des versions des objets (clés des réponses et ETags), au moins 2 x SD_API_RESPONSE_CACHE_TIMEOUT
+SD_API_VERSION_TIMEOUT = 3600
+
+# compression gzip / brotli (si installé) des réponses JSON / NDJSON / CSV à partir de cette taille (octets)
+SD_API_COMPRESSION_MIN_LENGTH = 1024
+
+# suppression des projets / issues : 'bulk' (DELETE par lots), 'deferred' (projet masqué puis
+# supprimé par une tâche de run_tasks) ou 'collector' (instance.delete() de Django)
+SD_API_DELETE_MODE = os.environ.get('SD_API_DELETE_MODE', 'bulk')
+SD_API_DELETE_BATCH_SIZE = 1000
+
+# tâches en arrière-plan (python manage.py run_tasks) ; exécutées dans la requête si True (développement sans worker)
+SD_API_TASKS_EAGER = os.environ.get('SD_API_TASKS_EAGER', '') == '1'
+
+# journal des changements (GET /api/projects/{id}/changes/?since=, flux SSE /api/async/projects/{id}/changes/) :
+# rétention (python manage.py compact_changes) et compactage des entrées remplacées
+SD_API_CHANGES_RETENTION_DAYS = 7
+SD_API_CHANGES_COMPACT_AFTER = 3600  # secondes
+SD_API_CHANGES_POLL_INTERVAL = 1.0  # secondes
+SD_API_CHANGES_STREAM_TIMEOUT = 300  # secondes
+
+# histogrammes par endpoint (python manage.py dump_metrics, GET /api/metrics/ pour les admins)
+SD_API_METRICS_ENABLED = True
+# profils cProfile des requêtes lentes : fraction des requêtes échantillonnées (0 = désactivé)
+SD_API_PROFILE_SAMPLE_RATE = float(os.environ.get('SD_API_PROFILE_SAMPLE_RATE', 0))
+SD_API_PROFILE_SLOW_THRESHOLD = 0.5  # secondes
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -105,6 +195,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# hachage des mots de passe : le hasher choisi sert aux nouveaux mots de passe, les autres restent reconnus
+# et les anciens hash sont remplacés à la connexion suivante (rehash, aussi si les paramètres changent)
+SD_API_PASSWORD_HASHER_POLICIES = {
+    'scrypt': 'sd_api.hashers.TunedScryptPasswordHasher',
+    'argon2': 'sd_api.hashers.TunedArgon2PasswordHasher',  # pip install argon2-cffi
+    'pbkdf2': 'sd_api.hashers.TunedPBKDF2PasswordHasher',
+}
+SD_API_PASSWORD_HASHER = os.environ.get('SD_API_PASSWORD_HASHER', 'scrypt')
+if SD_API_PASSWORD_HASHER not in SD_API_PASSWORD_HASHER_POLICIES:
+    raise ImproperlyConfigured(f"SD_API_PASSWORD_HASHER inconnu ({SD_API_PASSWORD_HASHER!r}), valeurs possibles : "
+                               f"{', '.join(SD_API_PASSWORD_HASHER_POLICIES)}")
+PASSWORD_HASHERS = [
+    SD_API_PASSWORD_HASHER_POLICIES[SD_API_PASSWORD_HASHER],
+    *(path for name, path in SD_API_PASSWORD_HASHER_POLICIES.items() if name != SD_API_PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+# paramètres (défauts : scrypt de Django, argon2id m=19 Mio t=2 p=1, PBKDF2 de Django)
+SD_API_SCRYPT_WORK_FACTOR = int(os.environ.get('SD_API_SCRYPT_WORK_FACTOR', 2 ** 14))
+SD_API_ARGON2_MEMORY_COST = int(os.environ.get('SD_API_ARGON2_MEMORY_COST', 19456))  # Kio
+SD_API_ARGON2_TIME_COST = int(os.environ.get('SD_API_ARGON2_TIME_COST', 2))
+SD_API_PBKDF2_ITERATIONS = int(os.environ.get('SD_API_PBKDF2_ITERATIONS', 720000))
+# hachages simultanés par processus, hors du thread de la requête / de la boucle async (0 : dans la requête)
+SD_API_PASSWORD_HASH_WORKERS = int(os.environ.get('SD_API_PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -134,23 +248,32 @@ SIMPLE_JWT = {
     # TODO : voir les autres options de simplejwt
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(hours=12),
+    'TOKEN_OBTAIN_SERIALIZER': 'sd_api.serializers.CustomTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'sd_api.serializers.CustomTokenRefreshSerializer',
 }
 
 REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    # orjson si installé (pip install orjson), sinon rendu / parsing JSON standard de DRF
+    'DEFAULT_RENDERER_CLASSES': ['sd_api.renderers.ORJSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': [
+        'sd_api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    # JWT avec is_staff / is_superuser dans le token : pas de SELECT de l'utilisateur à chaque requête
+    'DEFAULT_AUTHENTICATION_CLASSES': ('sd_api.authentication.ClaimsJWTAuthentication',),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'EXCEPTION_HANDLER': 'sd_api.exceptions.custom_exception_handler',
+    # un seul throttle (clé : id utilisateur, ou IP si anonyme) pour les scopes burst + user / anon
     'DEFAULT_THROTTLE_CLASSES': [
-        'sd_api.throttles.CustomThrottle',
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'sd_api.throttles.CombinedRateThrottle',
         ],
     'DEFAULT_THROTTLE_RATES': {
+        'burst': '10/m',
         'user': '1000/day',
         'anon': '100/day',
     },